@@ -0,0 +1,20 @@
+# accounts/management/commands/rebuild_user_stats.py
+from django.core.management.base import BaseCommand
+from accounts.models import CustomUser
+from accounts.stats import rebuild_stats
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized per-user stats rows from submissions, transactions and referrals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Only rebuild these users (default: everyone)')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.all().order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        count = 0
+        for user in users.iterator():
+            rebuild_stats(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} users"))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_user_stats(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    UserStats = apps.get_model('accounts', 'UserStats')
+    Submission = apps.get_model('adverts', 'Submission')
+    Transaction = apps.get_model('wallet', 'Transaction')
+    now = timezone.now()
+    this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    def grouped(queryset, key, **aggregates):
+        return {row[key]: row for row in queryset.values(key).annotate(**aggregates).order_by()}
+
+    earnings = grouped(Submission.objects.all(), 'user_id', total=models.Sum('earnings'), count=models.Count('id'))
+    commissions = Transaction.objects.filter(transaction_type='COMMISSION')
+    commission = grouped(commissions, 'user_id', total=models.Sum('amount'))
+    month_commission = grouped(commissions.filter(created_at__gte=this_month), 'user_id', total=models.Sum('amount'))
+    referrals = grouped(CustomUser.objects.filter(referred_by__isnull=False), 'referred_by_id', count=models.Count('id'))
+
+    rows = []
+    for user_id in CustomUser.objects.values_list('id', flat=True).iterator():
+        rows.append(UserStats(
+            user_id=user_id,
+            lifetime_earnings=earnings.get(user_id, {}).get('total') or 0,
+            submission_count=earnings.get(user_id, {}).get('count') or 0,
+            total_commission=commission.get(user_id, {}).get('total') or 0,
+            month_commission=month_commission.get(user_id, {}).get('total') or 0,
+            commission_month=this_month.date(),
+            total_referrals=referrals.get(user_id, {}).get('count') or 0,
+            # Active referrals are recounted on first read
+            active_referrals_until=now,
+        ))
+    UserStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customuser_email_verification_code_and_more'),
+        ('adverts', '0003_alter_advert_file'),
+        ('wallet', '0004_transaction_history_index_and_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('lifetime_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('total_commission', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('month_commission', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('commission_month', models.DateField(blank=True, null=True)),
+                ('total_referrals', models.PositiveIntegerField(default=0)),
+                ('active_referrals', models.PositiveIntegerField(default=0)),
+                ('active_referrals_until', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
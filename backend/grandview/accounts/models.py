@@ -16,10 +16,33 @@ class CustomUser(AbstractUser):
     email_verification_code = models.CharField(max_length=6, blank=True, null=True)
     email_verification_expiry = models.DateTimeField(blank=True, null=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets accounts.signals notice a changed referrer
+        instance._loaded_referred_by_id = instance.__dict__.get('referred_by_id')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.referral_code:
             self.referral_code = str(uuid.uuid4())[:8].upper()  # e.g., "ABC12345"
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+class UserStats(models.Model):
+    """Denormalized per-user counters, kept current by accounts.signals and rebuilt by rebuild_user_stats."""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    lifetime_earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    submission_count = models.PositiveIntegerField(default=0)
+    total_commission = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    month_commission = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    commission_month = models.DateField(null=True, blank=True)
+    total_referrals = models.PositiveIntegerField(default=0)
+    active_referrals = models.PositiveIntegerField(default=0)
+    active_referrals_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.user.username}"
@@ -45,11 +45,9 @@ class RegisterSerializer(serializers.ModelSerializer):
             phone_number=validated_data['phone_number'],
             password=validated_data['password'],
             email_verification_code=otp,
-            email_verification_expiry=timezone.now() + timedelta(minutes=30)
+            email_verification_expiry=timezone.now() + timedelta(minutes=30),
+            referred_by=validated_data.get('referred_by')
         )
-        if 'referred_by' in validated_data and validated_data['referred_by']:
-            user.referred_by = validated_data['referred_by']
-            user.save()
 
         return user
 
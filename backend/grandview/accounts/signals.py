@@ -0,0 +1,47 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CustomUser, UserStats
+from . import stats
+
+@receiver(post_save, sender=CustomUser)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        UserStats.objects.create(user=instance)
+        if instance.referred_by_id:
+            stats.record_referral(instance.referred_by_id)
+    else:
+        previous = getattr(instance, '_loaded_referred_by_id', instance.referred_by_id)
+        if previous != instance.referred_by_id:
+            if previous:
+                stats.record_referral(previous, -1)
+                stats.refresh_active_referrals(previous)
+            if instance.referred_by_id:
+                stats.record_referral(instance.referred_by_id)
+                stats.refresh_active_referrals(instance.referred_by_id)
+    instance._loaded_referred_by_id = instance.referred_by_id
+
+@receiver(post_save, sender='adverts.Submission')
+def track_submission_earnings(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_submission(instance.user_id, instance.earnings)
+
+@receiver(post_delete, sender='adverts.Submission')
+def untrack_submission_earnings(sender, instance, **kwargs):
+    # Never create a row here, the user may be mid-deletion
+    stats.record_submission(instance.user_id, -instance.earnings, count=-1, create=False)
+
+@receiver(post_save, sender='wallet.Transaction')
+def track_commission(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.transaction_type == 'COMMISSION':
+        stats.record_commission(instance.user_id, instance.amount)
+
+@receiver(post_save, sender='packages.Purchase')
+@receiver(post_delete, sender='packages.Purchase')
+def track_active_referrals(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    referrer_id = CustomUser.objects.filter(pk=instance.user_id).values_list('referred_by_id', flat=True).first()
+    if referrer_id:
+        stats.refresh_active_referrals(referrer_id)
@@ -0,0 +1,96 @@
+from decimal import Decimal
+from django.db.models import Count, F, Min, Sum
+from django.utils import timezone
+from .models import CustomUser, UserStats
+import logging
+
+logger = logging.getLogger(__name__)
+
+def month_start(now=None):
+    now = now or timezone.now()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _update(user_id, create=True, **updates):
+    updated = UserStats.objects.filter(user_id=user_id).update(updated_at=timezone.now(), **updates)
+    if not updated and create:
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(updated_at=timezone.now(), **updates)
+
+def record_submission(user_id, earnings, count=1, create=True):
+    _update(
+        user_id,
+        create=create,
+        lifetime_earnings=F('lifetime_earnings') + earnings,
+        submission_count=F('submission_count') + count,
+    )
+
+def record_referral(referrer_id, count=1):
+    _update(referrer_id, total_referrals=F('total_referrals') + count)
+
+def record_commission(user_id, amount):
+    """Add a commission to the lifetime and month-to-date totals.
+
+    The month bucket is rolled over in the same UPDATE that adds the first
+    commission of a new month.
+    """
+    this_month = month_start().date()
+    now = timezone.now()
+    for _ in range(3):
+        stats = UserStats.objects.filter(user_id=user_id)
+        if stats.filter(commission_month=this_month).update(
+            total_commission=F('total_commission') + amount,
+            month_commission=F('month_commission') + amount,
+            updated_at=now,
+        ):
+            return
+        if stats.exclude(commission_month=this_month).update(
+            total_commission=F('total_commission') + amount,
+            month_commission=amount,
+            commission_month=this_month,
+            updated_at=now,
+        ):
+            return
+        UserStats.objects.get_or_create(user_id=user_id)
+    logger.error(f"Could not record commission of {amount} for user {user_id}")
+
+def refresh_active_referrals(user_id, now=None):
+    """Recount referrals with an unexpired purchase.
+
+    Also stores the earliest of those expiry dates, after which the count may
+    have dropped and is recomputed on read.
+    """
+    from packages.models import Purchase
+    now = now or timezone.now()
+    active = Purchase.objects.filter(user__referred_by_id=user_id, expiry_date__gt=now).aggregate(
+        count=Count('user', distinct=True),
+        until=Min('expiry_date'),
+    )
+    _update(user_id, active_referrals=active['count'], active_referrals_until=active['until'])
+    return active['count'], active['until']
+
+def get_stats(user):
+    """Return the user's stats row, refreshing the time-dependent fields if they have lapsed."""
+    stats, _ = UserStats.objects.get_or_create(user=user)
+    now = timezone.now()
+    if stats.active_referrals_until and stats.active_referrals_until <= now:
+        stats.active_referrals, stats.active_referrals_until = refresh_active_referrals(user.pk, now)
+    if stats.commission_month != month_start(now).date():
+        stats.month_commission = Decimal('0.00')
+    return stats
+
+def rebuild_stats(user):
+    """Recompute every counter for ``user`` from the underlying rows."""
+    from adverts.models import Submission
+    from wallet.models import Transaction
+    earnings = Submission.objects.filter(user=user).aggregate(total=Sum('earnings'), count=Count('id'))
+    commissions = Transaction.objects.filter(user=user, transaction_type='COMMISSION')
+    this_month = month_start()
+    UserStats.objects.update_or_create(user=user, defaults={
+        'lifetime_earnings': earnings['total'] or Decimal('0.00'),
+        'submission_count': earnings['count'],
+        'total_commission': commissions.aggregate(total=Sum('amount'))['total'] or Decimal('0.00'),
+        'month_commission': commissions.filter(created_at__gte=this_month).aggregate(total=Sum('amount'))['total'] or Decimal('0.00'),
+        'commission_month': this_month.date(),
+        'total_referrals': CustomUser.objects.filter(referred_by=user).count(),
+    })
+    refresh_active_referrals(user.pk)
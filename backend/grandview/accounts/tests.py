@@ -1,3 +1,73 @@
 from django.test import TestCase
+from django.core.management import call_command
+from django.urls import reverse
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from adverts.models import Advert, Submission
+from packages.models import Package, Purchase
+from wallet import ledger
+from .models import CustomUser, UserStats
+from .stats import get_stats
 
-# Create your tests here.
+def make_user(username, phone, **kwargs):
+    return CustomUser.objects.create_user(
+        username=username, password='pass12345', email=f'{username}@example.com', phone_number=phone, **kwargs
+    )
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.marketer = make_user('marketer', '+254700000301', is_marketer=True)
+        self.package = Package.objects.create(
+            name='Basic', image='packages/basic.jpg', validity_days=30, rate_per_view=90,
+            description='Basic package', price=Decimal('1000')
+        )
+        self.advert = Advert.objects.create(title='Advert', file='adverts/stats.jpg', rate_category=90)
+
+    def _referral(self, username, phone):
+        return make_user(username, phone, referred_by=self.marketer)
+
+    def test_write_paths_keep_stats_current(self):
+        first = self._referral('first', '+254700000302')
+        second = self._referral('second', '+254700000303')
+        Purchase.objects.create(user=first, package=self.package)
+        ledger.credit(second, Decimal('2000'), 'DEPOSIT', 'Top up', balance='deposit_balance')
+        ledger.charge(second, Decimal('500'), 'PURCHASE', 'Bought')
+        Submission.objects.create(user=self.marketer, advert=self.advert, views_count=2, earnings=Decimal('180'))
+
+        stats = UserStats.objects.get(user=self.marketer)
+        self.assertEqual((stats.total_referrals, stats.active_referrals), (2, 1))
+        self.assertEqual(stats.total_commission, Decimal('400'))
+        self.assertEqual(stats.month_commission, Decimal('400'))
+        self.assertEqual((stats.lifetime_earnings, stats.submission_count), (Decimal('180'), 1))
+
+    def test_referral_stats_view_is_a_row_lookup(self):
+        Purchase.objects.create(user=self._referral('first', '+254700000302'), package=self.package)
+        self.client.force_login(self.marketer)
+        # Session, user and the stats row
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('referral_stats'), secure=True)
+        self.assertEqual(response.json()['active_referrals'], 1)
+
+    def test_expired_referrals_and_month_rollover_refresh_on_read(self):
+        referral = self._referral('first', '+254700000302')
+        purchase = Purchase.objects.create(user=referral, package=self.package)
+        ledger.pay_upline_commission(referral, Decimal('100'))
+        later = purchase.expiry_date + timedelta(days=40)
+        with mock.patch('accounts.stats.timezone.now', return_value=later):
+            stats = get_stats(self.marketer)
+        self.assertEqual(stats.active_referrals, 0)
+        self.assertEqual(stats.month_commission, Decimal('0'))
+        self.assertEqual(stats.total_commission, Decimal('80'))
+
+    def test_rebuild_command_recomputes_from_raw_rows(self):
+        referral = self._referral('first', '+254700000302')
+        Purchase.objects.create(user=referral, package=self.package)
+        ledger.pay_upline_commission(referral, Decimal('100'))
+        UserStats.objects.filter(user=self.marketer).update(total_referrals=0, total_commission=0, active_referrals=0)
+        out = StringIO()
+        call_command('rebuild_user_stats', 'marketer', stdout=out)
+        self.assertIn('Rebuilt stats for 1 users', out.getvalue())
+        stats = UserStats.objects.get(user=self.marketer)
+        self.assertEqual((stats.total_referrals, stats.active_referrals, stats.total_commission), (1, 1, Decimal('80')))
@@ -5,14 +5,14 @@ from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from .serializers import RegisterSerializer, LoginSerializer, UserUpdateSerializer, PasswordChangeSerializer, VerifyEmailSerializer
 from .models import CustomUser
+from .stats import get_stats
 from wallet.models import Transaction
 from django.utils import timezone
 from django.db.models import Sum
 from decimal import Decimal
-from django.core.mail import send_mail
 from django.contrib.auth import authenticate
-from django.template.loader import render_to_string
 from django.conf import settings
+from notifications.mail import queue_email
 import random
 from datetime import timedelta
 
@@ -25,40 +25,29 @@ class RegisterView(APIView):
             user = serializer.save()
             token, created = Token.objects.get_or_create(user=user)
 
-            # Prepare and send welcome email
+            # Queue welcome and OTP emails for the background dispatcher
             try:
-                subject = 'Welcome to Grandview!'
-                context = {
-                    'user': user,
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string('emails/welcome_email.html', context)
-                send_mail(
-                    subject=subject,
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                queue_email(
+                    subject='Welcome to Grandview!',
+                    template='emails/welcome_email.html',
+                    context={
+                        'user': user,
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
-                # Send OTP email
-                subject = 'Verify Your Grandview Account'
-                context = {
-                    'user': user,
-                    'otp': user.email_verification_code,
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string('emails/otp_email.html', context)
-                send_mail(
-                    subject=subject,
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                queue_email(
+                    subject='Verify Your Grandview Account',
+                    template='emails/otp_email.html',
+                    context={
+                        'user': user,
+                        'otp': user.email_verification_code,
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                print(f"Failed to send email: {str(e)}")
+                print(f"Failed to queue email: {str(e)}")
 
             return Response({
                 'token': token.key,
@@ -121,25 +110,12 @@ class ReferralStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        total_referrals = user.referrals.count()
-        current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        active_referrals = user.referrals.filter(purchases__expiry_date__gt=timezone.now()).distinct().count()
-        total_commission = Transaction.objects.filter(
-            user=user,
-            transaction_type='COMMISSION'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        this_month_commission = Transaction.objects.filter(
-            user=user,
-            transaction_type='COMMISSION',
-            created_at__gte=current_month
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
+        stats = get_stats(request.user)
         return Response({
-            'total_referrals': total_referrals,
-            'active_referrals': active_referrals,
-            'total_commission': str(total_commission),
-            'this_month_commission': str(this_month_commission)
+            'total_referrals': stats.total_referrals,
+            'active_referrals': stats.active_referrals,
+            'total_commission': str(stats.total_commission),
+            'this_month_commission': str(stats.month_commission)
         })
 
 class PasswordChangeView(APIView):
@@ -171,26 +147,21 @@ class VerifyEmailView(APIView):
             user.email_verification_code = otp
             user.email_verification_expiry = timezone.now() + timedelta(minutes=30)
             user.save()
-            # Send OTP email
+            # Queue OTP email
             try:
-                subject = 'Verify Your Grandview Account'
-                context = {
-                    'user': user,
-                    'otp': otp,
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string('emails/otp_email.html', context)
-                send_mail(
-                    subject=subject,
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                queue_email(
+                    subject='Verify Your Grandview Account',
+                    template='emails/otp_email.html',
+                    context={
+                        'user': user,
+                        'otp': otp,
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
                 return Response({'message': 'Verification code resent'}, status=status.HTTP_200_OK)
             except Exception as e:
-                print(f"Failed to send OTP email: {str(e)}")
+                print(f"Failed to queue OTP email: {str(e)}")
                 return Response({'error': 'Failed to resend code'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         else:
             serializer = VerifyEmailSerializer(data=request.data, context={'request': request})
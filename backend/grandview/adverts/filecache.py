@@ -0,0 +1,200 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from botocore.exceptions import ClientError
+from grandview import s3
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+PART_PREFIX = '.part-'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+_evict_lock = threading.Lock()
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+class ObjectChanged(Exception):
+    """The object was replaced after its ETag was cached."""
+
+def _count(name):
+    key = f'advert_file_cache:{name}'
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted in between
+            cache.add(key, 1, None)
+
+def stats():
+    """Hit and miss counts since the shared cache was last cleared, across every worker."""
+    return {name: cache.get(f'advert_file_cache:{name}', 0) for name in ('hits', 'misses')}
+
+def _info_key(name):
+    return f'advert_file_info:{hashlib.md5(name.encode()).hexdigest()}'
+
+def forget_info(name):
+    cache.delete(_info_key(name))
+
+def object_info(name):
+    """ETag, content type and size of a stored advert file.
+
+    Remembered for ADVERT_CACHE_INFO_SECONDS, so a popular file costs one
+    HEAD request per interval rather than one per download.
+    """
+    key = _info_key(name)
+    info = cache.get(key)
+    if info is None:
+        head = s3.get_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=name)
+        info = {
+            'etag': head['ETag'],
+            'content_type': head.get('ContentType') or 'application/octet-stream',
+            'size': head['ContentLength'],
+        }
+        cache.set(key, info, settings.ADVERT_CACHE_INFO_SECONDS)
+    return info
+
+def _path(name, etag):
+    # A new upload under the same name has a new ETag, so it never reads a stale copy
+    return os.path.join(settings.ADVERT_CACHE_DIR, hashlib.sha256(f'{name}\0{etag}'.encode()).hexdigest())
+
+def open_cached(name, info):
+    """Open the local copy of ``name`` at ``info['etag']``, downloading it on a miss.
+
+    Returns ``(file, hit)``. The file is opened before anything is evicted,
+    so a concurrent eviction cannot pull it out from under the response.
+    Raises ObjectChanged when S3 no longer holds that version.
+    """
+    path = _path(name, info['etag'])
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        os.utime(path)  # Most recently used
+        _count('hits')
+        return f, True
+
+    os.makedirs(settings.ADVERT_CACHE_DIR, exist_ok=True)
+    fd, part = tempfile.mkstemp(dir=settings.ADVERT_CACHE_DIR, prefix=PART_PREFIX)
+    try:
+        try:
+            # IfMatch makes S3 refuse a newer object, which would otherwise be stored under the old ETag
+            response = s3.get_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=name, IfMatch=info['etag'])
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('412', 'PreconditionFailed'):
+                raise ObjectChanged(name) from e
+            raise
+        with os.fdopen(fd, 'wb') as out, response['Body'] as body:
+            shutil.copyfileobj(body, out, CHUNK_SIZE)
+        os.replace(part, path)
+    except BaseException:
+        os.unlink(part)
+        raise
+    f = open(path, 'rb')
+    _count('misses')
+    logger.info(f"Cached advert file {name} ({info['size']} bytes)")
+    evict()
+    return f, False
+
+def evict(max_bytes=None):
+    """Delete the least recently used files until the cache fits in ``max_bytes``."""
+    max_bytes = settings.ADVERT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = []
+        with os.scandir(settings.ADVERT_CACHE_DIR) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.startswith(PART_PREFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def byte_range(request, etag, size):
+    """The ``(start, end)`` of a single satisfiable ``Range`` header, or None to send the whole file.
+
+    Multiple ranges and ranges made stale by ``If-Range`` fall back to the
+    whole file, which the spec allows.
+    """
+    match = RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+        if not int(last):
+            raise RangeNotSatisfiable
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+def _read(f, start, length):
+    with f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+def file_response(request, name, file_name):
+    """Serve ``name`` from the local cache, answering revalidation and Range requests."""
+    try:
+        return _file_response(request, name, file_name, object_info(name))
+    except ObjectChanged:
+        # Replaced since its ETag was cached; look it up again and retry once
+        logger.info(f"Advert file {name} changed in S3; refreshing its cached info")
+        forget_info(name)
+        return _file_response(request, name, file_name, object_info(name))
+
+def _file_response(request, name, file_name, info):
+    etag, size = info['etag'], info['size']
+    headers = {'ETag': etag, 'Accept-Ranges': 'bytes', 'Cache-Control': 'private, no-cache'}
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified.headers[header] = value
+        return not_modified
+    try:
+        requested = byte_range(request, etag, size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    f, hit = open_cached(name, info)
+    if requested is None:
+        response = FileResponse(f, content_type=info['content_type'], as_attachment=True, filename=file_name)
+    else:
+        start, end = requested
+        response = StreamingHttpResponse(_read(f, start, end - start + 1), status=206, content_type=info['content_type'])
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+    for header, value in headers.items():
+        response[header] = value
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
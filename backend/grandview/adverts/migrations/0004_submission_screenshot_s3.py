@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:39
+
+import grandview.settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0003_alter_advert_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='screenshot',
+            field=models.FileField(db_index=True, storage=grandview.settings.S3PrivateMediaStorage(), upload_to='submissions/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:03
+
+import grandview.settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adverts', '0004_submission_screenshot_s3'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='screenshot',
+            field=models.FileField(storage=grandview.settings.S3PrivateMediaStorage(), unique=True, upload_to='submissions/'),
+        ),
+    ]
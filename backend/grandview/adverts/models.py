@@ -1,6 +1,6 @@
 # adverts/models.py
 from django.db import models
-from grandview.settings import S3MediaStorage  # Import the custom storage class
+from grandview.settings import S3MediaStorage, S3PrivateMediaStorage  # Import the custom storage class
 from accounts.models import CustomUser
 from packages.models import Package
 from wallet.models import Wallet
@@ -27,7 +27,7 @@ class Submission(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     advert = models.ForeignKey(Advert, on_delete=models.CASCADE)
     views_count = models.PositiveIntegerField(default=1)
-    screenshot = models.FileField(upload_to='submissions/')  # Uses default local storage
+    screenshot = models.FileField(upload_to='submissions/', storage=S3PrivateMediaStorage(), unique=True)  # Uploaded straight to S3, see adverts.screenshots; unique so a key earns once
     submission_date = models.DateTimeField(auto_now_add=True)
     earnings = models.DecimalField(max_digits=10, decimal_places=2)
 
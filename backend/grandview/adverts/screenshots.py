@@ -0,0 +1,75 @@
+"""Submission screenshots uploaded by the browser straight to the bucket.
+
+The client asks for a presigned POST, uploads the image to S3 itself and
+then submits only the object key, so a submission is a small JSON request
+instead of a multipart body of up to 5 MB carried through the web tier.
+"""
+from django.conf import settings
+from botocore.exceptions import ClientError
+from grandview import s3
+from .models import Submission
+import logging
+import re
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp'}
+
+ALREADY_SUBMITTED = "Screenshot has already been submitted"
+
+class ScreenshotRejected(Exception):
+    pass
+
+def _prefix(user):
+    return f'submissions/{user.pk}/'
+
+def presign_upload(user, content_type):
+    """A presigned POST for one screenshot owned by ``user``.
+
+    The policy pins the key, content type and size, so S3 itself refuses
+    anything else; verify() still checks the stored object before it counts.
+    """
+    if content_type not in CONTENT_TYPES:
+        raise ScreenshotRejected(f"Unsupported screenshot type. Use one of: {', '.join(CONTENT_TYPES)}")
+    key = f'{_prefix(user)}{uuid.uuid4().hex}.{CONTENT_TYPES[content_type]}'
+    presigned = s3.presigned_post(
+        key,
+        fields={'Content-Type': content_type, 'acl': 'private'},
+        conditions=[
+            {'Content-Type': content_type},
+            {'acl': 'private'},
+            ['content-length-range', 1, settings.SUBMISSION_SCREENSHOT_MAX_BYTES],
+        ],
+        expires_in=settings.SUBMISSION_UPLOAD_URL_EXPIRY,
+    )
+    return {'upload_url': presigned['url'], 'fields': presigned['fields'], 'key': key}
+
+def _delete(key):
+    try:
+        s3.get_client().delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+    except Exception as e:
+        logger.warning(f"Failed to delete rejected screenshot {key}: {str(e)}")
+
+def verify(user, key):
+    """Check that ``key`` is an uploaded screenshot ``user`` may submit, with one HEAD request."""
+    pattern = rf"{re.escape(_prefix(user))}[0-9a-f]{{32}}\.({'|'.join(CONTENT_TYPES.values())})"
+    if not re.fullmatch(pattern, key or ''):
+        raise ScreenshotRejected("Invalid screenshot key")
+    # Fails early for the common case; the unique constraint on the field settles concurrent submissions
+    if Submission.objects.filter(screenshot=key).exists():
+        raise ScreenshotRejected(ALREADY_SUBMITTED)
+
+    try:
+        head = s3.get_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+            raise ScreenshotRejected("Screenshot upload not found. Please upload it again.")
+        raise
+
+    if head['ContentLength'] > settings.SUBMISSION_SCREENSHOT_MAX_BYTES:
+        _delete(key)
+        raise ScreenshotRejected(f"Screenshot file too large (max {settings.SUBMISSION_SCREENSHOT_MAX_BYTES // (1024 * 1024)}MB)")
+    if head.get('ContentType') not in CONTENT_TYPES:
+        _delete(key)
+        raise ScreenshotRejected("Screenshot must be a JPEG, PNG or WebP image")
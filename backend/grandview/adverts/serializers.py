@@ -8,7 +8,8 @@ from wallet.models import Transaction
 
 class SubmissionSerializer(serializers.ModelSerializer):
     advert_title = serializers.CharField(source='advert.title')
-    screenshot = serializers.FileField()  # Returns local URL (e.g., /media/submissions/filename)
+    # Screenshots are private; the key is returned rather than signing a URL for every row
+    screenshot = serializers.CharField(source='screenshot.name', read_only=True)
 
     class Meta:
         model = Submission
@@ -23,29 +24,46 @@ class AdvertSerializer(serializers.ModelSerializer):
         model = Advert
         fields = ['id', 'title', 'file', 'rate_category', 'upload_date', 'can_submit', 'has_submitted']
 
+    def _user_state(self):
+        # Computed once per serializer tree; AdvertListView passes it in up front
+        if 'active_rate' not in self.context:
+            request = self.context.get('request')
+            user = request.user if request and hasattr(request, 'user') else None
+            self.context.update(advert_user_context(user))
+        return self.context['active_rate'], self.context['submitted_advert_ids']
+
     def get_can_submit(self, obj):
-        request = self.context.get('request')
-        if not request or not hasattr(request, 'user') or not request.user.is_authenticated:
-            return False
-        active_purchases = Purchase.objects.filter(
-            user=request.user,
-            expiry_date__gt=timezone.now()
-        ).order_by('-purchase_date')
-        if not active_purchases.exists():
-            return False
-        active_rate = active_purchases.first().package.rate_per_view
-        return obj.rate_category == active_rate
+        active_rate, _ = self._user_state()
+        return active_rate is not None and obj.rate_category == active_rate
 
     def get_has_submitted(self, obj):
-        request = self.context.get('request')
-        if not request or not hasattr(request, 'user') or not request.user.is_authenticated:
-            return False
-        today = timezone.now().date()
-        return Submission.objects.filter(
-            user=request.user,
-            advert=obj,
-            submission_date__date=today
-        ).exists()
+        _, submitted_advert_ids = self._user_state()
+        return obj.id in submitted_advert_ids
+
+def get_active_purchase(user):
+    return Purchase.objects.filter(
+        user=user,
+        expiry_date__gt=timezone.now()
+    ).select_related('package').order_by('-purchase_date').first()
+
+def advert_user_context(user, active_purchase=None):
+    """Per-user state shared by every advert in a listing.
+
+    Returns the active package rate and the ids of adverts submitted today,
+    so AdvertSerializer doesn't have to query for each advert.
+    """
+    if not user or not user.is_authenticated:
+        return {'active_rate': None, 'submitted_advert_ids': frozenset()}
+    if active_purchase is None:
+        active_purchase = get_active_purchase(user)
+    submitted_advert_ids = Submission.objects.filter(
+        user=user,
+        submission_date__date=timezone.localdate()
+    ).values_list('advert_id', flat=True)
+    return {
+        'active_rate': active_purchase.package.rate_per_view if active_purchase else None,
+        'submitted_advert_ids': frozenset(submitted_advert_ids),
+    }
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -5,6 +5,32 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from adverts.models import Advert
 from adverts.admin import AdvertAdmin
 from django.core.exceptions import ValidationError
+from django.test import override_settings
+from django.conf import settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from accounts.models import CustomUser
+from adverts.models import Submission
+from packages.models import Package, Purchase
+from wallet.models import Wallet
+from unittest import mock
+from django.core.cache import cache
+from adverts import filecache
+import os
+from urllib.parse import parse_qs, urlparse
+import io
+import base64
+import json
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+import boto3
+import tempfile
+import time
 
 class AdvertAdminTest(TestCase):
     def setUp(self):
@@ -53,4 +79,322 @@ class AdvertModelTest(TestCase):
         )
         advert.full_clean()  # Should not raise an error
         advert.save()
-        self.assertIsNotNone(advert.file)
\ No newline at end of file
+        self.assertIsNotNone(advert.file)
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), SUBMISSION_PROCESSING_SECONDS=2)
+@override_settings(AWS_ACCESS_KEY_ID='test-key', AWS_SECRET_ACCESS_KEY='test-secret', AWS_STORAGE_BUCKET_NAME='test-bucket')
+class SubmissionThroughputTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='viewer', password='pass12345', email='viewer@example.com', phone_number='+254700000101'
+        )
+        package = Package.objects.create(
+            name='Basic', image='packages/basic.jpg', validity_days=30, rate_per_view=90,
+            description='Basic package', price=Decimal('1000')
+        )
+        Purchase.objects.create(user=self.user, package=package)
+        self.adverts = [
+            Advert.objects.create(title=f'Advert {i}', file=f'adverts/advert{i}.jpg', rate_category=90)
+            for i in range(10)
+        ]
+        self.client.force_login(self.user)
+
+    def _submit(self, advert):
+        key = self.client.post(reverse('advert_submit_upload'), {'content_type': 'image/jpeg'}, secure=True).json()['key']
+        s3 = mock.Mock()
+        s3.head_object.return_value = {'ContentLength': 1024, 'ContentType': 'image/jpeg'}
+        with mock.patch('grandview.s3.get_client', return_value=s3):
+            return self.client.post(
+                reverse('advert_submit'),
+                {'advert_id': advert.id, 'views_count': 3, 'screenshot_key': key},
+                content_type='application/json',
+                secure=True,
+            )
+
+    def test_submission_returns_immediately_with_status_url(self):
+        response = self._submit(self.adverts[0])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['status'], 'PROCESSING')
+        self.assertEqual(Wallet.objects.get(user=self.user).views_earnings_balance, Decimal('270'))
+
+        status_response = self.client.get(body['status_url'], secure=True)
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.json()['submission_id'], body['submission_id'])
+
+        Submission.objects.filter(pk=body['submission_id']).update(
+            submission_date=timezone.now() - timedelta(seconds=5)
+        )
+        self.assertEqual(self.client.get(body['status_url'], secure=True).json()['status'], 'COMPLETED')
+
+    def test_submissions_per_second_not_bound_by_sleep(self):
+        # The old view slept 2s per request, capping a worker at 0.5 submissions/second.
+        start = time.perf_counter()
+        for advert in self.adverts:
+            self.assertEqual(self._submit(advert).status_code, 201)
+        elapsed = time.perf_counter() - start
+        rate = len(self.adverts) / elapsed
+        self.assertGreater(rate, 5, f"{rate:.1f} submissions/second")
+
+
+@override_settings(AWS_ACCESS_KEY_ID='test-key', AWS_SECRET_ACCESS_KEY='test-secret', AWS_STORAGE_BUCKET_NAME='test-bucket')
+class SubmissionScreenshotUploadTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='uploader', password='pass12345', email='uploader@example.com', phone_number='+254700000105'
+        )
+        package = Package.objects.create(
+            name='Basic', image='packages/basic.jpg', validity_days=30, rate_per_view=90,
+            description='Basic package', price=Decimal('1000')
+        )
+        Purchase.objects.create(user=self.user, package=package)
+        self.advert = Advert.objects.create(title='Advert', file='adverts/advert.jpg', rate_category=90)
+        self.client.force_login(self.user)
+        self.s3 = mock.Mock()
+        self.s3.head_object.return_value = {'ContentLength': 2048, 'ContentType': 'image/png'}
+
+    def _presign(self, content_type='image/png'):
+        return self.client.post(reverse('advert_submit_upload'), {'content_type': content_type}, secure=True)
+
+    def _submit(self, key):
+        with mock.patch('grandview.s3.get_client', return_value=self.s3):
+            return self.client.post(
+                reverse('advert_submit'),
+                {'advert_id': self.advert.id, 'views_count': 2, 'screenshot_key': key},
+                content_type='application/json',
+                secure=True,
+            )
+
+    def test_presigned_post_pins_key_type_and_size(self):
+        response = self._presign()
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertRegex(body['key'], rf'^submissions/{self.user.pk}/[0-9a-f]{{32}}\.png$')
+        self.assertIn('test-bucket', body['upload_url'])
+        policy = json.loads(base64.b64decode(body['fields']['policy']))
+        self.assertIn(['content-length-range', 1, settings.SUBMISSION_SCREENSHOT_MAX_BYTES], policy['conditions'])
+        self.assertIn({'Content-Type': 'image/png'}, policy['conditions'])
+        self.assertIn({'key': body['key']}, policy['conditions'])
+
+        self.assertEqual(self._presign('application/pdf').status_code, 400)
+
+    def test_submission_stores_the_verified_key(self):
+        key = self._presign().json()['key']
+        response = self._submit(key)
+        self.assertEqual(response.status_code, 201)
+        self.s3.head_object.assert_called_once_with(Bucket='test-bucket', Key=key)
+        submission = Submission.objects.get(pk=response.json()['submission_id'])
+        self.assertEqual(submission.screenshot.name, key)
+        self.assertEqual(response.json()['submission']['screenshot'], key)
+
+    def test_rejects_keys_the_user_does_not_own_or_reuses(self):
+        self.assertEqual(self._submit('submissions/999/' + 'a' * 32 + '.png').status_code, 400)
+        self.assertEqual(self._submit('adverts/advert.jpg').status_code, 400)
+        self.s3.head_object.assert_not_called()
+
+        key = self._presign().json()['key']
+        Submission.objects.create(
+            user=self.user, advert=Advert.objects.create(title='Other', file='adverts/o.jpg', rate_category=90),
+            screenshot=key, earnings=Decimal('0'),
+        )
+        self.assertEqual(self._submit(key).json()['error'], 'Screenshot has already been submitted')
+
+    def test_concurrent_reuse_of_a_key_is_refused_by_the_constraint(self):
+        key = self._presign().json()['key']
+        Submission.objects.create(
+            user=self.user, advert=Advert.objects.create(title='Other', file='adverts/o.jpg', rate_category=90),
+            screenshot=key, earnings=Decimal('0'),
+        )
+        # As if the other submission committed after this one's existence check
+        with mock.patch('adverts.views.verify_screenshot'):
+            response = self._submit(key)
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'Screenshot has already been submitted'))
+        self.assertEqual(Submission.objects.filter(screenshot=key).count(), 1)
+        self.assertEqual(Wallet.objects.get(user=self.user).views_earnings_balance, Decimal('0'))
+
+    def test_rejects_missing_oversized_and_non_image_uploads(self):
+        key = self._presign().json()['key']
+        self.s3.head_object.side_effect = ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        self.assertEqual(self._submit(key).status_code, 400)
+
+        self.s3.head_object.side_effect = None
+        self.s3.head_object.return_value = {'ContentLength': settings.SUBMISSION_SCREENSHOT_MAX_BYTES + 1, 'ContentType': 'image/png'}
+        self.assertEqual(self._submit(key).status_code, 400)
+        self.s3.head_object.return_value = {'ContentLength': 2048, 'ContentType': 'text/html'}
+        self.assertEqual(self._submit(key).status_code, 400)
+        self.assertEqual(self.s3.delete_object.call_count, 2)
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(Wallet.objects.get(user=self.user).views_earnings_balance, Decimal('0'))
+
+    def test_multipart_screenshot_is_still_accepted(self):
+        screenshot = SimpleUploadedFile('shot.jpg', b'\xff\xd8\xff' + b'0' * 1024, content_type='image/jpeg')
+        storage = Submission._meta.get_field('screenshot').storage
+        with mock.patch.object(storage, 'save', side_effect=lambda name, content, max_length=None: name) as save:
+            response = self.client.post(
+                reverse('advert_submit'),
+                {'advert_id': self.advert.id, 'views_count': 2, 'screenshot': screenshot},
+                secure=True,
+            )
+        self.assertEqual(response.status_code, 201)
+        save.assert_called_once()
+
+class AdvertListQueryCountTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='lister', password='pass12345', email='lister@example.com', phone_number='+254700000102'
+        )
+        package = Package.objects.create(
+            name='Standard', image='packages/standard.jpg', validity_days=30, rate_per_view=100,
+            description='Standard package', price=Decimal('2000')
+        )
+        Purchase.objects.create(user=self.user, package=package)
+        self.client.force_login(self.user)
+
+    def _add_adverts(self, count):
+        for i in range(count):
+            advert = Advert.objects.create(title=f'Advert {i}', file=f'adverts/list{i}.jpg', rate_category=100)
+            Submission.objects.create(
+                user=self.user, advert=advert, views_count=1, screenshot=f'submissions/list{advert.pk}.jpg', earnings=Decimal('100')
+            )
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('advert_list'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response.json()
+
+    def test_query_count_is_constant_in_advert_count(self):
+        self._add_adverts(2)
+        baseline, _ = self._count_queries()
+        self._add_adverts(20)
+        queries, body = self._count_queries()
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(body['adverts']), 22)
+        self.assertTrue(all(a['can_submit'] and a['has_submitted'] for a in body['adverts']))
+        self.assertEqual(body['user_package']['rate_per_view'], 100)
+
+@override_settings(AWS_ACCESS_KEY_ID='test-key', AWS_SECRET_ACCESS_KEY='test-secret', AWS_STORAGE_BUCKET_NAME='test-bucket')
+class AdvertDownloadTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='downloader', password='pass12345', email='downloader@example.com', phone_number='+254700000103'
+        )
+        self.advert = Advert.objects.create(title='Download me', file='adverts/promo.mp4', rate_category=100)
+        self.client.force_login(self.user)
+        self.url = reverse('advert_download', args=[self.advert.pk])
+
+    def test_redirects_to_short_lived_presigned_url(self):
+        response = self.client.get(self.url, secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+        location = urlparse(response['Location'])
+        query = parse_qs(location.query)
+        self.assertIn('test-bucket', location.netloc + location.path)
+        self.assertTrue(location.path.endswith('adverts/promo.mp4'))
+        self.assertEqual(query['response-content-disposition'], ['attachment; filename="promo.mp4"'])
+        self.assertEqual(query['X-Amz-Expires'], ['300'])
+
+        response = self.client.get(self.url + '?redirect=false', secure=True)
+        self.assertEqual(response.json()['file_name'], 'promo.mp4')
+        self.assertIn('X-Amz-Signature', response.json()['url'])
+
+    @override_settings(ADVERT_DOWNLOAD_MODE='proxy', ADVERT_CACHE_MAX_BYTES=0)
+    def test_proxy_mode_streams_the_object(self):
+        s3 = mock.Mock()
+        s3.get_object.return_value = {'Body': io.BytesIO(b'video-bytes'), 'ContentType': 'video/mp4'}
+        with mock.patch('grandview.s3.get_client', return_value=s3):
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'video-bytes')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="promo.mp4"')
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertIn(self.client.get(self.url, secure=True).status_code, (401, 403))
+
+class AdvertFileCacheTest(TestCase):
+    body = b'0123456789'
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        overrides = override_settings(ADVERT_DOWNLOAD_MODE='proxy', ADVERT_CACHE_DIR=cache_dir.name, ADVERT_CACHE_MAX_BYTES=1024)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+
+        # A real client with its responses stubbed, so calls are checked against the S3 API
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.stubber = Stubber(self.s3)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+        patcher = mock.patch('grandview.s3.get_client', return_value=self.s3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        user = CustomUser.objects.create_user(
+            username='cached', password='pass12345', email='cached@example.com', phone_number='+254700000104'
+        )
+        advert = Advert.objects.create(title='Cached', file='adverts/cached.mp4', rate_category=100)
+        self.client.force_login(user)
+        self.url = reverse('advert_download', args=[advert.pk])
+
+    def _expect_download(self, etag='"v1"', body=None):
+        body = self.body if body is None else body
+        params = {'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': 'adverts/cached.mp4'}
+        self.stubber.add_response('head_object', {'ETag': etag, 'ContentType': 'video/mp4', 'ContentLength': len(body)}, params)
+        self.stubber.add_response('get_object', {'Body': StreamingBody(io.BytesIO(body), len(body)), 'ETag': etag}, {**params, 'IfMatch': etag})
+
+    def _get(self, **headers):
+        response = self.client.get(self.url, secure=True, headers=headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, content
+
+    def test_second_download_is_served_from_disk(self):
+        self._expect_download()
+        response, content = self._get()
+        self.assertEqual((response.status_code, response['X-Cache'], content), (200, 'MISS', self.body))
+        response, content = self._get()
+        self.assertEqual((response.status_code, response['X-Cache'], content), (200, 'HIT', self.body))
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="cached.mp4"')
+        self.stubber.assert_no_pending_responses()
+        self.assertEqual(filecache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_range_and_revalidation(self):
+        self._expect_download()
+        response, content = self._get(Range='bytes=2-5')
+        self.assertEqual((response.status_code, content, response['Content-Range']), (206, b'2345', 'bytes 2-5/10'))
+        response, content = self._get(Range='bytes=-3')
+        self.assertEqual((response.status_code, content), (206, b'789'))
+        response, content = self._get(Range='bytes=2-5', **{'If-Range': '"v0"'})
+        self.assertEqual((response.status_code, content), (200, self.body))
+        response, _ = self._get(Range='bytes=10-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */10'))
+        response, content = self._get(**{'If-None-Match': '"v1"'})
+        self.assertEqual((response.status_code, content), (304, b''))
+        self.stubber.assert_no_pending_responses()
+
+    def test_object_replaced_after_its_etag_was_cached(self):
+        params = {'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': 'adverts/cached.mp4'}
+        self.stubber.add_response('head_object', {'ETag': '"v1"', 'ContentType': 'video/mp4', 'ContentLength': 10}, params)
+        self.stubber.add_client_error('get_object', 'PreconditionFailed', http_status_code=412, expected_params={**params, 'IfMatch': '"v1"'})
+        self._expect_download(etag='"v2"', body=b'new body')
+        response, content = self._get()
+        self.assertEqual((response.status_code, response['ETag'], content), (200, '"v2"', b'new body'))
+        self.stubber.assert_no_pending_responses()
+        self.assertEqual([n for n in os.listdir(settings.ADVERT_CACHE_DIR) if n.startswith(filecache.PART_PREFIX)], [])
+
+    def test_least_recently_used_files_are_evicted(self):
+        paths = []
+        for i, age in enumerate((300, 100, 200)):
+            path = os.path.join(settings.ADVERT_CACHE_DIR, f'file{i}')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 400)
+            os.utime(path, (time.time() - age, time.time() - age))
+            paths.append(path)
+        filecache.evict()
+        self.assertEqual([os.path.exists(p) for p in paths], [False, True, True])
+        filecache.evict(max_bytes=500)
+        self.assertEqual([os.path.exists(p) for p in paths], [False, True, False])
@@ -3,26 +3,34 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.parsers import FormParser, JSONParser
 from rest_framework.exceptions import UnsupportedMediaType, ParseError, ValidationError
+from rest_framework.pagination import CursorPagination
 from django.http import HttpResponseRedirect  # Changed from HttpResponse
 from django.http import StreamingHttpResponse
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from .models import Advert, Submission
 from packages.models import Package, Purchase
 from wallet.models import Wallet, Transaction
-from .serializers import AdvertSerializer, SubmissionSerializer
+from wallet import ledger
+from accounts.stats import get_stats
+from wallet.history import TransactionCursorPagination, transaction_history, transaction_totals
+from .serializers import AdvertSerializer, SubmissionSerializer, advert_user_context, get_active_purchase
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from decimal import Decimal
 import logging
 from django.db.models import Sum
-import time
+from datetime import timedelta
 from django.conf import settings
-import boto3
+from grandview import s3
+from grandview.uploads import LimitedMultiPartParser, UploadRejected
+from botocore.exceptions import ClientError
+from . import filecache
+from .screenshots import ALREADY_SUBMITTED, CONTENT_TYPES as SCREENSHOT_TYPES, ScreenshotRejected, presign_upload, verify as verify_screenshot
 import os
-from django.core.mail import send_mail  # Added for email
-from django.template.loader import render_to_string  # Added for template rendering
+from notifications.mail import queue_email
 from .serializers import TransactionSerializer 
 from premium.models import AgentPurchase
 
@@ -33,55 +41,72 @@ class AdvertListView(APIView):
 
     def get(self, request):
         adverts = Advert.objects.all()
-        serializer = AdvertSerializer(adverts, many=True, context={'request': request})
+        purchase = get_active_purchase(request.user) if request.user.is_authenticated else None
+        context = {'request': request, **advert_user_context(request.user, purchase)}
+        serializer = AdvertSerializer(adverts, many=True, context=context)
         data = serializer.data
 
         user_package = None
-        if request.user.is_authenticated:
-            active_purchases = Purchase.objects.filter(
-                user=request.user,
-                expiry_date__gt=timezone.now()
-            ).order_by('-purchase_date')
-            if active_purchases.exists():
-                purchase = active_purchases.first()
-                user_package = {
-                    'name': purchase.package.name,
-                    'rate_per_view': purchase.package.rate_per_view,
-                    'expiry_date': purchase.expiry_date.isoformat(),
-                    'days_remaining': (purchase.expiry_date - timezone.now()).days,
-                }
+        if purchase:
+            user_package = {
+                'name': purchase.package.name,
+                'rate_per_view': purchase.package.rate_per_view,
+                'expiry_date': purchase.expiry_date.isoformat(),
+                'days_remaining': (purchase.expiry_date - timezone.now()).days,
+            }
 
         return Response({'adverts': data, 'user_package': user_package})
 
 class AdvertDownloadView(APIView):
+    """Hands the signed-in user an advert file.
+
+    By default the response is a redirect to a short-lived presigned S3 URL,
+    so the transfer itself never occupies a web worker; ``?redirect=false``
+    returns that URL as JSON instead. With ``ADVERT_DOWNLOAD_MODE = 'proxy'``
+    the file is served through Django, for buckets browsers cannot reach,
+    from a local disk cache (see adverts.filecache).
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
         advert = get_object_or_404(Advert, pk=pk)
         file_key = advert.file.name  # e.g., 'adverts/filename.pdf'
+        file_name = os.path.basename(file_key)
         logger.info(f"Attempting to download advert {pk} with file_key: {file_key}")
 
-        # Initialize s3_client
+        if settings.ADVERT_DOWNLOAD_MODE == 'proxy':
+            return self._proxy(request, pk, file_key, file_name)
+        return self._redirect(request, pk, file_key, file_name)
+
+    def _redirect(self, request, pk, file_key, file_name):
         try:
-            logger.debug(f"Initializing S3 client with bucket: {settings.AWS_STORAGE_BUCKET_NAME}, region: {settings.AWS_S3_REGION_NAME}")
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
+            url = s3.presigned_url(
+                'get_object', file_key, settings.ADVERT_DOWNLOAD_URL_EXPIRY,
+                ResponseContentDisposition=f'attachment; filename="{file_name}"',
             )
         except Exception as e:
-            logger.error(f"Failed to initialize S3 client: {str(e)}")
-            return Response({"error": f"Failed to initialize S3 client: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            logger.error(f"Failed to presign download for advert {pk}: {str(e)}")
+            return Response({"error": f"Failed to download file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if request.query_params.get('redirect') == 'false':
+            response = Response({'url': url, 'file_name': file_name, 'expires_in': settings.ADVERT_DOWNLOAD_URL_EXPIRY})
+        else:
+            response = HttpResponseRedirect(url)
+        # The URL stops working after ADVERT_DOWNLOAD_URL_EXPIRY, so it must not be cached
+        response['Cache-Control'] = 'private, no-store'
+        return response
 
+    def _proxy(self, request, pk, file_key, file_name):
         # Retrieve file from S3
         try:
+            if settings.ADVERT_CACHE_MAX_BYTES:
+                # Popular files are served from local disk, which also answers Range and If-None-Match
+                return filecache.file_response(request, file_key, file_name)
             logger.debug(f"Fetching file from S3: Bucket={settings.AWS_STORAGE_BUCKET_NAME}, Key={file_key}")
-            response = s3_client.get_object(
+            response = s3.get_client().get_object(
                 Bucket=settings.AWS_STORAGE_BUCKET_NAME,
                 Key=file_key
             )
-            file_name = os.path.basename(file_key)
             logger.info(f"Successfully fetched file: {file_name}")
             response = StreamingHttpResponse(
                 response['Body'],
@@ -89,17 +114,44 @@ class AdvertDownloadView(APIView):
             )
             response['Content-Disposition'] = f'attachment; filename="{file_name}"'
             return response
-        except s3_client.exceptions.NoSuchKey:
-            logger.error(f"File not found in S3: Bucket={settings.AWS_STORAGE_BUCKET_NAME}, Key={file_key}")
-            return Response({"error": "File not found in S3"}, status=status.HTTP_404_NOT_FOUND)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                logger.error(f"File not found in S3: Bucket={settings.AWS_STORAGE_BUCKET_NAME}, Key={file_key}")
+                return Response({"error": "File not found in S3"}, status=status.HTTP_404_NOT_FOUND)
+            logger.error(f"Failed to download file for advert {pk}: {str(e)}")
+            return Response({"error": f"Failed to download file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except Exception as e:
             logger.error(f"Failed to download file for advert {pk}: {str(e)}")
             return Response({"error": f"Failed to download file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
+
+class SubmissionUploadView(APIView):
+    """Presigned POST for uploading a submission screenshot straight to the bucket."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            upload = presign_upload(request.user, request.data.get('content_type', 'image/jpeg'))
+        except ScreenshotRejected as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Failed to presign screenshot upload for {request.user.username}: {str(e)}")
+            return Response({"error": "Failed to generate upload URL"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        upload['expires_in'] = settings.SUBMISSION_UPLOAD_URL_EXPIRY
+        return Response(upload)
 
 class SubmissionView(APIView):
+    """Records an advert submission and credits its earnings.
+
+    The screenshot is normally sent as ``screenshot_key``, the key of an
+    object uploaded through SubmissionUploadView, which is checked with a
+    HEAD request; a multipart ``screenshot`` file is still accepted.
+    """
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [LimitedMultiPartParser, FormParser, JSONParser]
+
+    def get_upload_limits(self):
+        # Read per request, so a changed SUBMISSION_SCREENSHOT_MAX_BYTES applies without a restart
+        return {'screenshot': (settings.SUBMISSION_SCREENSHOT_MAX_BYTES, tuple(SCREENSHOT_TYPES))}
 
     @transaction.atomic
     def post(self, request):
@@ -111,6 +163,7 @@ class SubmissionView(APIView):
             advert_id_raw = request.data.get('advert_id', None)
             views_count_str = request.data.get('views_count', None)  # Fixed typo from 'reques...' in the truncated code
             screenshot = request.FILES.get('screenshot', None)
+            screenshot_key = request.data.get('screenshot_key', None)
 
             try:
                 advert_id = int(advert_id_raw)
@@ -139,7 +192,7 @@ class SubmissionView(APIView):
                 return Response({"error": "No active package for this rate category"}, status=status.HTTP_400_BAD_REQUEST)
 
             # Check if already submitted today
-            today = timezone.now().date()
+            today = timezone.localdate()
             if Submission.objects.filter(
                 user=request.user,
                 advert=advert,
@@ -147,60 +200,73 @@ class SubmissionView(APIView):
             ).exists():
                 return Response({"error": "Already submitted for this advert today"}, status=status.HTTP_400_BAD_REQUEST)
 
-            if not screenshot:
+            if screenshot_key:
+                try:
+                    verify_screenshot(request.user, screenshot_key)
+                except ScreenshotRejected as e:
+                    logger.warning(f"Rejected screenshot {screenshot_key} from {request.user.username}: {str(e)}")
+                    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                screenshot = screenshot_key
+            elif not screenshot:
                 logger.warning("No screenshot file provided")
                 return Response({"error": "Screenshot is required"}, status=status.HTTP_400_BAD_REQUEST)
-
-            if screenshot.size > 5 * 1024 * 1024:  # 5MB limit
+            elif screenshot.size > settings.SUBMISSION_SCREENSHOT_MAX_BYTES:
                 return Response({"error": "Screenshot file too large (max 5MB)"}, status=status.HTTP_400_BAD_REQUEST)
 
             earnings = Decimal(views_count) * Decimal(advert.rate_category)
 
-            submission = Submission.objects.create(
-                user=request.user,
-                advert=advert,
-                views_count=views_count,
-                screenshot=screenshot,
-                earnings=earnings
-            )
-
-            wallet = Wallet.objects.get(user=request.user)
-            wallet.views_earnings_balance += earnings
-            wallet.save()
-
-            Transaction.objects.create(
-                user=request.user,
-                amount=earnings,
-                transaction_type='EARNING',
-                description=f'Earned KSH {earnings} from {views_count} views of "{advert.title}"'
+            try:
+                with transaction.atomic():
+                    submission = Submission.objects.create(
+                        user=request.user,
+                        advert=advert,
+                        views_count=views_count,
+                        screenshot=screenshot,
+                        earnings=earnings
+                    )
+            except IntegrityError:
+                if not screenshot_key:
+                    raise
+                # Another submission claimed the same uploaded key after verify_screenshot passed
+                logger.warning(f"Screenshot {screenshot_key} from {request.user.username} was submitted concurrently")
+                return Response({"error": ALREADY_SUBMITTED}, status=status.HTTP_400_BAD_REQUEST)
+
+            ledger.credit(
+                request.user,
+                earnings,
+                'EARNING',
+                f'Earned KSH {earnings} from {views_count} views of "{advert.title}"',
             )
 
-            time.sleep(2)
-
-            # Prepare and send earning notification email
+            # Queue earning notification email
             try:
-                subject = 'Congratulations on Your Earnings!'
-                context = {
-                    'user': request.user,
-                    'advert_title': advert.title,
-                    'earnings': earnings,
-                    'views_count': views_count,
-                }
-                message = render_to_string('emails/earning_notification.html', context)
-                send_mail(
-                    subject=subject,
-                    message='',  # Plain text fallback (empty since HTML is primary)
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                queue_email(
+                    subject='Congratulations on Your Earnings!',
+                    template='emails/earning_notification.html',
+                    context={
+                        'user': request.user,
+                        'advert_title': advert.title,
+                        'earnings': earnings,
+                        'views_count': views_count,
+                    },
                     recipient_list=[request.user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                logger.error(f"Failed to send earning notification email to {request.user.email}: {str(e)}")
+                logger.error(f"Failed to queue earning notification email to {request.user.email}: {str(e)}")
 
             serializer = SubmissionSerializer(submission)
             logger.info(f"Submission created successfully: ID={submission.id}, earnings={earnings}")
-            return Response({'submission': serializer.data}, status=status.HTTP_201_CREATED)
+            # Earnings are already committed; any "processing" pause is shown by the client,
+            # which can poll the status endpoint instead of holding this worker.
+            return Response({
+                'submission': serializer.data,
+                'submission_id': submission.id,
+                'status': submission_status(submission),
+                'status_url': reverse('submission_status', args=[submission.id]),
+            }, status=status.HTTP_201_CREATED)
+        except UploadRejected as e:
+            logger.warning(f"Upload rejected: {str(e.detail)}")
+            return Response({"error": str(e.detail)}, status=e.status_code)
         except UnsupportedMediaType as e:
             logger.warning(f"Media type error: {str(e)}")
             return Response({"error": "Invalid request format. Use multipart/form-data for file uploads."}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
@@ -217,16 +283,46 @@ class SubmissionView(APIView):
             logger.error(f"Unexpected error in submission: {str(e)}")
             return Response({"error": "An unexpected error occurred. Please try again."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def submission_ready_at(submission):
+    return submission.submission_date + timedelta(seconds=settings.SUBMISSION_PROCESSING_SECONDS)
+
+def submission_status(submission):
+    return 'COMPLETED' if timezone.now() >= submission_ready_at(submission) else 'PROCESSING'
+
+class SubmissionStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        submission = get_object_or_404(Submission.objects.select_related('advert'), pk=pk, user=request.user)
+        return Response({
+            'submission_id': submission.id,
+            'status': submission_status(submission),
+            'ready_at': submission_ready_at(submission).isoformat(),
+            'earnings': str(submission.earnings),
+            'advert_title': submission.advert.title,
+        })
+
+class SubmissionCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-submission_date', '-id')
+
 class SubmissionHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        submissions = Submission.objects.filter(user=request.user).order_by('-submission_date')
-        serializer = SubmissionSerializer(submissions, many=True)
-        total_earnings = submissions.aggregate(total=Sum('earnings'))['total'] or Decimal('0.00')
+        paginator = SubmissionCursorPagination()
+        submissions = Submission.objects.filter(user=request.user).select_related('advert')
+        page = paginator.paginate_queryset(submissions, request, view=self)
+        serializer = SubmissionSerializer(page, many=True)
+        stats = get_stats(request.user)
         return Response({
             'submissions': serializer.data,
-            'total_earnings': float(total_earnings)
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'total_earnings': float(stats.lifetime_earnings),
+            'submission_count': stats.submission_count,
         })
 
 class WithdrawalView(APIView):
@@ -293,43 +389,35 @@ class WithdrawalView(APIView):
                 if not AgentPurchase.objects.filter(user=request.user, status='ACTIVE').exists():
                     return Response({"success": False, "message": "You must be a verified agent to withdraw earnings. Please verify your account."}, status=status.HTTP_400_BAD_REQUEST)
 
-            wallet = Wallet.objects.get(user=request.user)
-            if wallet.views_earnings_balance < amount:
+            try:
+                ledger.debit(
+                    request.user,
+                    amount,
+                    'WITHDRAWAL',
+                    f'Withdrew KSH {amount} from views earnings',
+                    balance='views_earnings_balance',
+                )
+            except ledger.InsufficientFunds:
                 return Response({"success": False, "message": "Insufficient balance"}, status=status.HTTP_400_BAD_REQUEST)
 
-            wallet.views_earnings_balance -= amount
-            wallet.save()
-
-            Transaction.objects.create(
-                user=request.user,
-                amount=-amount,
-                transaction_type='WITHDRAWAL',
-                description=f'Withdrew KSH {amount} from views earnings'
-            )
-
-            # Send email
+            # Queue email
             try:
-                subject = 'Withdrawal Successful!'
-                context = {
-                    'user': request.user,
-                    'amount': amount,
-                }
-                message = render_to_string('emails/withdrawal_notification.html', context)
-                send_mail(
-                    subject=subject,
-                    message='',  # Plain text fallback
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                queue_email(
+                    subject='Withdrawal Successful!',
+                    template='emails/withdrawal_notification.html',
+                    context={
+                        'user': request.user,
+                        'amount': amount,
+                    },
                     recipient_list=[request.user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                logger.error(f"Failed to send withdrawal notification email to {request.user.email}: {str(e)}")
+                logger.error(f"Failed to queue withdrawal notification email to {request.user.email}: {str(e)}")
 
             return Response({
                 "success": True,
                 "message": "Withdrawal successful",
-                "new_balance": float(wallet.views_earnings_balance)
+                "new_balance": float(Wallet.objects.values_list('views_earnings_balance', flat=True).get(user=request.user))
             }, status=status.HTTP_200_OK)
 
         except Wallet.DoesNotExist:
@@ -343,10 +431,13 @@ class TransactionHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        transactions = Transaction.objects.filter(user=request.user).order_by('-created_at')
-        serializer = TransactionSerializer(transactions, many=True)
-        total_amount = transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        paginator = TransactionCursorPagination()
+        transactions = transaction_history(request)
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        serializer = TransactionSerializer(page, many=True)
         return Response({
             'transactions': serializer.data,
-            'total_amount': float(total_amount)
-        })
\ No newline at end of file
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            **transaction_totals(request, transactions),
+        })
@@ -0,0 +1,197 @@
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from .seed import PASSWORD
+
+# Endpoints whose happy path calls S3 are listed but not timed
+NEEDS_S3 = "Calls S3"
+# Presigned URLs are signed locally without calling S3, so placeholder credentials are enough
+PRESIGN_ONLY = {'AWS_ACCESS_KEY_ID': 'bench-key', 'AWS_SECRET_ACCESS_KEY': 'bench-secret'}
+
+class Endpoint:
+    """One benchmarked request.
+
+    ``route`` is the URL pattern with ``{name}`` placeholders for its
+    arguments. ``prepare`` runs untimed before every call and may return a
+    dict overriding ``user``, ``data`` and ``kwargs``, for requests that
+    consume a row (a claimed bonus, a confirmed order, a new account).
+    ``user`` names a Dataset attribute, or is None for anonymous calls.
+    ``repeat_scale`` multiplies the runner's timed calls, for endpoints
+    whose case of interest is a flood of identical requests. ``settings``
+    are overridden while the endpoint is measured.
+    """
+
+    def __init__(self, name, route, method='get', user='member', data=None, kwargs=None, prepare=None,
+                 format='json', expect=200, skip=None, repeat_scale=1, settings=None):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.user = user
+        self.data = data
+        self.kwargs = kwargs
+        self.prepare = prepare
+        self.format = format
+        self.expect = expect
+        self.skip = skip
+        self.repeat_scale = repeat_scale
+        self.settings = settings or {}
+
+    def call(self, dataset):
+        """Return the (user, path, data) for the next request."""
+        values = {
+            'user': self.user,
+            'data': self.data(dataset) if callable(self.data) else self.data,
+            'kwargs': self.kwargs(dataset) if callable(self.kwargs) else self.kwargs,
+        }
+        if self.prepare:
+            values.update(self.prepare(dataset))
+        user = values['user']
+        if isinstance(user, str):
+            user = getattr(dataset, user)
+        return user, '/' + self.route.format(**(values['kwargs'] or {})), values['data']
+
+def _screenshot():
+    return SimpleUploadedFile('bench.jpg', b'\xff\xd8\xff' + b'0' * 2048, content_type='image/jpeg')
+
+def _change_password(ds):
+    return {
+        'user': ds.new_user(),
+        'data': {'current_password': PASSWORD, 'new_password': 'bench-pass-456', 'new_password_confirm': 'bench-pass-456'},
+    }
+
+def _verify_email(ds):
+    user = ds.new_user(email_verification_code='123456', email_verification_expiry=timezone.now() + timedelta(hours=1))
+    return {'user': user, 'data': {'verification_code': '123456'}}
+
+def _checkout(ds):
+    ds.cart_item()
+    return {'data': {'payment_method': 'FULL', 'address': 'Bench street', 'phone': '0711000002', 'delivery_fee': '0'}}
+
+def _stk_callback(ds, deposit=None):
+    deposit = deposit or ds.pending_deposit()
+    return {'data': {'Body': {'stkCallback': {
+        'MerchantRequestID': 'bench',
+        'CheckoutRequestID': deposit.transaction_id,
+        'ResultCode': 0,
+        'ResultDesc': 'The service request is processed successfully.',
+        'CallbackMetadata': {'Item': [
+            {'Name': 'Amount', 'Value': float(deposit.amount)},
+            {'Name': 'MpesaReceiptNumber', 'Value': f'BENCH{deposit.pk}'},
+            {'Name': 'PhoneNumber', 'Value': 254711000002},
+            {'Name': 'TransactionDate', 'Value': 20260101120000},
+        ]},
+    }}}}
+
+ENDPOINTS = [
+    # accounts
+    Endpoint('register', 'api/accounts/register/', 'post', user=None, prepare=lambda ds: {'data': ds.registration()}, expect=201),
+    Endpoint('login', 'api/accounts/login/', 'post', user=None, data={'username': 'bench_member', 'password': PASSWORD}),
+    Endpoint('user_update', 'api/accounts/users/update/', 'patch', data={'username': 'bench_member'}),
+    Endpoint('referral_stats', 'api/accounts/users/referral-stats/', user='marketer'),
+    Endpoint('change_password', 'api/accounts/users/change-password/', 'post', prepare=_change_password),
+    Endpoint('verify_email', 'api/accounts/users/verify-email/', 'post', prepare=_verify_email),
+
+    # adverts
+    Endpoint('advert_list', 'api/adverts/'),
+    Endpoint('advert_download', 'api/adverts/{pk}/download/', kwargs=lambda ds: {'pk': ds.fresh_advert().pk},
+             settings=PRESIGN_ONLY, expect=302),
+    Endpoint('advert_download_proxy', 'api/adverts/{pk}/download/', kwargs=lambda ds: {'pk': ds.fresh_advert().pk},
+             settings={'ADVERT_DOWNLOAD_MODE': 'proxy'}, skip=NEEDS_S3),
+    Endpoint('advert_submit', 'api/adverts/submit/', 'post', format='multipart', expect=201,
+             data=lambda ds: {'advert_id': ds.fresh_advert().pk, 'views_count': 3, 'screenshot': _screenshot()}, skip=NEEDS_S3),
+    Endpoint('advert_submit_upload', 'api/adverts/submit/upload/', 'post', data={'content_type': 'image/jpeg'},
+             settings=PRESIGN_ONLY),
+    Endpoint('submission_history', 'api/submissions/'),
+    Endpoint('submission_status', 'api/submissions/{pk}/status/', kwargs=lambda ds: {'pk': ds.submission.pk}),
+    Endpoint('withdraw_status', 'api/withdraw/'),
+    Endpoint('withdraw', 'api/withdraw/', 'post', data={'amount': '10'}),
+    Endpoint('advert_transactions', 'api/transactions/'),
+
+    # dashboard
+    Endpoint('product_list', 'api/dashboard/products/', user=None),
+    Endpoint('all_products', 'api/dashboard/all-products/', user=None),
+    Endpoint('all_products_search', 'api/dashboard/all-products/', user=None,
+             data={'q': 'bench', 'installments': 'true', 'max_price': '5000'}),
+    Endpoint('category_list', 'api/dashboard/categories/', user=None),
+    Endpoint('product_detail', 'api/dashboard/products/{pk}/', user=None, kwargs=lambda ds: {'pk': ds.product.pk}),
+    Endpoint('cart', 'api/dashboard/cart/'),
+    Endpoint('add_to_cart', 'api/dashboard/cart/add/', 'post', data=lambda ds: {'product_id': ds.product.pk, 'quantity': 1}, expect=201),
+    Endpoint('update_cart', 'api/dashboard/cart/update/', 'post', data=lambda ds: {'cart_item_id': ds.cart_item().pk, 'quantity': 2}),
+    Endpoint('remove_from_cart', 'api/dashboard/cart/remove/', 'post', data=lambda ds: {'cart_item_id': ds.cart_item().pk}),
+    Endpoint('checkout', 'api/dashboard/checkout/', 'post', prepare=_checkout, expect=201),
+    Endpoint('order_list', 'api/dashboard/orders/'),
+    Endpoint('installment_orders', 'api/dashboard/installment/orders/'),
+    Endpoint('installment_payment', 'api/dashboard/installment/pay/', 'post', expect=201,
+             data=lambda ds: {'installment_order_id': ds.installment_order.pk, 'amount': '100'}),
+    Endpoint('lipa_register', 'api/dashboard/lipa/register/', 'post', format='multipart', expect=201, skip=NEEDS_S3),
+    Endpoint('lipa_registration', 'api/dashboard/lipa/registration/'),
+    Endpoint('lipa_presign', 'api/dashboard/lipa/presign/', 'post', data={'file_name': 'id.jpg', 'file_type': 'image/jpeg'},
+             settings=PRESIGN_ONLY),
+    Endpoint('track_order', 'api/dashboard/orders/{order_id}/track/', kwargs=lambda ds: {'order_id': ds.order.pk}),
+    Endpoint('confirm_delivery', 'api/dashboard/orders/{order_id}/confirm/', 'post',
+             kwargs=lambda ds: {'order_id': ds.order_in('SHIPPED').pk}),
+    Endpoint('submit_rating', 'api/dashboard/orders/{order_id}/rate/', 'post', data={'rating': 5},
+             kwargs=lambda ds: {'order_id': ds.order_in('DELIVERED').pk}),
+    Endpoint('coupon_validate', 'api/dashboard/coupon/validate/', 'post', data={'coupon_code': 'BENCH10'}),
+    Endpoint('recent_activity', 'api/dashboard/recent-activity/'),
+
+    # packages
+    Endpoint('package_list', 'api/packages/', user=None),
+    Endpoint('package_purchase', 'api/packages/purchase/', 'post', expect=201,
+             prepare=lambda ds: {'user': ds.new_user(), 'data': {'package': ds.packages[120].pk}}),
+    Endpoint('user_purchases', 'api/packages/purchases/'),
+    Endpoint('package_cashback_claim', 'api/packages/cashback/claim/', 'post', prepare=lambda ds: ds.reset_cashback() or {}),
+
+    # wallet
+    Endpoint('wallet', 'api/wallet/'),
+    Endpoint('deposit', 'api/wallet/deposit/', 'post', expect=201,
+             data=lambda ds: {'amount': '100', 'deposit_method': 'manual', 'mpesa_code': f'BENCH{ds.serial()}'}),
+    Endpoint('deposit_stk', 'api/wallet/deposit/', 'post', data={'amount': '100', 'deposit_method': 'stk', 'phone_number': '254711000002'}, expect=202),
+    Endpoint('deposit_status', 'api/wallet/deposit/{pk}/status/', kwargs=lambda ds: {'pk': ds.pending_deposit().pk}),
+    Endpoint('withdraw_main', 'api/wallet/withdraw/main/', 'post', data={'amount': '10', 'mpesa_number': '0711000002'}, expect=201),
+    Endpoint('withdraw_referral', 'api/wallet/withdraw/referral/', 'post', data={'amount': '10', 'mpesa_number': '0711000002'}, expect=201),
+    Endpoint('transactions', 'api/wallet/transactions/'),
+    Endpoint('mpesa_callback', 'api/callback/', 'post', user=None, prepare=_stk_callback),
+    # The warm-up call settles the deposit; the 2000 timed duplicates must each be a one-query no-op
+    Endpoint('mpesa_callback_replay', 'api/callback/', 'post', user=None, repeat_scale=100,
+             prepare=lambda ds: _stk_callback(ds, ds.replayed_deposit()),
+             settings={'MPESA_CALLBACK_THROTTLE_RATE': '100000/minute'}),
+
+    # support
+    Endpoint('support_messages', 'api/support/messages/'),
+    Endpoint('support_post', 'api/support/messages/', 'post', data={'content': 'Bench question'}, expect=201),
+    Endpoint('support_private_message', 'api/support/messages/private/', 'post', format='multipart',
+             data={'content': 'Bench private question'}, expect=201),
+    Endpoint('support_comments', 'api/support/messages/{message_id}/comment/', kwargs=lambda ds: {'message_id': ds.support_message.pk}),
+    Endpoint('support_comment', 'api/support/messages/{message_id}/comment/', 'post', data={'content': 'Bench reply'}, expect=201,
+             kwargs=lambda ds: {'message_id': ds.support_message.pk}),
+    Endpoint('support_thread', 'api/support/messages/{message_id}/thread/', kwargs=lambda ds: {'message_id': ds.support_message.pk}),
+    Endpoint('support_like', 'api/support/messages/{message_id}/like/', 'post', expect=201,
+             kwargs=lambda ds: {'message_id': ds.fresh_message().pk}),
+    Endpoint('support_pin', 'api/support/messages/{message_id}/pin/', 'post', user='staff',
+             kwargs=lambda ds: {'message_id': ds.support_message.pk}),
+    Endpoint('support_mute', 'api/support/users/{user_id}/mute/', 'post', user='staff', expect=201,
+             kwargs=lambda ds: {'user_id': ds.new_user().pk}),
+    Endpoint('support_block', 'api/support/users/{user_id}/block/', 'post', user='staff', expect=201,
+             kwargs=lambda ds: {'user_id': ds.new_user().pk}),
+    Endpoint('user_profile', 'api/support/users/{user_id}/profile/', user=None, kwargs=lambda ds: {'user_id': ds.member.pk}),
+    Endpoint('support_upload', 'api/support/upload/', 'post', settings=PRESIGN_ONLY),
+    Endpoint('private_messages', 'api/support/private-messages/'),
+    Endpoint('private_message_send', 'api/support/private-messages/', 'post', format='multipart', expect=201,
+             data=lambda ds: {'receiver': ds.staff.pk, 'content': 'Bench direct message'}),
+    Endpoint('conversation', 'api/support/private-messages/{receiver_id}/', kwargs=lambda ds: {'receiver_id': ds.staff.pk}),
+    Endpoint('admin_list', 'api/support/admins/', user=None),
+
+    # premium
+    Endpoint('agent_package_list', 'api/premium/packages/', user=None),
+    Endpoint('agent_purchase', 'api/premium/purchase/', 'post', expect=201,
+             prepare=lambda ds: {'user': ds.new_user(), 'data': {'package': ds.agent_package.pk}}),
+    Endpoint('user_agent_purchases', 'api/premium/purchases/'),
+    Endpoint('user_cashback_bonuses', 'api/premium/cashback/'),
+    Endpoint('user_weekly_bonuses', 'api/premium/weekly-bonus/'),
+    Endpoint('weekly_bonus_claim', 'api/premium/weekly-bonus/claim/', 'post', data=lambda ds: {'bonus_id': ds.weekly_bonus().pk}),
+    Endpoint('premium_cashback_claim', 'api/premium/cashback/claim/', 'post', data=lambda ds: {'bonus_id': ds.agent_cashback().pk}),
+
+    # admin
+    Endpoint('admin_index', 'admin/', user='staff'),
+]
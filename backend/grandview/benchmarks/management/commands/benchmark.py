@@ -0,0 +1,86 @@
+# benchmarks/management/commands/benchmark.py
+import json
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from benchmarks.endpoints import ENDPOINTS
+from benchmarks.runner import Runner, compare, unexpected_statuses
+from benchmarks.seed import Dataset
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'baseline.json')
+
+class Command(BaseCommand):
+    help = 'Seeds a throwaway test database, calls every endpoint and checks query counts, latency and memory against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the seeded row counts')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed calls per endpoint')
+        parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+        parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline instead of comparing')
+        parser.add_argument('--only', nargs='+', metavar='NAME', help='Benchmark just these endpoints')
+        parser.add_argument('--time-tolerance', type=float, default=0.5, help='Allowed relative latency growth')
+        parser.add_argument('--memory-tolerance', type=float, default=0.5, help='Allowed relative memory growth')
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options['only']:
+            unknown = set(options['only']) - {e.name for e in ENDPOINTS}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = [e for e in ENDPOINTS if e.name in options['only']]
+
+        baseline = None
+        if not options['update_baseline']:
+            if not os.path.exists(options['baseline']):
+                raise CommandError(f"No baseline at {options['baseline']}; run with --update-baseline first")
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            if baseline['scale'] != options['scale']:
+                raise CommandError(f"The baseline was recorded at scale {baseline['scale']}; pass --scale {baseline['scale']}")
+
+        results = self._run(endpoints, options)
+        failures = unexpected_statuses(endpoints, results)
+
+        if options['update_baseline']:
+            if failures:
+                raise CommandError('Not writing a baseline with failing endpoints:\n  ' + '\n  '.join(failures))
+            if options['only'] and os.path.exists(options['baseline']):
+                with open(options['baseline']) as f:
+                    previous = json.load(f)
+                previous['endpoints'].update(results)
+                results = previous['endpoints']
+            with open(options['baseline'], 'w') as f:
+                json.dump({'scale': options['scale'], 'repeat': options['repeat'], 'endpoints': results}, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote baseline for {len(results)} endpoints to {options['baseline']}"))
+            return
+
+        regressions = failures + compare(
+            results, baseline['endpoints'],
+            time_tolerance=options['time_tolerance'],
+            memory_tolerance=options['memory_tolerance'],
+        )
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} endpoints within the baseline"))
+
+    def _run(self, endpoints, options):
+        setup_test_environment(debug=False)
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(SECURE_SSL_REDIRECT=False, MEDIA_ROOT=media_root):
+                dataset = Dataset(scale=options['scale']).seed()
+                return Runner(dataset, repeat=options['repeat']).run(endpoints, progress=self._report)
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+    def _report(self, name, result):
+        if 'skipped' in result:
+            self.stdout.write(f"{name:<28} skipped ({result['skipped']})")
+        else:
+            self.stdout.write(
+                f"{name:<28} {result['status']}  {result['queries']:>4} queries  "
+                f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  peak {result['peak_kb']:>8.1f}KB"
+            )
@@ -0,0 +1,123 @@
+from math import ceil
+from statistics import median
+from time import perf_counter
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+import tracemalloc
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+class Runner:
+    """Calls each endpoint against a seeded Dataset and measures it.
+
+    The first call of each endpoint warms caches and is discarded. The query
+    count comes from the last timed call, and peak memory from one extra call
+    made under tracemalloc so its overhead stays out of the timings.
+    """
+
+    def __init__(self, dataset, repeat=20):
+        self.dataset = dataset
+        self.repeat = repeat
+        self.client = APIClient()
+        self._user = None
+
+    def _login(self, user):
+        if user == self._user:
+            return
+        if user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(user)
+        self._user = user
+
+    def _request(self, endpoint):
+        user, path, data = endpoint.call(self.dataset)
+        self._login(user)
+        # The API's day-long throttles would otherwise trip partway through a run;
+        # UserRateThrottle counts anonymous requests by IP too
+        cache.delete_many([f'throttle_user_{user.pk}'] if user else [
+            'throttle_anon_127.0.0.1', 'throttle_user_127.0.0.1', 'throttle_mpesa_callback_127.0.0.1',
+        ])
+        options = {'secure': True}
+        if endpoint.method != 'get':
+            options['format'] = endpoint.format
+        return lambda: getattr(self.client, endpoint.method)(path, data, **options)
+
+    def measure(self, endpoint):
+        timings = []
+        for i in range(self.repeat * endpoint.repeat_scale + 1):
+            send = self._request(endpoint)
+            # Each request clears the query log when it starts, so capture from an empty log
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                started = perf_counter()
+                response = send()
+                elapsed = perf_counter() - started
+            query_count = len(queries)
+            if i:
+                timings.append(elapsed * 1000)
+
+        send = self._request(endpoint)
+        tracemalloc.start()
+        try:
+            send()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'method': endpoint.method.upper(),
+            'route': endpoint.route,
+            'status': response.status_code,
+            'queries': query_count,
+            'p50_ms': round(median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def run(self, endpoints, progress=None):
+        results = {}
+        for endpoint in endpoints:
+            if endpoint.skip:
+                results[endpoint.name] = {'method': endpoint.method.upper(), 'route': endpoint.route, 'skipped': endpoint.skip}
+            else:
+                with override_settings(**endpoint.settings):
+                    results[endpoint.name] = self.measure(endpoint)
+            if progress:
+                progress(endpoint.name, results[endpoint.name])
+        return results
+
+def unexpected_statuses(endpoints, results):
+    return [
+        f"{e.name}: expected {e.expect}, got {results[e.name]['status']}"
+        for e in endpoints if e.name in results and 'skipped' not in results[e.name] and results[e.name]['status'] != e.expect
+    ]
+
+def compare(results, baseline, time_tolerance=0.5, time_slack_ms=5, memory_tolerance=0.5, memory_slack_kb=64):
+    """Return a description of every regression in ``results`` against ``baseline``.
+
+    Query counts and status codes must match or improve exactly. Latency and
+    memory only fail when they grow by more than the relative tolerance plus
+    a fixed slack, since both vary from machine to machine.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or 'skipped' in result or 'skipped' in before:
+            continue
+        if result['status'] != before['status']:
+            regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+        for key in ('p50_ms', 'p95_ms'):
+            limit = before[key] * (1 + time_tolerance) + time_slack_ms
+            if result[key] > limit:
+                regressions.append(f"{name}: {key} {before[key]} -> {result[key]}")
+        limit = before['peak_kb'] * (1 + memory_tolerance) + memory_slack_kb
+        if result['peak_kb'] > limit:
+            regressions.append(f"{name}: peak_kb {before['peak_kb']} -> {result['peak_kb']}")
+    return regressions
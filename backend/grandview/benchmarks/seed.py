@@ -0,0 +1,271 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import count
+from django.contrib.auth.hashers import make_password
+from django.db.models import Count, Sum
+from django.utils import timezone
+from accounts.models import CustomUser, UserStats
+from accounts.stats import rebuild_stats
+from adverts.models import Advert, Submission, RATE_CHOICES
+from dashboard.models import (
+    Activity, Category, Coupon, InstallmentOrder, LipaProgramRegistration, Order, OrderItem, Product,
+)
+from packages.models import CashbackBonus, Package, Purchase
+from premium.models import AgentPurchase, AgentVerificationPackage
+from premium.models import CashbackBonus as AgentCashbackBonus, WeeklyBonus
+from support.models import PrivateMessage, SupportComment, SupportLike, SupportMessage
+from wallet.models import Deposit, Transaction, TransactionSummary, Wallet
+import logging
+
+logger = logging.getLogger(__name__)
+
+PASSWORD = 'bench-pass-123'
+
+# Row counts at scale 1.0
+SIZES = {
+    'users': 3000,
+    'adverts': 300,
+    'products': 1000,
+    'support_messages': 2000,
+    'transactions': 5000,
+    'submissions': 1000,
+    'orders': 200,
+    'private_messages': 500,
+}
+
+def _size(name, scale):
+    return max(int(SIZES[name] * scale), 5)
+
+class Dataset:
+    """A seeded database plus factories for the rows a write endpoint consumes on each call.
+
+    ``member`` is an ordinary user with a long history, ``marketer`` refers
+    most of the other users and ``staff`` moderates support.
+    """
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self._serial = count(1)
+        self._replayed_deposit = None
+        self.password_hash = make_password(PASSWORD)
+
+    def serial(self):
+        return next(self._serial)
+
+    def seed(self):
+        started = timezone.now()
+        self._seed_users()
+        self._seed_packages()
+        self._seed_adverts()
+        self._seed_catalog()
+        self._seed_wallet()
+        self._seed_support()
+        rebuild_stats(self.marketer)
+        logger.info(f"Seeded benchmark dataset at scale {self.scale} in {(timezone.now() - started).total_seconds():.1f}s")
+        return self
+
+    def _seed_users(self):
+        self.marketer = CustomUser.objects.create_user(
+            username='bench_marketer', email='bench_marketer@example.com', phone_number='+254711000001',
+            password=PASSWORD, is_marketer=True,
+        )
+        self.member = CustomUser.objects.create_user(
+            username='bench_member', email='bench_member@example.com', phone_number='+254711000002',
+            password=PASSWORD, referred_by=self.marketer, is_email_verified=True,
+        )
+        self.staff = CustomUser.objects.create_user(
+            username='bench_staff', email='bench_staff@example.com', phone_number='+254711000003',
+            password=PASSWORD, is_staff=True, is_superuser=True,
+        )
+        # Bulk rows skip save() and the post_save receivers, so the per-user rows are added by hand
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'bench_user{i}', email=f'bench_user{i}@example.com', phone_number=f'+25472{i:07d}',
+                referral_code=f'B{i:07d}', password=self.password_hash,
+                referred_by=self.marketer if i % 3 else None,
+            )
+            for i in range(_size('users', self.scale))
+        ])
+        self.users = list(CustomUser.objects.filter(username__startswith='bench_user').order_by('pk'))
+        Wallet.objects.bulk_create([Wallet(user=u) for u in self.users])
+        UserStats.objects.bulk_create([UserStats(user=u) for u in self.users])
+        TransactionSummary.objects.bulk_create([TransactionSummary(user=u) for u in self.users])
+
+    def _seed_packages(self):
+        self.packages = {
+            rate: Package.objects.create(
+                name=f'Bench {rate}', image=f'packages/bench_{rate}.jpg', validity_days=30,
+                rate_per_view=rate, description=f'{rate} per view', price=Decimal(rate * 10),
+            )
+            for rate, _ in RATE_CHOICES
+        }
+        self.agent_package = AgentVerificationPackage.objects.create(
+            name='Bench Agent', image='premium_packages/bench.jpg', price=Decimal('500'),
+        )
+        expiry = timezone.now() + timedelta(days=30)
+        Purchase.objects.bulk_create([
+            Purchase(user=u, package=self.packages[RATE_CHOICES[i % len(RATE_CHOICES)][0]], expiry_date=expiry)
+            for i, u in enumerate(self.users) if i % 2
+        ])
+        self.member_purchase = Purchase.objects.create(user=self.member, package=self.packages[120])
+        self.member_cashback = CashbackBonus.objects.create(
+            user=self.member, purchase=self.member_purchase, amount=Decimal('11000'), claim_cost=Decimal('3000'),
+        )
+        AgentPurchase.objects.create(user=self.member, package=self.agent_package, status='ACTIVE')
+        Purchase.objects.create(user=self.marketer, package=self.packages[120])
+
+    def _seed_adverts(self):
+        Advert.objects.bulk_create([
+            Advert(title=f'Bench advert {i}', file=f'adverts/bench_{i}.mp4', rate_category=RATE_CHOICES[i % len(RATE_CHOICES)][0])
+            for i in range(_size('adverts', self.scale))
+        ])
+        adverts = list(Advert.objects.filter(rate_category=120).order_by('pk'))
+        Submission.objects.bulk_create([
+            Submission(
+                user=self.member, advert=adverts[i % len(adverts)], views_count=3,
+                screenshot=f'submissions/bench_{i}.jpg', earnings=Decimal('360'),
+            )
+            for i in range(_size('submissions', self.scale))
+        ])
+        self.submission = Submission.objects.filter(user=self.member).latest('pk')
+        rebuild_stats(self.member)
+
+    def _seed_catalog(self):
+        categories = Category.objects.bulk_create([Category(name=f'Bench category {i}', slug=f'bench-category-{i}') for i in range(10)])
+        Product.objects.bulk_create([
+            Product(
+                name=f'Bench product {i}', price=Decimal(100 + i), main_image=f'products/bench_{i}.jpg',
+                description=f'Bench product {i} description', category=categories[i % len(categories)],
+                is_featured=not i % 10,
+            )
+            for i in range(_size('products', self.scale))
+        ])
+        self.products = list(Product.objects.order_by('pk')[:20])
+        self.product = self.products[0]
+        self.coupon = Coupon.objects.create(code='BENCH10', discount_type='PERCENT', discount_value=Decimal('10'))
+
+        Order.objects.bulk_create([
+            Order(
+                user=self.member, total=Decimal('200'), discounted_total=Decimal('200'), payment_method='FULL',
+                status='DELIVERED', address='Bench street', phone='0711000002',
+            )
+            for _ in range(_size('orders', self.scale))
+        ])
+        orders = list(Order.objects.filter(user=self.member).order_by('pk'))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.products[i % len(self.products)], quantity=2, price_at_purchase=Decimal('100'))
+            for i, order in enumerate(orders)
+        ])
+        self.order = orders[0]
+        installment = Order.objects.create(
+            user=self.member, total=Decimal('1000000'), discounted_total=Decimal('1000000'), payment_method='INSTALLMENT',
+            status='PROCESSING', address='Bench street', phone='0711000002',
+        )
+        self.installment_order = InstallmentOrder.objects.create(
+            order=installment, initial_deposit=Decimal('400000'), remaining_balance=Decimal('600000'),
+        )
+        InstallmentOrder.objects.filter(pk=self.installment_order.pk).update(installment_status='ONGOING')
+        LipaProgramRegistration.objects.create(
+            user=self.member, full_name='Bench Member', date_of_birth=date(1990, 1, 1), address='Bench street',
+            status='APPROVED', id_front='lipa_documents/id_front/bench.jpg', id_back='lipa_documents/id_back/bench.jpg',
+            passport_photo='lipa_documents/passport/bench.jpg',
+        )
+        Activity.objects.bulk_create([
+            Activity(user=self.member, action='ORDER_PLACED', description=f'Bench order {order.pk}')
+            for order in orders
+        ])
+
+    def _seed_wallet(self):
+        Wallet.objects.filter(user__in=[self.member, self.marketer]).update(
+            deposit_balance=Decimal('50000000'), views_earnings_balance=Decimal('1000000'), referral_balance=Decimal('1000000'),
+        )
+        types = ['EARNING', 'DEPOSIT', 'PURCHASE', 'WITHDRAWAL', 'CASHBACK']
+        Transaction.objects.bulk_create([
+            Transaction(user=self.member, amount=Decimal(10 + i % 90), transaction_type=types[i % len(types)], description=f'Bench transaction {i}')
+            for i in range(_size('transactions', self.scale))
+        ])
+        totals = Transaction.objects.filter(user=self.member).aggregate(total=Sum('amount'), count=Count('id'))
+        TransactionSummary.objects.filter(user=self.member).update(total_amount=totals['total'], transaction_count=totals['count'])
+
+    def _seed_support(self):
+        authors = self.users[:50] + [self.member, self.staff]
+        SupportMessage.objects.bulk_create([
+            SupportMessage(user=authors[i % len(authors)], content=f'Bench support message {i}')
+            for i in range(_size('support_messages', self.scale))
+        ])
+        messages = list(SupportMessage.objects.order_by('pk')[:50])
+        self.support_message = messages[0]
+        SupportComment.objects.bulk_create([
+            SupportComment(message=message, user=authors[(i + j) % len(authors)], content=f'Bench comment {j}')
+            for i, message in enumerate(messages) for j in range(5)
+        ])
+        SupportLike.objects.bulk_create([
+            SupportLike(message=message, user=authors[j])
+            for message in messages for j in range(10)
+        ])
+        partners = self.users[:20] + [self.staff]
+        PrivateMessage.objects.bulk_create([
+            PrivateMessage(
+                sender=partners[i % len(partners)] if i % 2 else self.member,
+                receiver=self.member if i % 2 else partners[i % len(partners)],
+                content=f'Bench private message {i}',
+            )
+            for i in range(_size('private_messages', self.scale))
+        ])
+
+    # Factories for write endpoints
+
+    def new_user(self, deposit=Decimal('100000'), **kwargs):
+        n = self.serial()
+        user = CustomUser.objects.create_user(
+            username=f'bench_new{n}', email=f'bench_new{n}@example.com', phone_number=f'+25473{n:07d}',
+            password=PASSWORD, **kwargs,
+        )
+        Wallet.objects.filter(user=user).update(deposit_balance=deposit)
+        return user
+
+    def registration(self):
+        n = self.serial()
+        return {
+            'username': f'bench_signup{n}', 'email': f'bench_signup{n}@example.com', 'phone_number': f'+25474{n:07d}',
+            'password': PASSWORD, 'password2': PASSWORD, 'referral_code': self.marketer.referral_code,
+        }
+
+    def fresh_advert(self):
+        return Advert.objects.create(title=f'Bench fresh advert {self.serial()}', file='adverts/bench_fresh.mp4', rate_category=120)
+
+    def fresh_message(self):
+        return SupportMessage.objects.create(user=self.users[0], content=f'Bench fresh message {self.serial()}')
+
+    def cart_item(self):
+        from dashboard.models import Cart, CartItem
+        cart, _ = Cart.objects.get_or_create(user=self.member)
+        item, _ = CartItem.objects.get_or_create(cart=cart, product=self.product)
+        return item
+
+    def order_in(self, status):
+        return Order.objects.create(
+            user=self.member, total=Decimal('200'), discounted_total=Decimal('200'), payment_method='FULL',
+            status=status, address='Bench street', phone='0711000002',
+        )
+
+    def pending_deposit(self):
+        wallet = Wallet.objects.get(user=self.member)
+        return Deposit.objects.create(wallet=wallet, amount=Decimal('100'), transaction_id=f'ws_CO_BENCH_{self.serial()}')
+
+    def replayed_deposit(self):
+        """One deposit whose callback every call delivers again, as Safaricom does on retries."""
+        if self._replayed_deposit is None:
+            self._replayed_deposit = self.pending_deposit()
+        return self._replayed_deposit
+
+    def reset_cashback(self):
+        CashbackBonus.objects.filter(pk=self.member_cashback.pk).update(claimed=False, claim_date=None)
+
+    def weekly_bonus(self):
+        return WeeklyBonus.objects.create(user=self.member, amount=Decimal('100'))
+
+    def agent_cashback(self):
+        package = AgentVerificationPackage.objects.create(name=f'Bench agent {self.serial()}', image='premium_packages/bench.jpg', price=Decimal('500'))
+        purchase = AgentPurchase.objects.create(user=self.member, package=package, status='EXPIRED')
+        return AgentCashbackBonus.objects.create(user=self.member, agent_purchase=purchase, amount=Decimal('100'), claim_cost=Decimal('10'))
@@ -0,0 +1,50 @@
+from django.test import TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+import json
+import re
+import tempfile
+from .endpoints import ENDPOINTS
+from .management.commands.benchmark import BASELINE_PATH
+from .runner import Runner, compare, unexpected_statuses
+from .seed import Dataset
+
+def api_routes(patterns=None, prefix=''):
+    """Every URL pattern under api/, with converters written as {name} placeholders."""
+    routes = set()
+    for pattern in patterns if patterns is not None else get_resolver().url_patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            routes |= api_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern) and route.startswith('api/'):
+            routes.add(re.sub(r'<(?:\w+:)?(\w+)>', r'{\1}', route))
+    return routes
+
+class EndpointCoverageTest(TestCase):
+    def test_every_api_route_is_benchmarked(self):
+        self.assertEqual(api_routes() - {e.route for e in ENDPOINTS}, set())
+
+    def test_baseline_covers_every_endpoint(self):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        self.assertEqual(set(baseline['endpoints']), {e.name for e in ENDPOINTS})
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchmarkRunTest(TestCase):
+    def test_small_run_hits_expected_statuses(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            dataset = Dataset(scale=0.01).seed()
+            results = Runner(dataset, repeat=1).run(ENDPOINTS)
+        self.assertEqual(unexpected_statuses(ENDPOINTS, results), [])
+        self.assertEqual(results['wallet']['queries'], 3)
+        self.assertIn('skipped', results['advert_download_proxy'])
+
+    def test_compare_flags_queries_and_tolerates_noise(self):
+        before = {'wallet': {'status': 200, 'queries': 3, 'p50_ms': 10.0, 'p95_ms': 12.0, 'peak_kb': 40.0}}
+        noisy = {'wallet': {'status': 200, 'queries': 3, 'p50_ms': 16.0, 'p95_ms': 19.0, 'peak_kb': 90.0}}
+        self.assertEqual(compare(noisy, before), [])
+        worse = {'wallet': {'status': 500, 'queries': 4, 'p50_ms': 30.0, 'p95_ms': 12.0, 'peak_kb': 40.0}}
+        self.assertEqual(compare(worse, before), [
+            'wallet: status 200 -> 500',
+            'wallet: 3 -> 4 queries',
+            'wallet: p50_ms 10.0 -> 30.0',
+        ])
@@ -5,4 +5,5 @@ class DashboardConfig(AppConfig):
     name = 'dashboard'  # Replace with your app name
 
     def ready(self):
-        import dashboard.signals  # Replace with your app name
\ No newline at end of file
+        import dashboard.signals  # Replace with your app name
+        import dashboard.checks
\ No newline at end of file
@@ -0,0 +1,156 @@
+from hashlib import md5
+import json
+import time
+from urllib.parse import parse_qs, urlencode, urlparse
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Prefetch, Q
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField, DecimalField
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from .models import Coupon, Product, ProductImage
+
+VERSION_KEY = 'catalog:version'
+SEARCH_CONFIG = 'english'
+MAX_QUERY_LENGTH = 100
+
+class CatalogCursorPagination(CursorPagination):
+    """Keyset pagination over the product primary key, oldest first like the unpaginated list was."""
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('id',)
+
+def product_search_vector():
+    """The expression the product_search_idx GIN index is built on; queries must use it verbatim to hit the index."""
+    return SearchVector('name', 'description', config=SEARCH_CONFIG)
+
+def _parse(field, params, name):
+    try:
+        return field.to_internal_value(params[name])
+    except ValidationError as exc:
+        raise ValidationError({name: exc.detail})
+
+def catalog_query(params):
+    """The catalog parameters in ``params`` in canonical form, as an ordered dict.
+
+    Unknown parameters are dropped, so cache-busting junk like ``?_=<time>``
+    cannot create cache entries; invalid values raise a ValidationError.
+    """
+    query = {}
+    if params.get('category'):
+        query['category'] = params['category'].strip()
+    price = DecimalField(max_digits=10, decimal_places=2)
+    for name in ('min_price', 'max_price'):
+        if params.get(name):
+            query[name] = str(_parse(price, params, name).normalize())
+    for name in ('featured', 'installments'):
+        if params.get(name):
+            query[name] = 'true' if _parse(BooleanField(), params, name) else 'false'
+    search = ' '.join(params.get('q', '').split())[:MAX_QUERY_LENGTH]
+    if search:
+        query['q'] = search
+    try:
+        page_size = int(params.get(CatalogCursorPagination.page_size_query_param, ''))
+    except ValueError:
+        page_size = None
+    if page_size and 0 < page_size <= CatalogCursorPagination.max_page_size:
+        query['page_size'] = str(page_size)
+    return query
+
+def relative_page_link(link, query):
+    """Rebuild a paginator link as ``?<query>&cursor=...``, independent of the requester's host and junk params."""
+    if link is None:
+        return None
+    cursor = parse_qs(urlparse(link).query).get('cursor')
+    return '?' + urlencode({**query, 'cursor': cursor[0]} if cursor else query)
+
+def filter_catalog(products, params):
+    """Narrow ``products`` by the optional catalog query parameters.
+
+    ``category`` takes a category id or slug, ``min_price`` and ``max_price``
+    are inclusive, ``featured`` and ``installments`` are booleans and ``q``
+    is a text search over the name and description.
+    """
+    if params.get('category'):
+        category = params['category']
+        products = products.filter(category_id=category) if category.isdigit() else products.filter(category__slug=category)
+    price = DecimalField(max_digits=10, decimal_places=2)
+    if params.get('min_price'):
+        products = products.filter(price__gte=_parse(price, params, 'min_price'))
+    if params.get('max_price'):
+        products = products.filter(price__lte=_parse(price, params, 'max_price'))
+    if params.get('featured'):
+        products = products.filter(is_featured=_parse(BooleanField(), params, 'featured'))
+    if params.get('installments'):
+        products = products.filter(supports_installments=_parse(BooleanField(), params, 'installments'))
+    query = params.get('q', '').strip()
+    if query:
+        if connection.vendor == 'postgresql':
+            products = products.annotate(search=product_search_vector()).filter(
+                search=SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+            )
+        else:
+            products = products.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    return products
+
+def catalog_products():
+    """Products with everything ProductSerializer reads loaded in a fixed number of queries."""
+    return Product.objects.select_related('category').prefetch_related(
+        Prefetch('productimage_set', queryset=ProductImage.objects.select_related('image')),
+        Prefetch(
+            'coupon_set',
+            queryset=Coupon.objects.filter(is_active=True).prefetch_related('applicable_products'),
+            to_attr='active_coupons',
+        ),
+    )
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version lost to eviction never comes back as an old number
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+def bump_catalog_version():
+    catalog_version()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted in between; the fresh seed is already newer than any cached entry
+        catalog_version()
+
+def catalog_response(request, key, build, present=None):
+    """Serve ``build()`` from the versioned catalog cache, answering conditional GETs with a 304.
+
+    Every catalog change bumps the version, so entries never need deleting;
+    stale ones just stop being read and expire. ``present`` adapts the shared
+    cached data to the current request, e.g. to make its links absolute.
+    """
+    cache_key = f'catalog:{catalog_version()}:{key}'
+    entry = cache.get(cache_key)
+    if entry is None:
+        data = build()
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        entry = {'data': data, 'etag': quote_etag(md5(body).hexdigest()), 'modified': int(time.time())}
+        cache.set(cache_key, entry, settings.CATALOG_CACHE_SECONDS)
+
+    headers = {
+        'ETag': entry['etag'],
+        'Last-Modified': http_date(entry['modified']),
+        'Cache-Control': 'public, no-cache',
+    }
+    not_modified = get_conditional_response(request, etag=entry['etag'], last_modified=entry['modified'])
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified.headers[name] = value
+        return not_modified
+    data = present(entry['data']) if present else entry['data']
+    return Response(data, headers=headers)
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """The catalog version, throttles and feed-seen coalescing only hold across workers with a shared cache."""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith('LocMemCache') or backend.endswith('DummyCache'):
+        return [Warning(
+            'The default cache is local to each process, so catalog invalidation only reaches the worker that saved the change.',
+            hint='Set REDIS_URL so every web worker shares one cache.',
+            id='dashboard.W001',
+        )]
+    return []
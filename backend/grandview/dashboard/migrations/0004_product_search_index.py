@@ -0,0 +1,25 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Full-text search is Postgres-only; SQLite falls back to icontains and gets no index
+def product_search_index():
+    return GinIndex(SearchVector('name', 'description', config='english'), name='product_search_idx')
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('dashboard', 'Product'), product_search_index())
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('dashboard', 'Product'), product_search_index())
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_delete_delivery'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -5,6 +5,7 @@ from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 from .models import Category, Product, Image, ProductImage, Cart, CartItem, Coupon, InstallmentOrder, Order, OrderItem, InstallmentPayment, LipaProgramRegistration, Activity
 from wallet.models import Transaction, Wallet
+from wallet import ledger
 from accounts.models import CustomUser
 from decimal import Decimal
 import logging
@@ -46,16 +47,25 @@ class ProductSerializer(serializers.ModelSerializer):
     )
     sub_images = ProductImageSerializer(source='productimage_set', many=True, read_only=True)
     main_image = serializers.ImageField(use_url=True)
-    available_coupons = CouponSerializer(source='coupon_set', many=True, read_only=True)
+    available_coupons = serializers.SerializerMethodField(read_only=True)
     discounted_price = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'price', 'main_image', 'sub_images', 'description', 'category', 'category_id', 'is_featured', 'supports_installments', 'available_coupons', 'discounted_price']
 
+    def _active_coupons(self, obj):
+        # Prefetched by dashboard.catalog.catalog_products()
+        if not hasattr(obj, 'active_coupons'):
+            obj.active_coupons = list(obj.coupon_set.filter(is_active=True).prefetch_related('applicable_products'))
+        return obj.active_coupons
+
+    def get_available_coupons(self, obj):
+        return CouponSerializer(self._active_coupons(obj), many=True).data
+
     def get_discounted_price(self, obj):
-        coupons = obj.coupon_set.filter(is_active=True)
-        if not coupons.exists():
+        coupons = self._active_coupons(obj)
+        if not coupons:
             return float(obj.price)
         min_price = obj.price
         for coupon in coupons:
@@ -117,40 +127,22 @@ class InstallmentPaymentSerializer(serializers.ModelSerializer):
         installment_order = validated_data['installment_order']
         amount = validated_data['amount']
 
-        # Deduct from wallet
-        wallet = Wallet.objects.get(user=user)
-        if user.is_marketer:
-            # Prioritize views_earnings_balance for marketers
-            from_earnings = min(amount, wallet.views_earnings_balance)
-            from_deposit = amount - from_earnings
-            wallet.views_earnings_balance -= from_earnings
-            wallet.deposit_balance -= from_deposit
-            balance_type = (
-                'views_earnings_balance' if from_earnings > 0 and from_deposit == 0
-                else 'deposit_balance' if from_deposit > 0 and from_earnings == 0
-                else 'mixed_balance'
+        # Deduct from wallet; marketers spend views_earnings_balance first
+        try:
+            payment_tx, _, _ = ledger.charge(
+                user,
+                amount,
+                'INSTALLMENT_PAYMENT',
+                f"Installment payment for Order {installment_order.order.id}",
+                balance_type=ledger.split_balance_type
             )
-        else:
-            if wallet.deposit_balance < amount:
-                raise ValidationError({"balance": "Insufficient deposit balance."})
-            wallet.deposit_balance -= amount
-            balance_type = 'deposit_balance'
-        wallet.save()
+        except ledger.InsufficientFunds:
+            raise ValidationError({"balance": "Insufficient main balance." if user.is_marketer else "Insufficient deposit balance."})
 
         # Create payment
+        validated_data['transaction'] = payment_tx
         payment = super().create(validated_data)
 
-        # Create transaction
-        transaction = Transaction.objects.create(
-            user=user,
-            amount=-amount,
-            transaction_type='INSTALLMENT_PAYMENT',
-            description=f"Installment payment for Order {installment_order.order.id}",
-            balance_type=balance_type
-        )
-        payment.transaction = transaction
-        payment.save()
-
         # Update due date for next payment
         installment_order.due_date += timedelta(days=30)
         installment_order.save()
@@ -292,27 +284,8 @@ class OrderSerializer(serializers.ModelSerializer):
         phone = validated_data.pop('phone')
         delivery_fee = validated_data.pop('delivery_fee')
 
-        wallet = Wallet.objects.get(user=user)
         amount_to_deduct = discounted_total if payment_method == 'FULL' else discounted_total * Decimal('0.4')
 
-        # Determine balance_type based on user type
-        if user.is_marketer:
-            # For marketers, prioritize views_earnings_balance, then deposit_balance
-            from_earnings = min(amount_to_deduct, wallet.views_earnings_balance)
-            from_deposit = amount_to_deduct - from_earnings
-            wallet.views_earnings_balance -= from_earnings
-            wallet.deposit_balance -= from_deposit
-            balance_type = (
-                'views_earnings_balance' if from_earnings > 0 and from_deposit == 0
-                else 'deposit_balance' if from_deposit > 0 and from_earnings == 0
-                else 'mixed_balance'
-            )
-        else:
-            wallet.deposit_balance -= amount_to_deduct
-            balance_type = 'deposit_balance'
-
-        wallet.save()
-
         order = Order.objects.create(
             user=user,
             total=total,
@@ -344,22 +317,15 @@ class OrderSerializer(serializers.ModelSerializer):
             )
             installment_order.installment_status = 'ONGOING'
             installment_order.save()
-
-            Transaction.objects.create(
-                user=user,
-                amount=-initial_deposit,
-                transaction_type='INSTALLMENT_PAYMENT',
-                description=f"40% deposit for Order {order.id}",
-                balance_type=balance_type
-            )
+            transaction_type, description = 'INSTALLMENT_PAYMENT', f"40% deposit for Order {order.id}"
         else:
-            Transaction.objects.create(
-                user=user,
-                amount=-amount_to_deduct,
-                transaction_type='PURCHASE',
-                description=f"Full payment for Order {order.id}",
-                balance_type=balance_type
-            )
+            transaction_type, description = 'PURCHASE', f"Full payment for Order {order.id}"
+
+        # For marketers, prioritize views_earnings_balance, then deposit_balance
+        try:
+            ledger.charge(user, amount_to_deduct, transaction_type, description, balance_type=ledger.split_balance_type)
+        except ledger.InsufficientFunds:
+            raise ValidationError({"balance": "Insufficient main balance." if user.is_marketer else "Insufficient deposit balance."})
 
         # Clear the cart after successful order
         cart = Cart.objects.filter(user=user).first()
@@ -1,10 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Order, InstallmentPayment, LipaProgramRegistration, CartItem, Activity
+from .models import Order, InstallmentPayment, LipaProgramRegistration, CartItem, Activity, Category, Coupon, Image, Product, ProductImage
+from .catalog import bump_catalog_version
 from django.contrib.contenttypes.models import ContentType
 import logging
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from notifications.mail import queue_email
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -31,28 +32,24 @@ def track_order_activity(sender, instance, created, **kwargs):
             content_type=ContentType.objects.get_for_model(Order),
             object_id=instance.id
         )
-        # Send order status update email
+        # Queue order status update email
         try:
-            context = {
-                'user': instance.user,
-                'order_id': instance.id,
-                'status': instance.status,
-                'total': instance.discounted_total,
-                'ordered_at': instance.ordered_at,
-                'description': description,
-                'site_url': settings.SITE_URL,
-            }
-            message = render_to_string('emails/order_status_update.html', context)
-            send_mail(
+            queue_email(
                 subject='Order Status Update',
-                message='',
-                from_email=settings.DEFAULT_FROM_EMAIL,
+                template='emails/order_status_update.html',
+                context={
+                    'user': instance.user,
+                    'order_id': instance.id,
+                    'status': instance.status,
+                    'total': instance.discounted_total,
+                    'ordered_at': instance.ordered_at,
+                    'description': description,
+                    'site_url': settings.SITE_URL,
+                },
                 recipient_list=[instance.user.email],
-                html_message=message,
-                fail_silently=False,
             )
         except Exception as e:
-            logger.error(f"Failed to send order status update email to {instance.user.email}: {str(e)}")
+            logger.error(f"Failed to queue order status update email to {instance.user.email}: {str(e)}")
 
 @receiver(post_save, sender=InstallmentPayment)
 def track_payment_activity(sender, instance, created, **kwargs):
@@ -80,28 +77,24 @@ def track_lipa_activity(sender, instance, created, **kwargs):
         )
         logger.info(f"Activity created for Lipa registration {instance.id}")
     else:
-        # Send lipa status update email for APPROVED or REJECTED
+        # Queue lipa status update email for APPROVED or REJECTED
         if instance.status in ['APPROVED', 'REJECTED']:
             try:
                 template = 'emails/lipa_approved.html' if instance.status == 'APPROVED' else 'emails/lipa_rejected.html'
                 subject = 'Lipa Mdogo Mdogo Approved' if instance.status == 'APPROVED' else 'Lipa Mdogo Mdogo Application Update'
-                context = {
-                    'user': instance.user,
-                    'full_name': instance.full_name,
-                    'updated_at': instance.updated_at,
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string(template, context)
-                send_mail(
+                queue_email(
                     subject=subject,
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    template=template,
+                    context={
+                        'user': instance.user,
+                        'full_name': instance.full_name,
+                        'updated_at': instance.updated_at,
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[instance.user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                logger.error(f"Failed to send lipa status update email to {instance.user.email}: {str(e)}")
+                logger.error(f"Failed to queue lipa status update email to {instance.user.email}: {str(e)}")
 
 @receiver(post_save, sender=CartItem)
 def track_cart_activity(sender, instance, created, **kwargs):
@@ -114,4 +107,20 @@ def track_cart_activity(sender, instance, created, **kwargs):
             content_type=ContentType.objects.get_for_model(CartItem),
             object_id=instance.id
         )
-        logger.info(f"Activity created for cart item {instance.id}")
\ No newline at end of file
+        logger.info(f"Activity created for cart item {instance.id}")
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Coupon)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Coupon)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=Category)
+@receiver(m2m_changed, sender=Coupon.applicable_products.through)
+@receiver(m2m_changed, sender=ProductImage)
+def invalidate_catalog(sender, **kwargs):
+    # After commit, so a concurrent read cannot cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
@@ -1,12 +1,14 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status
-from .models import Product, Category, Cart, CartItem, Order, LipaProgramRegistration, Activity, InstallmentOrder, InstallmentPayment
+from .models import Product, Category, Cart, CartItem, Order, LipaProgramRegistration, Activity, InstallmentOrder, InstallmentPayment, Coupon, Image, ProductImage
+from django.core.cache import cache
 from wallet.models import Wallet
 from django.utils import timezone
 from decimal import Decimal
 from datetime import timedelta
+from .checks import check_shared_cache
 
 User = get_user_model()
 
@@ -84,4 +86,129 @@ class RecentActivityTests(TestCase):
         
         response = self.client.get(reverse('recent_activity'), {'page': 2, 'page_size': 10})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.json()['results']), 10)  # page_size=10, page=2
\ No newline at end of file
+        self.assertEqual(len(response.json()['results']), 10)  # page_size=10, page=2
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Phones', slug='phones')
+        self.products = [
+            Product.objects.create(
+                name=f'Phone {i}', price=Decimal('1000'), category=category,
+                main_image=f'products/phone{i}.jpg', description='A phone', is_featured=True
+            )
+            for i in range(6)
+        ]
+        image = Image.objects.create(file='products/sub_images/side.jpg')
+        for product in self.products:
+            ProductImage.objects.create(product=product, image=image)
+        self.coupon = Coupon.objects.create(code='TENOFF', discount_type='PERCENT', discount_value=Decimal('10'))
+        self.coupon.applicable_products.set(self.products[:3])
+        Coupon.objects.create(code='OLD', discount_type='FIXED', discount_value=Decimal('500'), is_active=False)
+
+    def test_catalog_queries_do_not_grow_with_products_and_repeat_reads_are_cached(self):
+        # Products with their category, sub images, active coupons and the coupons' products
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('all_products'), secure=True)
+        self.assertEqual(len(response.json()['results']), 6)
+        self.assertEqual([c['code'] for c in response.json()['results'][0]['available_coupons']], ['TENOFF'])
+        self.assertEqual(response.json()['results'][0]['discounted_price'], 900.0)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('all_products'), secure=True)
+
+    def test_validators_answer_repeat_clients_with_304(self):
+        response = self.client.get(reverse('product_detail', args=[self.products[0].pk]), secure=True)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(reverse('product_detail', args=[self.products[0].pk]), secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(reverse('product_list'), secure=True)
+        response = self.client.get(reverse('product_list'), secure=True, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_changes_invalidate_cached_responses(self):
+        url = reverse('product_detail', args=[self.products[0].pk])
+        etag = self.client.get(url, secure=True)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon.discount_value = Decimal('20')
+            self.coupon.save()
+        response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['discounted_price'], 800.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon.applicable_products.remove(self.products[0])
+        self.assertEqual(self.client.get(url, secure=True).json()['discounted_price'], 1000.0)
+
+class SharedCacheCheckTests(TestCase):
+    def test_per_process_cache_is_flagged_for_deploy(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([w.id for w in check_shared_cache(None)], ['dashboard.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+class CatalogFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        phones = Category.objects.create(name='Phones', slug='phones')
+        tvs = Category.objects.create(name='TVs', slug='tvs')
+        self.phone = Product.objects.create(
+            name='Budget phone', price=Decimal('8000'), category=phones, main_image='products/a.jpg',
+            description='Dual SIM handset', supports_installments=False
+        )
+        self.flagship = Product.objects.create(
+            name='Flagship phone', price=Decimal('90000'), category=phones, main_image='products/b.jpg',
+            description='Best camera', is_featured=True
+        )
+        self.tv = Product.objects.create(
+            name='Smart TV', price=Decimal('45000'), category=tvs, main_image='products/c.jpg',
+            description='Streams from your phone'
+        )
+
+    def names(self, **params):
+        response = self.client.get(reverse('all_products'), params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return [p['name'] for p in response.json()['results']]
+
+    def test_filters_and_search(self):
+        self.assertEqual(self.names(category='phones'), ['Budget phone', 'Flagship phone'])
+        self.assertEqual(self.names(category=self.tv.category_id), ['Smart TV'])
+        self.assertEqual(self.names(min_price='10000', max_price='50000'), ['Smart TV'])
+        self.assertEqual(self.names(featured='true'), ['Flagship phone'])
+        self.assertEqual(self.names(installments='true', category='phones'), ['Flagship phone'])
+        self.assertEqual(self.names(q='PHONE'), ['Budget phone', 'Flagship phone', 'Smart TV'])
+        self.assertEqual(self.names(q='camera'), ['Flagship phone'])
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get(reverse('all_products'), {'min_price': 'cheap', 'featured': 'maybe'}, secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('min_price', response.json())
+
+    def test_cursor_walks_the_filtered_catalog(self):
+        response = self.client.get(reverse('all_products'), {'page_size': 2}, secure=True).json()
+        self.assertEqual([p['id'] for p in response['results']], [self.phone.pk, self.flagship.pk])
+        response = self.client.get(response['next'], secure=True).json()
+        self.assertEqual([p['id'] for p in response['results']], [self.tv.pk])
+        self.assertIsNone(response['next'])
+
+    def test_unknown_params_share_the_cache_entry(self):
+        first = self.client.get(reverse('all_products'), {'q': '  phone ', 'page_size': 2}, secure=True)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('all_products'), {'q': 'phone', 'page_size': 2, '_': '1700000000', 'x': '1'}, secure=True
+            )
+        self.assertEqual(response.json(), first.json())
+        self.assertNotIn('_=', response.json()['next'])
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_page_links_follow_the_requesting_host(self):
+        self.client.get(reverse('all_products'), {'page_size': 2}, secure=True, HTTP_HOST='a.example.com')
+        response = self.client.get(reverse('all_products'), {'page_size': 2}, secure=True, HTTP_HOST='b.example.com')
+        self.assertTrue(response.json()['next'].startswith('https://b.example.com/api/dashboard/all-products/?page_size=2&cursor='))
+
+    def test_categories_list_product_counts(self):
+        response = self.client.get(reverse('category_list'), secure=True)
+        self.assertEqual(
+            [(c['slug'], c['count']) for c in response.json()],
+            [('phones', 2), ('tvs', 1)],
+        )
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    ProductListView, AllProductsView, ProductDetailView,
+    ProductListView, AllProductsView, CategoryListView, ProductDetailView,
     CartView, AddToCartView, UpdateCartView, RemoveFromCartView,
     CheckoutView, OrderListView, InstallmentOrderListView,
     InstallmentPaymentView, LipaRegisterView, LipaPresignedUploadView,
@@ -11,6 +11,7 @@ from .views import (
 urlpatterns = [
     path('dashboard/products/', ProductListView.as_view(), name='product_list'),
     path('dashboard/all-products/', AllProductsView.as_view(), name='all_products'),
+    path('dashboard/categories/', CategoryListView.as_view(), name='category_list'),
     path('dashboard/products/<int:pk>/', ProductDetailView.as_view(), name='product_detail'),
     path('dashboard/cart/', CartView.as_view(), name='cart'),
     path('dashboard/cart/add/', AddToCartView.as_view(), name='add_to_cart'),
@@ -11,20 +11,24 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import FormParser
 from rest_framework.pagination import PageNumberPagination
-from .models import Product, Cart, CartItem, Coupon, Order, InstallmentOrder, InstallmentPayment, LipaProgramRegistration, Activity
+from .models import Category, Product, Cart, CartItem, Coupon, Order, InstallmentOrder, InstallmentPayment, LipaProgramRegistration, Activity
+from .catalog import CatalogCursorPagination, catalog_products, catalog_query, catalog_response, filter_catalog, relative_page_link
 from .serializers import ProductSerializer, CartSerializer, OrderSerializer, InstallmentOrderSerializer, InstallmentPaymentSerializer, LipaRegistrationSerializer, ActivitySerializer
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 from decimal import Decimal
 from datetime import timedelta
 import logging
-import boto3
+from hashlib import md5
+from urllib.parse import urlencode
+from grandview import s3
+from grandview.uploads import DOCUMENT_TYPES, MAX_BYTES, LimitedMultiPartParser
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from notifications.mail import queue_email
 
 logger = logging.getLogger(__name__)
 
@@ -37,25 +41,52 @@ class ProductListView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        products = Product.objects.filter(is_featured=True)[:4]
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        return catalog_response(request, 'featured', lambda: ProductSerializer(
+            catalog_products().filter(is_featured=True)[:4], many=True
+        ).data)
 
 class AllProductsView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        query = catalog_query(request.query_params)
+        cursor = request.query_params.get('cursor', '')
+
+        def build():
+            paginator = CatalogCursorPagination()
+            page = paginator.paginate_queryset(filter_catalog(catalog_products(), query), request, view=self)
+            data = paginator.get_paginated_response(ProductSerializer(page, many=True).data).data
+            # Cached links are relative so no requester's host or stray parameters leak into them
+            data['next'] = relative_page_link(data['next'], query)
+            data['previous'] = relative_page_link(data['previous'], query)
+            return data
+
+        def present(data):
+            return {
+                **data,
+                'next': data['next'] and request.build_absolute_uri(request.path + data['next']),
+                'previous': data['previous'] and request.build_absolute_uri(request.path + data['previous']),
+            }
+
+        # Each canonical filter, search and cursor combination is its own cache entry
+        key = 'all:' + md5(urlencode({**query, 'cursor': cursor}).encode()).hexdigest()
+        return catalog_response(request, key, build, present)
+
+class CategoryListView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return catalog_response(request, 'categories', lambda: list(
+            Category.objects.annotate(count=Count('product')).order_by('name').values('id', 'name', 'slug', 'count')
+        ))
 
 class ProductDetailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, pk):
-        product = get_object_or_404(Product, pk=pk)
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
+        return catalog_response(request, f'product:{pk}', lambda: ProductSerializer(
+            get_object_or_404(catalog_products(), pk=pk)
+        ).data)
 
 class CartView(APIView):
     permission_classes = [IsAuthenticated]
@@ -151,7 +182,7 @@ class CheckoutView(APIView):
         if serializer.is_valid():
             with transaction.atomic():
                 order = serializer.save()
-                # Send order confirmation email
+                # Queue order confirmation email
                 try:
                     template = 'emails/order_confirmation_installment.html' if order.payment_method == 'INSTALLMENT' else 'emails/order_confirmation_full.html'
                     context = {
@@ -170,17 +201,14 @@ class CheckoutView(APIView):
                             'due_date': order.ordered_at + timedelta(days=30),
                         })
                     subject = 'Installment Order Confirmed' if order.payment_method == 'INSTALLMENT' else 'Order Confirmed'
-                    message = render_to_string(template, context)
-                    send_mail(
+                    queue_email(
                         subject=subject,
-                        message='',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        template=template,
+                        context=context,
                         recipient_list=[request.user.email],
-                        html_message=message,
-                        fail_silently=False,
                     )
                 except Exception as e:
-                    logger.error(f"Failed to send order confirmation email to {request.user.email}: {str(e)}")
+                    logger.error(f"Failed to queue order confirmation email to {request.user.email}: {str(e)}")
                 return Response({"order_id": order.id, "message": "Order placed successfully"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -208,58 +236,51 @@ class InstallmentPaymentView(APIView):
         if serializer.is_valid():
             with transaction.atomic():
                 payment = serializer.save()
-                # Send payment receipt email
+                # Queue payment receipt email
                 try:
-                    context = {
-                        'user': request.user,
-                        'order_id': payment.installment_order.order.id,
-                        'amount': payment.amount,
-                        'paid_at': payment.paid_at,
-                        'remaining_balance': payment.installment_order.remaining_balance,
-                        'site_url': settings.SITE_URL,
-                    }
-                    message = render_to_string('emails/payment_receipt.html', context)
-                    send_mail(
+                    queue_email(
                         subject='Installment Payment Received',
-                        message='',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        template='emails/payment_receipt.html',
+                        context={
+                            'user': request.user,
+                            'order_id': payment.installment_order.order.id,
+                            'amount': payment.amount,
+                            'paid_at': payment.paid_at,
+                            'remaining_balance': payment.installment_order.remaining_balance,
+                            'site_url': settings.SITE_URL,
+                        },
                         recipient_list=[request.user.email],
-                        html_message=message,
-                        fail_silently=False,
                     )
                 except Exception as e:
-                    logger.error(f"Failed to send payment receipt email to {request.user.email}: {str(e)}")
+                    logger.error(f"Failed to queue payment receipt email to {request.user.email}: {str(e)}")
                 return Response({"message": "Payment processed successfully"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class LipaRegisterView(APIView):
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [LimitedMultiPartParser, FormParser]
+    upload_limits = {field: (MAX_BYTES, DOCUMENT_TYPES) for field in ('id_front', 'id_back', 'passport_photo')}
 
     def post(self, request):
         serializer = LipaRegistrationSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             with transaction.atomic():
                 registration = serializer.save()
-                # Send lipa registration confirmation email
+                # Queue lipa registration confirmation email
                 try:
-                    context = {
-                        'user': request.user,
-                        'full_name': registration.full_name,
-                        'created_at': registration.created_at,
-                        'site_url': settings.SITE_URL,
-                    }
-                    message = render_to_string('emails/lipa_registration_confirmation.html', context)
-                    send_mail(
+                    queue_email(
                         subject='Lipa Mdogo Mdogo Registration Received',
-                        message='',
-                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        template='emails/lipa_registration_confirmation.html',
+                        context={
+                            'user': request.user,
+                            'full_name': registration.full_name,
+                            'created_at': registration.created_at,
+                            'site_url': settings.SITE_URL,
+                        },
                         recipient_list=[request.user.email],
-                        html_message=message,
-                        fail_silently=False,
                     )
                 except Exception as e:
-                    logger.error(f"Failed to send lipa registration email to {request.user.email}: {str(e)}")
+                    logger.error(f"Failed to queue lipa registration email to {request.user.email}: {str(e)}")
                 return Response({"message": "Lipa Mdogo Mdogo registration submitted successfully"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -272,18 +293,8 @@ class LipaPresignedUploadView(APIView):
         if not file_name or not file_type:
             return Response({"error": "file_name and file_type are required"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_S3_REGION_NAME
-            )
             key = f"lipa_documents/{file_name}"
-            presigned_url = s3_client.generate_presigned_url(
-                'put_object',
-                Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': key, 'ContentType': file_type},
-                ExpiresIn=3600
-            )
+            presigned_url = s3.presigned_url('put_object', key, 3600, ContentType=file_type)
             return Response({"presigned_url": presigned_url}, status=status.HTTP_200_OK)
         except Exception as e:
             logger.error(f"Failed to generate presigned URL: {str(e)}")
@@ -314,26 +325,22 @@ class ConfirmDeliveryView(APIView):
             return Response({"error": "Order not in shipped status"}, status=status.HTTP_400_BAD_REQUEST)
         order.status = 'DELIVERED'
         order.save()
-        # Send delivery confirmation and rating email
+        # Queue delivery confirmation and rating email
         try:
-            context = {
-                'user': request.user,
-                'order_id': order.id,
-                'total': order.discounted_total,
-                'delivered_at': timezone.now(),
-                'site_url': settings.SITE_URL,
-            }
-            message = render_to_string('emails/order_delivered_rating.html', context)
-            send_mail(
+            queue_email(
                 subject='Your Order Has Been Delivered',
-                message='',
-                from_email=settings.DEFAULT_FROM_EMAIL,
+                template='emails/order_delivered_rating.html',
+                context={
+                    'user': request.user,
+                    'order_id': order.id,
+                    'total': order.discounted_total,
+                    'delivered_at': timezone.now(),
+                    'site_url': settings.SITE_URL,
+                },
                 recipient_list=[request.user.email],
-                html_message=message,
-                fail_silently=False,
             )
         except Exception as e:
-            logger.error(f"Failed to send delivery confirmation email to {request.user.email}: {str(e)}")
+            logger.error(f"Failed to queue delivery confirmation email to {request.user.email}: {str(e)}")
         return Response({"message": "Delivery confirmed"}, status=status.HTTP_200_OK)
 
 class SubmitRatingView(APIView):
@@ -2,6 +2,7 @@
 ASGI config for grandview project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSockets go to the support chat and wallet consumers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +14,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grandview.settings')
 
-application = get_asgi_application()
+# Load the apps before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+from support.auth import TokenAuthMiddleware  # noqa: E402
+from support.routing import websocket_urlpatterns as support_websocket_urlpatterns  # noqa: E402
+from wallet.routing import websocket_urlpatterns as wallet_websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(TokenAuthMiddleware(URLRouter(support_websocket_urlpatterns + wallet_websocket_urlpatterns)))
+    ),
+})
@@ -0,0 +1,28 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+class EventConsumer(AsyncJsonWebsocketConsumer):
+    """Forwards socket.event messages from the channel layer to the socket.
+
+    Clients only listen; writes still go through the REST views, which
+    publish the resulting events (see grandview.events). Subclasses name
+    the groups to join; none closes the connection.
+    """
+
+    async def connect(self):
+        self._event_groups = self.event_groups()
+        if not self._event_groups:
+            await self.close(code=4401)
+            return
+        for group in self._event_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, '_event_groups', None) or []:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def socket_event(self, event):
+        await self.send_json(event['payload'])
+
+    def event_groups(self):
+        return []
@@ -0,0 +1,23 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+def publish(group, event_type, data):
+    """Push ``data`` to a WebSocket group once the current transaction commits.
+
+    A channel layer outage is logged rather than raised, since the write it
+    announces has already succeeded.
+    """
+    def send():
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        try:
+            async_to_sync(layer.group_send)(group, {'type': 'socket.event', 'payload': {'type': event_type, 'data': data}})
+        except Exception as e:
+            logger.error(f"Failed to publish {event_type} to {group}: {str(e)}")
+
+    transaction.on_commit(send)
@@ -0,0 +1,78 @@
+"""The process-wide S3 client.
+
+Building a boto3 client resolves endpoints, loads credentials and parses
+the S3 service model, which costs far more than signing a URL. boto3
+clients are thread-safe, so views share the one from get_client() and
+media storages build their per-thread resources from the same session.
+"""
+import threading
+import boto3
+from botocore.config import Config
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_session = None
+_client = None
+_resources = threading.local()
+# Bumped on reset() so threads drop resources built from an older session
+_generation = 0
+
+def _get_session():
+    # Callers hold _lock; boto3 sessions are not safe to share while building clients
+    global _session
+    if _session is None:
+        _session = boto3.session.Session(
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_S3_REGION_NAME,
+        )
+    return _session
+
+def get_client():
+    """The shared S3 client, created on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = _get_session().client(
+                    's3', config=Config(max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS)
+                )
+    return _client
+
+def get_resource(**kwargs):
+    """An S3 resource for the calling thread, built from the shared session.
+
+    Resources are not thread-safe, so each thread gets its own, but they
+    reuse the session's credentials and parsed service model.
+    """
+    resource = getattr(_resources, 'resource', None)
+    if resource is None or _resources.generation != _generation:
+        with _lock:
+            resource = _get_session().resource('s3', **kwargs)
+            _resources.resource, _resources.generation = resource, _generation
+    return resource
+
+def presigned_url(method, key, expires_in, **params):
+    """Sign ``method`` (e.g. 'get_object') on ``key`` in the media bucket; nothing is sent to S3."""
+    return get_client().generate_presigned_url(
+        method, Params={'Bucket': settings.AWS_STORAGE_BUCKET_NAME, 'Key': key, **params}, ExpiresIn=expires_in
+    )
+
+def presigned_post(key, fields, conditions, expires_in):
+    return get_client().generate_presigned_post(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in
+    )
+
+def reset():
+    """Forget the shared session and client, e.g. after the credentials change."""
+    global _session, _client, _generation
+    with _lock:
+        _session = _client = None
+        _generation += 1
+
+@receiver(setting_changed)
+def _reset_on_aws_settings(setting, **kwargs):
+    if setting.startswith('AWS_'):
+        reset()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 import dj_database_url
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
     'support',
     'storages',
     'premium.apps.PremiumConfig',
+    'notifications',
+    'benchmarks',
 ]
 
 # Template configuration
@@ -79,6 +82,11 @@ ROOT_URLCONF = 'grandview.urls'
 # Configure WhiteNoise storage
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Seconds an advert submission reports PROCESSING on its status endpoint (UX only, nothing blocks)
+SUBMISSION_PROCESSING_SECONDS = int(os.getenv('SUBMISSION_PROCESSING_SECONDS', 2))
+SUBMISSION_SCREENSHOT_MAX_BYTES = int(os.getenv('SUBMISSION_SCREENSHOT_MAX_BYTES', 5 * 1024 * 1024))
+SUBMISSION_UPLOAD_URL_EXPIRY = int(os.getenv('SUBMISSION_UPLOAD_URL_EXPIRY', 600))  # Seconds a presigned screenshot upload stays valid
+
 # Custom User model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
@@ -114,18 +122,46 @@ SIMPLE_JWT = {
 
 # Channels settings
 ASGI_APPLICATION = 'grandview.asgi.application'
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        'CONFIG': {
-            'hosts': [(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))],
+# Support chat events fan out through Redis; a single process (and the tests) can use the in-memory layer
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.getenv('REDIS_URL')],
+            },
         },
-    },
-}
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Shared cache (catalog responses, API throttles); per-process memory when no Redis is configured,
+# which is only fit for a single process: check --deploy warns about it (dashboard.W001)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+CATALOG_CACHE_SECONDS = int(os.getenv('CATALOG_CACHE_SECONDS', 600))  # Versioned, so this only bounds memory use
+SUPPORT_SEEN_INTERVAL = int(os.getenv('SUPPORT_SEEN_INTERVAL', 60))  # At most one last_support_view write per user per interval
 
 
 # Email configuration
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Use django.core.mail.backends.console.EmailBackend or .filebased.EmailBackend locally
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_HOST_USER = 'grandviewshopafrica@gmail.com'
@@ -134,6 +170,19 @@ EMAIL_USE_TLS = True
 DEFAULT_FROM_EMAIL = 'Grandview <grandviewshopafrica@gmail.com>'  # Must match EMAIL_HOST_USER or a verified alias
 ADMIN_EMAIL = 'grandviewshopafrica@gmail.com'  # Admin email for deposit notifications
 
+# Outbound email queue, drained by `python manage.py send_queued_emails --loop`
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))  # Emails per SMTP connection
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', 2))  # Seconds between polls when idle
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', 60))  # Seconds, doubled after each failed attempt
+
+# Deposit STK pushes, sent by `python manage.py send_stk_pushes --loop`
+STK_PUSH_BATCH_SIZE = int(os.getenv('STK_PUSH_BATCH_SIZE', 10))  # Deposits claimed per pass
+STK_PUSH_POLL_INTERVAL = float(os.getenv('STK_PUSH_POLL_INTERVAL', 1))  # Seconds between polls when idle
+STK_PUSH_MAX_AGE = int(os.getenv('STK_PUSH_MAX_AGE', 120))  # Seconds; older queued pushes are failed instead of prompting the user late
+# Per-IP limit on the public M-Pesa callback; Safaricom posts from a few IPs, so it is far above the anonymous API rate
+MPESA_CALLBACK_THROTTLE_RATE = os.getenv('MPESA_CALLBACK_THROTTLE_RATE', '600/minute')
+
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
@@ -169,6 +218,15 @@ AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME', 'grandview-storage')
 AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME', 'eu-north-1')
+AWS_S3_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_S3_MAX_POOL_CONNECTIONS', 20))  # Connections kept by the shared client in grandview/s3.py
+
+# 'redirect' sends advert downloads to a presigned S3 URL; 'proxy' streams them through Django for private buckets
+ADVERT_DOWNLOAD_MODE = os.getenv('ADVERT_DOWNLOAD_MODE', 'redirect')
+ADVERT_DOWNLOAD_URL_EXPIRY = int(os.getenv('ADVERT_DOWNLOAD_URL_EXPIRY', 300))  # Seconds a presigned download URL stays valid
+# Proxy mode keeps recently downloaded advert files on local disk; 0 streams every download from S3
+ADVERT_CACHE_DIR = os.getenv('ADVERT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'grandview-adverts'))
+ADVERT_CACHE_MAX_BYTES = int(os.getenv('ADVERT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+ADVERT_CACHE_INFO_SECONDS = int(os.getenv('ADVERT_CACHE_INFO_SECONDS', 60))  # How long an object's ETag is trusted without a HEAD request
 
 # Custom storage for S3
 class S3MediaStorage(S3Boto3Storage):
@@ -185,6 +243,22 @@ class S3MediaStorage(S3Boto3Storage):
         self.acl = kwargs.pop('default_acl', 'public-read')
         super().__init__(*args, **kwargs)
 
+    @property
+    def connection(self):
+        # Built from the process-wide boto3 session rather than a new session per storage and thread
+        from grandview.s3 import get_resource
+        return get_resource(region_name=self.region_name, config=self.client_config)
+
+class S3PrivateMediaStorage(S3MediaStorage):
+    # Private objects, served through short-lived signed URLs
+    custom_domain = None
+    querystring_auth = True
+    querystring_expire = 3600
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default_acl', 'private')
+        super().__init__(*args, **kwargs)
+
 # Keep DEFAULT_FILE_STORAGE as local
 DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 MEDIA_URL = '/media/'
@@ -0,0 +1,216 @@
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.handlers.wsgi import WSGIRequest
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import force_authenticate
+from threading import Barrier, Thread
+from unittest import mock
+import boto3
+import io
+import tracemalloc
+from accounts.models import CustomUser
+from adverts.models import Advert, Submission
+from dashboard.models import LipaProgramRegistration
+from support.auth import TokenAuthMiddleware
+from support.models import PrivateMessage
+from wallet.consumers import wallet_group
+from wallet.routing import websocket_urlpatterns
+from . import s3, uploads
+from .consumers import EventConsumer
+from .events import publish
+
+@override_settings(AWS_ACCESS_KEY_ID='test-key', AWS_SECRET_ACCESS_KEY='test-secret', AWS_STORAGE_BUCKET_NAME='test-bucket')
+class SharedS3ClientTests(TestCase):
+    def setUp(self):
+        s3.reset()
+        self.addCleanup(s3.reset)
+        patcher = mock.patch.object(boto3.session.Session, 'client', autospec=True, side_effect=boto3.session.Session.client)
+        self.client_factory = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_presigning_views_share_one_client(self):
+        user = CustomUser.objects.create_user(
+            username='uploader', password='pass12345', email='uploader@example.com', phone_number='+254700009001'
+        )
+        advert = Advert.objects.create(title='Shared', file='adverts/shared.mp4', rate_category=100)
+        self.client.force_login(user)
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('advert_download', args=[advert.pk]), secure=True).status_code, 302)
+            self.assertEqual(self.client.post(reverse('support_upload'), secure=True).status_code, 200)
+            response = self.client.post(reverse('lipa_presign'), {'file_name': 'id.jpg', 'file_type': 'image/jpeg'}, secure=True)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client_factory.call_count, 1)
+
+    def test_concurrent_first_use_builds_one_client(self):
+        barrier = Barrier(8)
+        clients = []
+
+        def use():
+            barrier.wait()
+            clients.append(s3.get_client())
+
+        workers = [Thread(target=use) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.client_factory.call_count, 1)
+        self.assertEqual(len({id(c) for c in clients}), 1)
+
+    def test_credential_change_rebuilds_the_client(self):
+        first = s3.get_client()
+        with override_settings(AWS_ACCESS_KEY_ID='rotated-key'):
+            self.assertIsNot(s3.get_client(), first)
+            self.assertIn('rotated-key', s3.presigned_url('get_object', 'adverts/a.mp4', 60))
+
+BOUNDARY = 'grandview-test-boundary'
+
+class GeneratedBody(io.RawIOBase):
+    """A multipart body produced as it is read, so the test never holds the upload in memory."""
+
+    def __init__(self, fields=None, files=()):
+        segments = []
+        for name, value in (fields or {}).items():
+            segments.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, content_type, head, size in files:
+            segments.append((
+                f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.bin"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'
+            ).encode() + head)
+            segments.append(size - len(head))  # Padding, generated on demand
+            segments.append(b'\r\n')
+        segments.append(f'--{BOUNDARY}--\r\n'.encode())
+        self.segments = segments
+        self.length = sum(s if isinstance(s, int) else len(s) for s in segments)
+        self.sent = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.segments:
+            segment = self.segments[0]
+            if isinstance(segment, int):
+                n = min(len(buffer), segment)
+                buffer[:n] = b'0' * n
+                if segment > n:
+                    self.segments[0] = segment - n
+                else:
+                    self.segments.pop(0)
+            else:
+                n = min(len(buffer), len(segment))
+                buffer[:n] = segment[:n]
+                if len(segment) > n:
+                    self.segments[0] = segment[n:]
+                else:
+                    self.segments.pop(0)
+            if n:
+                self.sent += n
+                return n
+        return 0
+
+class StreamingUploadLimitTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='streamer', password='pass12345', email='streamer@example.com', phone_number='+254700009002'
+        )
+
+    def _post(self, path, body, content_length=None):
+        """Run ``body`` through the view at ``path`` and return the response and peak traced memory."""
+        environ = RequestFactory()._base_environ(
+            PATH_INFO=path,
+            REQUEST_METHOD='POST',
+            CONTENT_TYPE=f'multipart/form-data; boundary={BOUNDARY}',
+            CONTENT_LENGTH=str(content_length or body.length),
+            **{'wsgi.input': io.BufferedReader(body)},
+        )
+        request = WSGIRequest(environ)
+        force_authenticate(request, user=self.user)
+        tracemalloc.start()
+        try:
+            response = resolve(path).func(request)
+            response.render()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return response, peak
+
+    def test_oversized_body_is_refused_before_it_is_read(self):
+        body = GeneratedBody({'advert_id': 1, 'views_count': 1}, [('screenshot', 'image/jpeg', b'\xff\xd8\xff', 50 * 1024 * 1024)])
+        response, peak = self._post(reverse('advert_submit'), body)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('too large', response.data['error'])
+        self.assertEqual(body.sent, 0)
+        self.assertLess(peak, 1024 * 1024)
+
+    def test_limits_follow_settings_changes(self):
+        body = GeneratedBody({'advert_id': 1, 'views_count': 1}, [('screenshot', 'image/jpeg', b'\xff\xd8\xff', 1024 * 1024)])
+        with override_settings(SUBMISSION_SCREENSHOT_MAX_BYTES=512 * 1024):
+            response, _ = self._post(reverse('advert_submit'), body)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(body.sent, 0)
+
+    def test_oversized_file_is_aborted_at_its_limit(self):
+        # Within the form's overall allowance, so the handler has to stop it mid-stream
+        body = GeneratedBody({'full_name': 'Streamer', 'date_of_birth': '1990-01-01', 'address': 'Nairobi'}, [
+            ('id_front', 'image/png', b'\x89PNG\r\n\x1a\n', 12 * 1024 * 1024),
+        ])
+        response, peak = self._post(reverse('lipa_register'), body)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('id_front', str(response.data['detail']))
+        self.assertLess(body.sent, uploads.MAX_BYTES + 256 * 1024)
+        self.assertLess(peak, 1024 * 1024)
+        self.assertFalse(LipaProgramRegistration.objects.exists())
+
+    def test_disallowed_and_disguised_types_are_rejected(self):
+        receiver = CustomUser.objects.create_user(
+            username='receiver', password='pass12345', email='receiver@example.com', phone_number='+254700009003'
+        )
+        fields = {'receiver': receiver.pk, 'content': 'hi'}
+        path = reverse('private_messages')
+        for content_type, head in [('text/html', b'<html>'), ('image/png', b'<html><script>')]:
+            body = GeneratedBody(fields, [('image', content_type, head, 4096)])
+            response, _ = self._post(path, body)
+            self.assertEqual(response.status_code, 415, content_type)
+        body = GeneratedBody(fields, [('attachment', 'image/png', b'\x89PNG\r\n\x1a\n', 4096)])
+        self.assertEqual(self._post(path, body)[0].status_code, 400)
+        self.assertFalse(PrivateMessage.objects.exists())
+
+    def test_file_within_limits_reaches_the_view(self):
+        advert = Advert.objects.create(title='Streamed', file='adverts/streamed.mp4', rate_category=100)
+        body = GeneratedBody({'advert_id': advert.pk, 'views_count': 1}, [('screenshot', 'image/jpeg', b'\xff\xd8\xff', 1024 * 1024)])
+        response, _ = self._post(reverse('advert_submit'), body)
+        # Parsed in full and handed to the view, which then finds no package for the advert
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'No active package for this rate category')
+        self.assertEqual(body.sent, body.length)
+        self.assertFalse(Submission.objects.exists())
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class EventConsumerTests(TransactionTestCase):
+    async def connect(self, app, path):
+        communicator = WebsocketCommunicator(app, path)
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_published_events_reach_the_subscribed_socket(self):
+        user = await sync_to_async(CustomUser.objects.create_user)(
+            username='listener', password='pass12345', email='listener@example.com', phone_number='+254700009004'
+        )
+        token = await sync_to_async(Token.objects.create)(user=user)
+        app = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        wallet, connected = await self.connect(app, f'/ws/wallet/?token={token.key}')
+        self.assertTrue(connected)
+        await sync_to_async(publish)(wallet_group(user.pk), 'deposit.updated', {'status': 'COMPLETED'})
+        self.assertEqual(await wallet.receive_json_from(), {'type': 'deposit.updated', 'data': {'status': 'COMPLETED'}})
+        await wallet.disconnect()
+
+        _, anonymous_connected = await self.connect(app, '/ws/wallet/')
+        self.assertFalse(anonymous_connected)
+
+    async def test_consumer_without_groups_refuses_the_connection(self):
+        _, connected = await self.connect(EventConsumer.as_asgi(), '/ws/')
+        self.assertFalse(connected)
@@ -0,0 +1,113 @@
+"""Per-field limits on multipart uploads, enforced while the body streams in.
+
+Checking ``file.size`` in a view or serializer happens only after Django has
+read the whole body into memory or a temporary file. Views that accept
+files use LimitedMultiPartParser and declare ``upload_limits``, a mapping of
+file field name to ``(max_bytes, content_types)``, or override
+``get_upload_limits()`` when the limits come from settings that may change
+between requests. The request is refused
+before anything is read when its Content-Length already exceeds what the
+fields allow, and otherwise as soon as one file crosses its limit.
+"""
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import MultiPartParser
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = 5 * 1024 * 1024
+IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+DOCUMENT_TYPES = ('image/jpeg', 'image/png', 'application/pdf')
+# Room for the text fields and multipart headers around the files
+FORM_OVERHEAD = 64 * 1024
+
+SIGNATURES = {
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/gif': (b'GIF87a', b'GIF89a'),
+    'application/pdf': (b'%PDF-',),
+}
+SNIFF_BYTES = 12
+
+class UploadRejected(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Upload rejected.'
+
+class UploadTooLarge(UploadRejected):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload too large.'
+
+class UploadTypeNotAllowed(UploadRejected):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = 'File type not allowed.'
+
+def _looks_like(content_type, head):
+    if content_type == 'image/webp':
+        return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+    return head.startswith(SIGNATURES.get(content_type, (b'',)))
+
+def _mb(size):
+    return f'{size / (1024 * 1024):g}MB'
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Runs ahead of Django's own handlers and raises before they store an oversized or mistyped file."""
+
+    def __init__(self, limits, request=None):
+        super().__init__(request)
+        self.limits = limits
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        allowed = sum(max_bytes for max_bytes, _ in self.limits.values()) + FORM_OVERHEAD
+        if content_length and content_length > allowed:
+            logger.warning(f"Refused {content_length} byte upload to {self.request.path if self.request else '?'} before reading it")
+            raise UploadTooLarge(f'Request body too large (max {_mb(allowed)}).')
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name not in self.limits:
+            raise UploadRejected(f'Unexpected file field "{field_name}".')
+        self.max_bytes, content_types = self.limits[field_name]
+        if content_type not in content_types:
+            raise UploadTypeNotAllowed(f'{field_name} must be one of: {", ".join(content_types)}.')
+        self.received = 0
+        self.head = b''
+
+    def _check_head(self):
+        if not _looks_like(self.content_type, self.head):
+            raise UploadTypeNotAllowed(f'{self.field_name} is not a valid {self.content_type} file.')
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            logger.warning(f"Aborted upload of {self.field_name} after {self.received} bytes")
+            raise UploadTooLarge(f'{self.field_name} must not exceed {_mb(self.max_bytes)}.')
+        if len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) == SNIFF_BYTES:
+                self._check_head()
+        return raw_data
+
+    def file_complete(self, file_size):
+        if len(self.head) < SNIFF_BYTES:
+            self._check_head()
+        # Let the next handler build the uploaded file
+        return None
+
+def get_upload_limits(view):
+    """The view's limits for this request: ``get_upload_limits()`` if it has one, else ``upload_limits``."""
+    if hasattr(view, 'get_upload_limits'):
+        return view.get_upload_limits()
+    return getattr(view, 'upload_limits', None)
+
+class LimitedMultiPartParser(MultiPartParser):
+    """MultiPartParser that applies the view's upload limits while parsing."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        limits = get_upload_limits(parser_context.get('view'))
+        if limits:
+            request = parser_context['request']
+            request.upload_handlers.insert(0, LimitedUploadHandler(limits, request._request))
+        return super().parse(stream, media_type, parser_context)
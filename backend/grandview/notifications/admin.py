@@ -0,0 +1,16 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboundEmail
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'created_at', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='SENT').update(status='PENDING', next_attempt_at=timezone.now())
+        self.message_user(request, f'{updated} email(s) queued for immediate retry.')
+    retry_now.short_description = "Retry selected emails now"
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .models import OutboundEmail
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+def queue_email(subject, template, context, recipient_list, from_email=None):
+    """Render an email template and store it in the outbox for the dispatcher.
+
+    The row is written inside the caller's transaction, so the email only
+    becomes visible to the dispatcher once that transaction commits and is
+    discarded if it rolls back.
+    """
+    html_body = render_to_string(template, context)
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+        html_body=html_body,
+    )
+    logger.debug(f"Queued email {email.pk} '{subject}' for {recipient_list}")
+    return email
+
+def retry_delay(attempts):
+    delay = timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * (2 ** max(attempts - 1, 0)))
+    return min(delay, MAX_RETRY_DELAY)
+
+def _mark_failed_attempt(email, error, now):
+    email.attempts += 1
+    email.last_error = error
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'FAILED'
+        logger.error(f"Giving up on email {email.pk} after {email.attempts} attempts: {error}")
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+        logger.warning(f"Email {email.pk} failed (attempt {email.attempts}), retrying at {email.next_attempt_at}: {error}")
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+def send_queued_emails(batch_size=None):
+    """Send one batch of due emails over a single backend connection.
+
+    Returns a ``(sent, failed)`` tuple for the batch.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    now = timezone.now()
+    sent = failed = 0
+
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if not batch:
+            return sent, failed
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for email in batch:
+                _mark_failed_attempt(email, f"Connection error: {str(e)}", now)
+            return sent, len(batch)
+
+        try:
+            for email in batch:
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.text_body,
+                    from_email=email.from_email,
+                    to=email.recipients,
+                    connection=connection,
+                )
+                message.attach_alternative(email.html_body, 'text/html')
+                try:
+                    message.send(fail_silently=False)
+                except Exception as e:
+                    _mark_failed_attempt(email, str(e), now)
+                    failed += 1
+                    continue
+                email.status = 'SENT'
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.last_error = None
+                email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+                sent += 1
+        finally:
+            connection.close()
+
+    logger.info(f"Email outbox batch done: {sent} sent, {failed} failed")
+    return sent, failed
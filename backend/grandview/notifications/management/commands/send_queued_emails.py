@@ -0,0 +1,39 @@
+# notifications/management/commands/send_queued_emails.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from notifications.mail import send_queued_emails
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Sends queued outbound emails; use --loop to run as a long-lived worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=settings.EMAIL_OUTBOX_POLL_INTERVAL, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE, help='Emails sent per SMTP connection')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            close_old_connections()
+            try:
+                sent, failed = send_queued_emails(batch_size=options['batch_size'])
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                logger.error(f"Email outbox dispatch error: {str(e)}", exc_info=True)
+                sent, failed = 0, 0
+            total_sent += sent
+            total_failed += failed
+            if not options['loop']:
+                # Drain everything that is currently due before exiting
+                if sent or failed:
+                    continue
+                break
+            if not sent and not failed:
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails ({total_failed} failed attempts)'))
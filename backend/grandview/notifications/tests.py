@@ -0,0 +1,98 @@
+from django.test import TestCase, override_settings
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocMemBackend
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+from .models import OutboundEmail
+from .mail import queue_email, send_queued_emails
+
+class CountingBackend(LocMemBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP unavailable")
+
+class OutboundEmailQueueTests(TestCase):
+    def _queue(self, recipient='user@example.com'):
+        return queue_email(
+            subject='Welcome to Grandview!',
+            template='emails/welcome_email.html',
+            context={'user': {'username': 'user'}, 'site_url': 'https://example.com'},
+            recipient_list=[recipient],
+        )
+
+    def test_queue_email_renders_without_sending(self):
+        email = self._queue()
+        self.assertEqual(email.status, 'PENDING')
+        self.assertIn('<', email.html_body)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_rolled_back_transaction_discards_email(self):
+        try:
+            with transaction.atomic():
+                self._queue()
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.CountingBackend')
+    def test_batch_is_sent_over_one_connection(self):
+        CountingBackend.opened = 0
+        for i in range(5):
+            self._queue(f'user{i}@example.com')
+        sent, failed = send_queued_emails(batch_size=10)
+        self.assertEqual((sent, failed), (5, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertEqual(OutboundEmail.objects.filter(status='SENT').count(), 5)
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.FailingBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failed_send_is_retried_with_backoff(self):
+        email = self._queue()
+        before = timezone.now()
+        self.assertEqual(send_queued_emails(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'PENDING')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=60))
+
+        # Not due yet, so nothing is picked up
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        send_queued_emails()
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'FAILED')
+        self.assertEqual(email.attempts, 2)
+
+    def test_management_command_drains_outbox(self):
+        for i in range(3):
+            self._queue(f'user{i}@example.com')
+        out = StringIO()
+        call_command('send_queued_emails', batch_size=2, stdout=out)
+        self.assertIn('Sent 3 emails', out.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_register_view_queues_instead_of_sending(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'newuser',
+            'email': 'newuser@example.com',
+            'phone_number': '+254700000001',
+            'password': 'pass12345',
+            'password2': 'pass12345',
+        }, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(recipients=['newuser@example.com']).count(), 2)
@@ -3,6 +3,7 @@ from .models import Package, Purchase, CashbackBonus
 from accounts.models import CustomUser
 from decimal import Decimal
 from wallet.models import Wallet, Transaction
+from wallet import ledger
 from django.utils import timezone
 from django.db import transaction
 import logging
@@ -85,34 +86,15 @@ class PurchaseCreateSerializer(serializers.ModelSerializer):
 
             price = package.price
 
-            user_wallet = Wallet.objects.get(user=user)
-            
-            if user.is_marketer:
-                if user_wallet.views_earnings_balance >= price:
-                    user_wallet.views_earnings_balance -= price
-                else:
-                    from_earnings = user_wallet.views_earnings_balance
-                    from_deposit = price - from_earnings
-                    if user_wallet.deposit_balance < from_deposit:
-                        raise serializers.ValidationError("Insufficient balance (views earnings + deposit).")
-                    user_wallet.views_earnings_balance -= from_earnings
-                    user_wallet.deposit_balance -= from_deposit
-            else:
-                if user_wallet.deposit_balance < price:
-                    raise serializers.ValidationError("Insufficient deposit balance. Non-marketers must use deposit balance.")
-                user_wallet.deposit_balance -= price
-
-            user_wallet.save()
+            try:
+                ledger.charge(user, price, 'PURCHASE', f"Purchased {package.name}")
+            except ledger.InsufficientFunds:
+                if user.is_marketer:
+                    raise serializers.ValidationError("Insufficient balance (views earnings + deposit).")
+                raise serializers.ValidationError("Insufficient deposit balance. Non-marketers must use deposit balance.")
 
             purchase = Purchase.objects.create(user=user, package=package)
 
-            Transaction.objects.create(
-                user=user,
-                amount=-price,
-                transaction_type='PURCHASE',
-                description=f"Purchased {package.name}"
-            )
-
             bonus_amount = Decimal('0')
             claim_cost = Decimal('0')
             if package.rate_per_view == 90:
@@ -4,8 +4,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .serializers import PackageSerializer, PurchaseCreateSerializer, PurchaseSerializer
 from .models import Package, Purchase, CashbackBonus
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from notifications.mail import queue_email
 from django.conf import settings
 from django.utils import timezone
 import logging
@@ -47,26 +46,22 @@ class PackagePurchaseView(APIView):
                     template = 'emails/purchase_confirmation.html'
                     subject = 'Welcome to Your New Package!'
 
-                context = {
-                    'user': user,
-                    'package': package,
-                    'price': package.price,
-                    'expiry_date': purchase.expiry_date,
-                    'previous_rate': previous_rate,
-                    'bonus_amount': bonus_amount,
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string(template, context)
-                send_mail(
+                queue_email(
                     subject=subject,
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    template=template,
+                    context={
+                        'user': user,
+                        'package': package,
+                        'price': package.price,
+                        'expiry_date': purchase.expiry_date,
+                        'previous_rate': previous_rate,
+                        'bonus_amount': bonus_amount,
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                logger.error(f"Failed to send purchase email to {user.email}: {str(e)}")
+                logger.error(f"Failed to queue purchase email to {user.email}: {str(e)}")
 
             return Response(
                 {
@@ -105,70 +100,37 @@ class CashbackClaimView(APIView):
         except CashbackBonus.DoesNotExist:
             return Response({'error': 'No bonus available'}, status=status.HTTP_400_BAD_REQUEST)
         
-        from decimal import Decimal
-        from wallet.models import Wallet, Transaction
         from django.db import transaction
         from rest_framework.serializers import ValidationError
+        from wallet import ledger
         
         with transaction.atomic():
-            price = bonus.claim_cost
-            user_wallet = Wallet.objects.get(user=user)
-            
-            if user.is_marketer:
-                if user_wallet.views_earnings_balance >= price:
-                    user_wallet.views_earnings_balance -= price
-                else:
-                    from_earnings = user_wallet.views_earnings_balance
-                    from_deposit = price - from_earnings
-                    if user_wallet.deposit_balance < from_deposit:
-                        raise ValidationError("Insufficient balance (views earnings + deposit).")
-                    user_wallet.views_earnings_balance = Decimal('0')
-                    user_wallet.deposit_balance -= from_deposit
-            else:
-                if user_wallet.deposit_balance < price:
-                    raise ValidationError("Insufficient deposit balance. Non-marketers must use deposit balance.")
-                user_wallet.deposit_balance -= price
-            
-            user_wallet.views_earnings_balance += bonus.amount
-            user_wallet.save()
-            
-            Transaction.objects.create(
-                user=user,
-                amount=-price,
-                transaction_type='CLAIM_FEE',
-                description='Cashback claim fee'
-            )
-            Transaction.objects.create(
-                user=user,
-                amount=bonus.amount,
-                transaction_type='CASHBACK',
-                description='Cashback bonus received'
-            )
+            try:
+                ledger.charge(user, bonus.claim_cost, 'CLAIM_FEE', 'Cashback claim fee')
+            except ledger.InsufficientFunds:
+                if user.is_marketer:
+                    raise ValidationError("Insufficient balance (views earnings + deposit).")
+                raise ValidationError("Insufficient deposit balance. Non-marketers must use deposit balance.")
+            ledger.credit(user, bonus.amount, 'CASHBACK', 'Cashback bonus received')
             
             bonus.claimed = True
             bonus.claim_date = timezone.now()
             bonus.save()
         
-        # Send email
+        # Queue email
         try:
-            template = 'emails/cashback_claim.html'
-            subject = 'Cashback Bonus Claimed!'
-            context = {
-                'user': user,
-                'bonus_amount': bonus.amount,
-                'package': active_purchase.package,
-                'site_url': settings.SITE_URL,
-            }
-            message = render_to_string(template, context)
-            send_mail(
-                subject=subject,
-                message='',
-                from_email=settings.DEFAULT_FROM_EMAIL,
+            queue_email(
+                subject='Cashback Bonus Claimed!',
+                template='emails/cashback_claim.html',
+                context={
+                    'user': user,
+                    'bonus_amount': bonus.amount,
+                    'package': active_purchase.package,
+                    'site_url': settings.SITE_URL,
+                },
                 recipient_list=[user.email],
-                html_message=message,
-                fail_silently=False,
             )
         except Exception as e:
-            logger.error(f"Failed to send cashback claim email to {user.email}: {str(e)}")
+            logger.error(f"Failed to queue cashback claim email to {user.email}: {str(e)}")
         
         return Response({'message': 'Successfully withdrawn your cashback bonus'}, status=status.HTTP_200_OK)
\ No newline at end of file
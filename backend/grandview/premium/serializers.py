@@ -4,13 +4,13 @@ from rest_framework import serializers
 from .models import AgentVerificationPackage, AgentPurchase, WeeklyBonus, CashbackBonus
 from accounts.models import CustomUser
 from wallet.models import Wallet, Transaction
+from wallet import ledger
 from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
 import logging
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.core.mail import send_mail
+from notifications.mail import queue_email
 
 logger = logging.getLogger(__name__)
 
@@ -51,24 +51,18 @@ class AgentPurchaseCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("You already have an active Agent Verification package.")
 
             # Deduct price from wallet
-            user_wallet = Wallet.objects.get(user=user)
             price = package.price
-            if user.is_marketer:
-                if user_wallet.views_earnings_balance >= price:
-                    user_wallet.views_earnings_balance -= price
-                else:
-                    from_earnings = user_wallet.views_earnings_balance
-                    from_deposit = price - from_earnings
-                    if user_wallet.deposit_balance < from_deposit:
-                        raise serializers.ValidationError("Insufficient balance (views earnings + deposit). Please top up your deposit balance if needed.")
-                    user_wallet.views_earnings_balance -= from_earnings
-                    user_wallet.deposit_balance -= from_deposit
-            else:
-                if user_wallet.deposit_balance < price:
-                    raise serializers.ValidationError(f"Insufficient deposit balance. Please top up to purchase the verified agent package.")
-                user_wallet.deposit_balance -= price
-
-            user_wallet.save()
+            try:
+                ledger.charge(
+                    user,
+                    price,
+                    'AGENT_PURCHASE',
+                    f"Agent Verification package {package.name} purchased for {price}"
+                )
+            except ledger.InsufficientFunds:
+                if user.is_marketer:
+                    raise serializers.ValidationError("Insufficient balance (views earnings + deposit). Please top up your deposit balance if needed.")
+                raise serializers.ValidationError(f"Insufficient deposit balance. Please top up to purchase the verified agent package.")
 
             # Create AgentPurchase
             purchase = AgentPurchase.objects.create(
@@ -93,14 +87,6 @@ class AgentPurchaseCreateSerializer(serializers.ModelSerializer):
                 claim_cost=Decimal('2000')
             )
 
-            # Create transaction
-            Transaction.objects.create(
-                user=user,
-                amount=-price,
-                transaction_type='AGENT_PURCHASE',
-                description=f"Agent Verification package {package.name} purchased for {price}"
-            )
-
             return {
                 'message': f'Success! You are now a verified agent.',
                 'purchase_id': purchase.id,
@@ -127,60 +113,32 @@ class WeeklyBonusSerializer(serializers.ModelSerializer):
         if instance.claimed:
             raise serializers.ValidationError("This bonus has already been claimed.")
         with transaction.atomic():
-            user_wallet = Wallet.objects.get(user=user)
             claim_cost = instance.claim_cost
-            if user.is_marketer:
-                if user_wallet.views_earnings_balance >= claim_cost:
-                    user_wallet.views_earnings_balance -= claim_cost
-                else:
-                    from_earnings = user_wallet.views_earnings_balance
-                    from_deposit = claim_cost - from_earnings
-                    if user_wallet.deposit_balance < from_deposit:
+            if claim_cost > 0:
+                try:
+                    ledger.charge(user, claim_cost, 'CLAIM_FEE', f"Claim fee for weekly bonus of {instance.amount}")
+                except ledger.InsufficientFunds:
+                    if user.is_marketer:
                         raise serializers.ValidationError(f"Insufficient balance (views earnings + deposit) to cover claim cost of KSh {claim_cost}. Please top up your deposit balance if needed.")
-                    user_wallet.views_earnings_balance -= from_earnings
-                    user_wallet.deposit_balance -= from_deposit
-            else:
-                if user_wallet.deposit_balance < claim_cost:
                     raise serializers.ValidationError(f"You need to deposit the claim cost amount of KSh {claim_cost} in order to withdraw your bonus.")
-                user_wallet.deposit_balance -= claim_cost
-
-            user_wallet.views_earnings_balance += instance.amount
-            user_wallet.save()
-
-            if claim_cost > 0:
-                Transaction.objects.create(
-                    user=user,
-                    amount=-claim_cost,
-                    transaction_type='CLAIM_FEE',
-                    description=f"Claim fee for weekly bonus of {instance.amount}"
-                )
-            Transaction.objects.create(
-                user=user,
-                amount=instance.amount,
-                transaction_type='WEEKLY_BONUS',
-                description=f"Weekly bonus of {instance.amount} claimed"
-            )
+            ledger.credit(user, instance.amount, 'WEEKLY_BONUS', f"Weekly bonus of {instance.amount} claimed")
             instance.claimed = True
             instance.claim_date = timezone.now()
             instance.save()
             try:
-                context = {
-                    'user': user,
-                    'bonus_amount': instance.amount,
-                    'claim_cost': claim_cost,
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string('emails/weekly_bonus_claim.html', context)
-                send_mail(
+                queue_email(
                     subject='Weekly Bonus Claimed!',
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    template='emails/weekly_bonus_claim.html',
+                    context={
+                        'user': user,
+                        'bonus_amount': instance.amount,
+                        'claim_cost': claim_cost,
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                logger.error(f"Failed to send weekly bonus email to {user.email}: {str(e)}")
+                logger.error(f"Failed to queue weekly bonus email to {user.email}: {str(e)}")
             return instance
 
 class CashbackBonusSerializer(serializers.ModelSerializer):
@@ -193,57 +151,29 @@ class CashbackBonusSerializer(serializers.ModelSerializer):
         if instance.claimed:
             raise serializers.ValidationError("This bonus has already been claimed.")
         with transaction.atomic():
-            user_wallet = Wallet.objects.get(user=user)
             claim_cost = instance.claim_cost
-            if user.is_marketer:
-                if user_wallet.views_earnings_balance >= claim_cost:
-                    user_wallet.views_earnings_balance -= claim_cost
-                else:
-                    from_earnings = user_wallet.views_earnings_balance
-                    from_deposit = claim_cost - from_earnings
-                    if user_wallet.deposit_balance < from_deposit:
-                        raise serializers.ValidationError(f"Insufficient balance (views earnings + deposit) to cover claim cost of KSh {claim_cost}. Please top up your deposit balance if needed.")
-                    user_wallet.views_earnings_balance -= from_earnings
-                    user_wallet.deposit_balance -= from_deposit
-            else:
-                if user_wallet.deposit_balance < claim_cost:
-                    raise serializers.ValidationError(f"You need to deposit the claim cost amount of KSh {claim_cost} in order to withdraw your bonus.")
-                user_wallet.deposit_balance -= claim_cost
-
-            user_wallet.views_earnings_balance += instance.amount
-            user_wallet.save()
-
-            Transaction.objects.create(
-                user=user,
-                amount=-claim_cost,
-                transaction_type='CLAIM_FEE',
-                description=f"Claim fee for cashback bonus of {instance.amount}"
-            )
-            Transaction.objects.create(
-                user=user,
-                amount=instance.amount,
-                transaction_type='CASHBACK',
-                description=f"Cashback bonus of {instance.amount} claimed"
-            )
+            try:
+                ledger.charge(user, claim_cost, 'CLAIM_FEE', f"Claim fee for cashback bonus of {instance.amount}")
+            except ledger.InsufficientFunds:
+                if user.is_marketer:
+                    raise serializers.ValidationError(f"Insufficient balance (views earnings + deposit) to cover claim cost of KSh {claim_cost}. Please top up your deposit balance if needed.")
+                raise serializers.ValidationError(f"You need to deposit the claim cost amount of KSh {claim_cost} in order to withdraw your bonus.")
+            ledger.credit(user, instance.amount, 'CASHBACK', f"Cashback bonus of {instance.amount} claimed")
             instance.claimed = True
             instance.claim_date = timezone.now()
             instance.save()
             try:
-                context = {
-                    'user': user,
-                    'bonus_amount': instance.amount,
-                    'claim_cost': claim_cost,
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string('emails/cashback_claim.html', context)
-                send_mail(
+                queue_email(
                     subject='Cashback Bonus Claimed!',
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    template='emails/cashback_claim.html',
+                    context={
+                        'user': user,
+                        'bonus_amount': instance.amount,
+                        'claim_cost': claim_cost,
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                logger.error(f"Failed to send cashback bonus email to {user.email}: {str(e)}")
+                logger.error(f"Failed to queue cashback bonus email to {user.email}: {str(e)}")
             return instance
\ No newline at end of file
@@ -4,8 +4,7 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import status
 from .serializers import AgentVerificationPackageSerializer, AgentPurchaseSerializer, AgentPurchaseCreateSerializer, WeeklyBonusSerializer, CashbackBonusSerializer
 from .models import AgentVerificationPackage, AgentPurchase, WeeklyBonus, CashbackBonus
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from notifications.mail import queue_email
 from django.conf import settings
 import logging
 
@@ -28,25 +27,21 @@ class AgentPurchaseView(APIView):
             result = serializer.save()
             purchase = AgentPurchase.objects.get(id=result['purchase_id'])
             try:
-                context = {
-                    'user': request.user,
-                    'package': purchase.package,
-                    'price': purchase.package.price,
-                    'expiry_date': purchase.expiry_date,
-                    'bonus_amount': result['bonus_amount'],
-                    'site_url': settings.SITE_URL,
-                }
-                message = render_to_string('emails/agent_purchase.html', context)
-                send_mail(
+                queue_email(
                     subject='Agent Verification Package Purchased!',
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    template='emails/agent_purchase.html',
+                    context={
+                        'user': request.user,
+                        'package': purchase.package,
+                        'price': purchase.package.price,
+                        'expiry_date': purchase.expiry_date,
+                        'bonus_amount': result['bonus_amount'],
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[request.user.email],
-                    html_message=message,
-                    fail_silently=False,
                 )
             except Exception as e:
-                logger.error(f"Failed to send agent purchase email to {request.user.email}: {str(e)}")
+                logger.error(f"Failed to queue agent purchase email to {request.user.email}: {str(e)}")
             return Response(result, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -0,0 +1,27 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from rest_framework.authtoken.models import Token
+
+@database_sync_to_async
+def _token_user(key):
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Authenticate WebSockets from a ``?token=`` query parameter.
+
+    Browsers can't set an Authorization header on a WebSocket, so the
+    frontend passes its DRF token in the URL instead. Without a token the
+    session user from AuthMiddlewareStack is kept.
+    """
+
+    async def __call__(self, scope, receive, send):
+        key = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+        if key:
+            user = await _token_user(key)
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
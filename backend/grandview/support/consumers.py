@@ -0,0 +1,21 @@
+from grandview.consumers import EventConsumer
+
+FEED_GROUP = 'support_feed'
+
+def private_group(user_id):
+    return f'support_private_{user_id}'
+
+class SupportFeedConsumer(EventConsumer):
+    """New public messages, comments, likes and pins; open to anonymous readers like the feed itself."""
+
+    def event_groups(self):
+        return [FEED_GROUP]
+
+class PrivateMessageConsumer(EventConsumer):
+    """Messages and read receipts for the signed-in user's private conversations."""
+
+    def event_groups(self):
+        user = self.scope.get('user')
+        if not (user and user.is_authenticated):
+            return []
+        return [private_group(user.pk)]
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Left
+from django.utils import timezone
+from accounts.models import CustomUser
+from .models import PrivateMessage, SupportComment, SupportLike, SupportMessage
+
+def unread_since(user):
+    """Comments after this count as unread; users who never opened the feed see the last 30 days."""
+    return user.last_support_view or timezone.now() - timedelta(days=30)
+
+def _count(related, by='message'):
+    return Coalesce(Subquery(related.order_by().values(by).annotate(n=Count('pk')).values('n')), 0)
+
+def feed_messages(user):
+    """Public support messages with the counts SupportMessageSerializer reads annotated onto each row.
+
+    Counts are correlated subqueries rather than joins, so busy threads
+    don't multiply each other's rows.
+    """
+    likes = SupportLike.objects.filter(message=OuterRef('pk'))
+    comments = SupportComment.objects.filter(message=OuterRef('pk'))
+    messages = SupportMessage.objects.filter(is_private=False).select_related('user').annotate(
+        like_count=_count(likes),
+        comment_count=_count(comments),
+    )
+    # The API leaves request.user as None for anonymous requests
+    if user and user.is_authenticated:
+        return messages.annotate(
+            is_liked=Exists(likes.filter(user=user)),
+            unread_comment_count=_count(comments.filter(created_at__gt=unread_since(user))),
+        )
+    return messages.annotate(is_liked=Value(False), unread_comment_count=Value(0))
+
+def mark_feed_seen(user):
+    """Record that ``user`` just read the feed, writing at most once per SUPPORT_SEEN_INTERVAL.
+
+    Reads inside the interval are dropped, so unread counts can include
+    comments seen up to one interval ago.
+    """
+    now = timezone.now()
+    if cache.add(f'support_seen:{user.pk}', True, settings.SUPPORT_SEEN_INTERVAL):
+        CustomUser.objects.filter(pk=user.pk).update(last_support_view=now)
+        user.last_support_view = now
+
+def inbox(user):
+    """The latest message of each of ``user``'s conversations, most recent first.
+
+    A message is the latest when no newer one exists between the same two
+    people, so each conversation is one row and the whole page (with its
+    unread count and counterpart's name) comes from a single query.
+    """
+    newer = PrivateMessage.objects.filter(
+        Q(sender=OuterRef('sender'), receiver=OuterRef('receiver')) | Q(sender=OuterRef('receiver'), receiver=OuterRef('sender')),
+        pk__gt=OuterRef('pk'),
+    )
+    unread = PrivateMessage.objects.filter(receiver=user, sender=OuterRef('counterpart'), read_at__isnull=True)
+    return (
+        PrivateMessage.objects.filter(Q(sender=user) | Q(receiver=user))
+        .filter(~Exists(newer))
+        .annotate(counterpart=Case(When(sender=user, then=F('receiver')), default=F('sender')))
+        .annotate(
+            counterpart_username=Subquery(CustomUser.objects.filter(pk=OuterRef('counterpart')).values('username')),
+            unread_count=_count(unread, by='receiver'),
+            preview=Left('content', 100),
+        )
+        .order_by('-pk')
+    )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='privatemessage',
+            index=models.Index(fields=['receiver', 'sender', 'read_at'], name='support_pm_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:14
+
+from django.db import migrations, models
+import re
+
+
+def resolve_existing_mentions(apps, schema_editor):
+    SupportComment = apps.get_model('support', 'SupportComment')
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    comments = [c for c in SupportComment.objects.only('id', 'content') if '@' in c.content]
+    for comment in comments:
+        comment.mentions = list(dict.fromkeys(re.findall(r'@(\w+)', comment.content)))
+    usernames = {name for comment in comments for name in comment.mentions}
+    found = dict(CustomUser.objects.filter(username__in=usernames).values_list('username', 'id'))
+    for comment in comments:
+        comment.mentions = [{'id': found[name], 'username': name} for name in comment.mentions if name in found]
+    SupportComment.objects.bulk_update(comments, ['mentions'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0002_private_message_unread_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportcomment',
+            name='mentions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(resolve_existing_mentions, migrations.RunPython.noop),
+    ]
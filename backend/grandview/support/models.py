@@ -2,6 +2,21 @@ from django.db import models
 from accounts.models import CustomUser
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+import re
+
+MENTION_RE = re.compile(r'@(\w+)')
+
+def mentioned_usernames(content):
+    """The @usernames in ``content``, first occurrence order, without duplicates."""
+    return list(dict.fromkeys(MENTION_RE.findall(content or '')))
+
+def resolve_mentions(content):
+    """``(mentions, missing)``: the ``{'id', 'username'}`` list for users that exist, and the names that don't."""
+    names = mentioned_usernames(content)
+    if not names:
+        return [], []
+    found = dict(CustomUser.objects.filter(username__in=names).values_list('username', 'id'))
+    return [{'id': found[name], 'username': name} for name in names if name in found], [name for name in names if name not in found]
 
 class SupportMessage(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='support_messages')
@@ -26,6 +41,28 @@ class SupportComment(models.Model):
     content = models.TextField(max_length=500)
     created_at = models.DateTimeField(auto_now_add=True)
     parent_comment = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
+    mentions = models.JSONField(default=list, blank=True)  # [{'id', 'username'}] resolved when the comment is written
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_content = instance.content if 'content' in field_names else None
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Every write path (API, admin, ORM) stores the mentions; a new comment created
+        # with them already resolved, as the API does, is not looked up again
+        if self._state.adding:
+            stale = not self.mentions
+        else:
+            stale = self.content != getattr(self, '_loaded_content', None)
+        if stale:
+            self.mentions, _ = resolve_mentions(self.content)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'content' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'mentions'}
+        super().save(*args, **kwargs)
+        self._loaded_content = self.content
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.message.id}"
@@ -66,6 +103,12 @@ class PrivateMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     read_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Unread counts and read marking filter on all three
+            models.Index(fields=['receiver', 'sender', 'read_at'], name='support_pm_unread_idx'),
+        ]
+
     def clean(self):
         if not self.content and not self.image:
             raise ValidationError("Message must have content or an image.")
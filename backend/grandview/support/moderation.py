@@ -0,0 +1,37 @@
+from django.core.cache import cache
+from django.db.models import Exists, Max, OuterRef, Subquery
+from django.utils import timezone
+from rest_framework import serializers
+from accounts.models import CustomUser
+from .models import SupportBlock, SupportMute
+
+# Mute and block writes delete the entry (see support.signals); the timeout is only a backstop
+CACHE_SECONDS = 60 * 60
+
+def cache_key(user_id):
+    return f'support_moderation:{user_id}'
+
+def moderation_status(user):
+    """``{'muted_until': datetime or None, 'blocked': bool}`` for ``user``, read through the cache."""
+    key = cache_key(user.pk)
+    status = cache.get(key)
+    if status is None:
+        status = CustomUser.objects.filter(pk=user.pk).annotate(
+            muted_until=Subquery(
+                SupportMute.objects.filter(user=OuterRef('pk')).values('user').annotate(latest=Max('expires_at')).values('latest')
+            ),
+            blocked=Exists(SupportBlock.objects.filter(user=OuterRef('pk'))),
+        ).values('muted_until', 'blocked').get()
+        cache.set(key, status, CACHE_SECONDS)
+    return status
+
+def forget_moderation_status(user_id):
+    cache.delete(cache_key(user_id))
+
+def ensure_can_post(user, action):
+    """Raise the serializer error for a muted or blocked ``user`` trying to ``action`` (e.g. "post comments")."""
+    status = moderation_status(user)
+    if status['muted_until'] and status['muted_until'] > timezone.now():
+        raise serializers.ValidationError(f"You are muted and cannot {action}.")
+    if status['blocked']:
+        raise serializers.ValidationError(f"You are blocked and cannot {action}.")
@@ -0,0 +1,7 @@
+from django.urls import path
+from .consumers import PrivateMessageConsumer, SupportFeedConsumer
+
+websocket_urlpatterns = [
+    path('ws/support/feed/', SupportFeedConsumer.as_asgi()),
+    path('ws/support/private/', PrivateMessageConsumer.as_asgi()),
+]
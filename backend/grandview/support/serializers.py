@@ -1,9 +1,10 @@
 from rest_framework import serializers
-from .models import SupportMessage, SupportComment, SupportLike, SupportMute, SupportBlock, PrivateMessage
+from .models import SupportMessage, SupportComment, SupportLike, SupportMute, SupportBlock, PrivateMessage, resolve_mentions
 from accounts.models import CustomUser
+from .feed import unread_since
+from .moderation import ensure_can_post
 from django.utils import timezone
 from datetime import timedelta
-import re
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,35 +22,36 @@ class SupportMessageSerializer(serializers.ModelSerializer):
         model = SupportMessage
         fields = ['id', 'user', 'content', 'image', 'created_at', 'is_private', 'is_pinned', 'like_count', 'is_liked', 'comment_count', 'unread_comment_count']
 
+    # The feed annotates these (see feed.feed_messages); single messages fall back to querying
+
     def get_like_count(self, obj):
+        if hasattr(obj, 'like_count'):
+            return obj.like_count
         return obj.likes.count()
 
     def get_is_liked(self, obj):
+        if hasattr(obj, 'is_liked'):
+            return obj.is_liked
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
+        if request and request.user and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
 
     def get_comment_count(self, obj):
+        if hasattr(obj, 'comment_count'):
+            return obj.comment_count
         return obj.comments.count()
 
     def get_unread_comment_count(self, obj):
+        if hasattr(obj, 'unread_comment_count'):
+            return obj.unread_comment_count
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # Assume comments are unread if created after the user's last view
-            last_viewed = request.user.last_support_view or timezone.now() - timedelta(days=30)
-            return obj.comments.filter(created_at__gt=last_viewed).count()
+        if request and request.user and request.user.is_authenticated:
+            return obj.comments.filter(created_at__gt=unread_since(request.user)).count()
         return 0
 
     def validate(self, data):
-        user = self.context['request'].user
-        active_mute = SupportMute.objects.filter(
-            user=user, expires_at__gt=timezone.now()
-        ).exists()
-        if active_mute:
-            raise serializers.ValidationError("You are muted and cannot post messages.")
-        if SupportBlock.objects.filter(user=user).exists():
-            raise serializers.ValidationError("You are blocked and cannot post messages.")
+        ensure_can_post(self.context['request'].user, "post messages")
         return data
 
 class SupportCommentSerializer(serializers.ModelSerializer):
@@ -59,36 +61,26 @@ class SupportCommentSerializer(serializers.ModelSerializer):
         allow_null=True,
         required=False
     )
-    mentioned_users = serializers.SerializerMethodField()
+    mentioned_users = serializers.JSONField(source='mentions', read_only=True)
 
     class Meta:
         model = SupportComment
         fields = ['id', 'message', 'user', 'content', 'created_at', 'parent_comment', 'mentioned_users']
         read_only_fields = ['user', 'message', 'created_at', 'mentioned_users']
 
-    def get_mentioned_users(self, obj):
-        mentions = re.findall(r'@(\w+)', obj.content)
-        users = CustomUser.objects.filter(username__in=mentions).values('id', 'username')
-        return list(users)
-
     def validate(self, data):
         user = self.context['request'].user
         message = self.context.get('message')
-        active_mute = SupportMute.objects.filter(
-            user=user, expires_at__gt=timezone.now()
-        ).exists()
-        if active_mute:
-            raise serializers.ValidationError("You are muted and cannot post comments.")
-        if SupportBlock.objects.filter(user=user).exists():
-            raise serializers.ValidationError("You are blocked and cannot post comments.")
+        ensure_can_post(user, "post comments")
         parent_comment = data.get('parent_comment')
         if parent_comment:
             if parent_comment.message != message:
                 raise serializers.ValidationError("Parent comment must belong to the same message.")
-        mentions = re.findall(r'@(\w+)', data['content'])
-        for mention in mentions:
-            if not CustomUser.objects.filter(username=mention).exists():
-                raise serializers.ValidationError(f"User @{mention} does not exist.")
+        # Resolved once here and stored, so reading a comment never parses or queries
+        mentions, missing = resolve_mentions(data['content'])
+        if missing:
+            raise serializers.ValidationError(f"User @{missing[0]} does not exist.")
+        data['mentions'] = mentions
         return data
 
 class SupportLikeSerializer(serializers.ModelSerializer):
@@ -100,13 +92,7 @@ class SupportLikeSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         user = self.context['request'].user
-        active_mute = SupportMute.objects.filter(
-            user=user, expires_at__gt=timezone.now()
-        ).exists()
-        if active_mute:
-            raise serializers.ValidationError("You are muted and cannot like messages.")
-        if SupportBlock.objects.filter(user=user).exists():
-            raise serializers.ValidationError("You are blocked and cannot like messages.")
+        ensure_can_post(user, "like messages")
         if SupportLike.objects.filter(message=data['message'], user=user).exists():
             raise serializers.ValidationError("You have already liked this message.")
         return data
@@ -115,6 +101,7 @@ class SupportMuteSerializer(serializers.ModelSerializer):
     class Meta:
         model = SupportMute
         fields = ['id', 'user', 'muted_by', 'expires_at']
+        read_only_fields = ['muted_by', 'expires_at']
 
     def validate(self, data):
         if not self.context['request'].user.is_staff:
@@ -127,6 +114,7 @@ class SupportBlockSerializer(serializers.ModelSerializer):
     class Meta:
         model = SupportBlock
         fields = ['id', 'user', 'blocked_by']
+        read_only_fields = ['blocked_by']
 
     def validate(self, data):
         if not self.context['request'].user.is_staff:
@@ -144,16 +132,10 @@ class PrivateMessageSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         user = self.context['request'].user
-        active_mute = SupportMute.objects.filter(user=user, expires_at__gt=timezone.now()).exists()
-        if active_mute:
-            raise serializers.ValidationError("You are muted and cannot send messages.")
-        if SupportBlock.objects.filter(user=user).exists():
-            raise serializers.ValidationError("You are blocked and cannot send messages.")
+        ensure_can_post(user, "send messages")
         receiver = data.get('receiver')
         if not receiver:
             raise serializers.ValidationError({"receiver": "Receiver is required."})
         if receiver == user:
             raise serializers.ValidationError({"receiver": "You cannot send a message to yourself."})
-        if not CustomUser.objects.filter(id=receiver.id).exists():
-            raise serializers.ValidationError({"receiver": f"User with ID {receiver.id} does not exist."})
         return data
\ No newline at end of file
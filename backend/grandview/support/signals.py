@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .consumers import FEED_GROUP, private_group
+from grandview.events import publish
+from .models import PrivateMessage, SupportBlock, SupportComment, SupportLike, SupportMessage, SupportMute
+from .moderation import forget_moderation_status
+from .serializers import PrivateMessageSerializer, SupportCommentSerializer, SupportMessageSerializer
+
+@receiver(post_save, sender=SupportMessage)
+def publish_message(sender, instance, created, **kwargs):
+    if instance.is_private:
+        return
+    if not created:
+        publish(FEED_GROUP, 'message.updated', {'id': instance.pk, 'content': instance.content, 'is_pinned': instance.is_pinned})
+        return
+    # Nothing can have liked or answered a message that was just posted, so skip the count queries
+    instance.like_count = instance.comment_count = instance.unread_comment_count = 0
+    instance.is_liked = False
+    publish(FEED_GROUP, 'message.created', SupportMessageSerializer(instance).data)
+
+@receiver(post_save, sender=SupportComment)
+def publish_comment(sender, instance, created, **kwargs):
+    if created and not instance.message.is_private:
+        publish(FEED_GROUP, 'comment.created', SupportCommentSerializer(instance).data)
+
+@receiver(post_save, sender=SupportLike)
+def publish_like(sender, instance, created, **kwargs):
+    if created and not instance.message.is_private:
+        publish(FEED_GROUP, 'like.created', {
+            'message_id': instance.message_id,
+            'user_id': instance.user_id,
+            'like_count': SupportLike.objects.filter(message_id=instance.message_id).count(),
+        })
+
+@receiver(post_save, sender=PrivateMessage)
+def publish_private_message(sender, instance, created, **kwargs):
+    # Read receipts are bulk updates, published by PrivateMessageListView itself
+    if created:
+        data = PrivateMessageSerializer(instance).data
+        for user_id in {instance.sender_id, instance.receiver_id}:
+            publish(private_group(user_id), 'private_message.created', data)
+
+@receiver([post_save, post_delete], sender=SupportMute)
+@receiver([post_save, post_delete], sender=SupportBlock)
+def invalidate_moderation_status(sender, instance, **kwargs):
+    transaction.on_commit(lambda: forget_moderation_status(instance.user_id))
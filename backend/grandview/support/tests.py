@@ -1,3 +1,249 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.authtoken.models import Token
+from accounts.models import CustomUser
+from .auth import TokenAuthMiddleware
+from .models import PrivateMessage, SupportBlock, SupportComment, SupportLike, SupportMessage
+from .routing import websocket_urlpatterns
 
-# Create your tests here.
+def make_user(username, phone, **kwargs):
+    return CustomUser.objects.create_user(
+        username=username, password='pass12345', email=f'{username}@example.com', phone_number=phone, **kwargs
+    )
+
+class SupportFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = make_user('reader', '+254700000401', last_support_view=timezone.now() - timedelta(hours=1))
+        self.others = [make_user(f'poster{i}', f'+25470000041{i}') for i in range(3)]
+        for i, author in enumerate(self.others):
+            message = SupportMessage.objects.create(user=author, content=f'Question {i}')
+            for liker in self.others[:i + 1]:
+                SupportLike.objects.create(message=message, user=liker)
+            for j in range(i):
+                comment = SupportComment.objects.create(message=message, user=author, content=f'Reply {j}')
+                # Only the newest reply arrived after the reader's last visit
+                if j:
+                    SupportComment.objects.filter(pk=comment.pk).update(created_at=timezone.now() - timedelta(days=1))
+        self.liked = SupportMessage.objects.get(content='Question 0')
+        SupportLike.objects.create(message=self.liked, user=self.reader)
+        SupportMessage.objects.create(user=self.reader, content='Hidden', is_private=True)
+
+    def test_feed_counts_come_from_one_page_query(self):
+        self.client.force_login(self.reader)
+        # Session, user, page count, the annotated page and the last_support_view write
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('support_messages'), secure=True)
+        rows = {row['content']: row for row in response.json()['results']}
+        self.assertEqual(list(rows), ['Question 0', 'Question 1', 'Question 2'])
+        self.assertEqual([rows[c]['like_count'] for c in rows], [2, 2, 3])
+        self.assertEqual([rows[c]['is_liked'] for c in rows], [True, False, False])
+        self.assertEqual([rows[c]['comment_count'] for c in rows], [0, 1, 2])
+        self.assertEqual([rows[c]['unread_comment_count'] for c in rows], [0, 1, 1])
+        self.assertEqual(rows['Question 2']['user']['username'], 'poster2')
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        for i in range(10):
+            message = SupportMessage.objects.create(user=self.others[0], content=f'More {i}')
+            SupportLike.objects.create(message=message, user=self.others[1])
+            SupportComment.objects.create(message=message, user=self.others[2], content='Same here')
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('support_messages'), secure=True)
+        self.assertEqual(response.json()['count'], 13)
+        self.assertFalse(any(row['is_liked'] or row['unread_comment_count'] for row in response.json()['results']))
+
+    def test_repeat_reads_coalesce_into_one_last_seen_write(self):
+        self.client.force_login(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.client.get(reverse('support_messages'), secure=True)
+        writes = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "accounts_customuser"')]
+        self.assertEqual(len(writes), 1)
+        self.assertNotIn('password', writes[0])
+        self.reader.refresh_from_db()
+        self.assertGreater(self.reader.last_support_view, timezone.now() - timedelta(minutes=1))
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class SupportSocketTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = make_user('alice', '+254700000421')
+        self.bob = make_user('bob', '+254700000422')
+        self.app = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(self.app, path)
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_feed_pushes_messages_comments_and_likes(self):
+        feed, connected = await self.connect('/ws/support/feed/')
+        self.assertTrue(connected)
+        message = await sync_to_async(SupportMessage.objects.create)(user=self.alice, content='Help')
+        event = await feed.receive_json_from()
+        self.assertEqual((event['type'], event['data']['content']), ('message.created', 'Help'))
+
+        await sync_to_async(SupportComment.objects.create)(message=message, user=self.bob, content='@alice try again')
+        event = await feed.receive_json_from()
+        self.assertEqual(event['type'], 'comment.created')
+        self.assertEqual(event['data']['mentioned_users'], [{'id': self.alice.pk, 'username': 'alice'}])
+
+        await sync_to_async(SupportLike.objects.create)(message=message, user=self.bob)
+        event = await feed.receive_json_from()
+        self.assertEqual(event, {'type': 'like.created', 'data': {'message_id': message.pk, 'user_id': self.bob.pk, 'like_count': 1}})
+
+        await sync_to_async(SupportMessage.objects.create)(user=self.alice, content='Secret', is_private=True)
+        self.assertTrue(await feed.receive_nothing())
+        await feed.disconnect()
+
+    async def test_private_messages_reach_only_the_two_participants(self):
+        token = await sync_to_async(Token.objects.create)(user=self.bob)
+        inbox, connected = await self.connect(f'/ws/support/private/?token={token.key}')
+        self.assertTrue(connected)
+        _, anonymous_connected = await self.connect('/ws/support/private/')
+        self.assertFalse(anonymous_connected)
+
+        message = await sync_to_async(PrivateMessage.objects.create)(sender=self.alice, receiver=self.bob, content='Hi Bob')
+        event = await inbox.receive_json_from()
+        self.assertEqual((event['type'], event['data']['id']), ('private_message.created', message.pk))
+
+        carol = await sync_to_async(make_user)('carol', '+254700000423')
+        await sync_to_async(PrivateMessage.objects.create)(sender=self.alice, receiver=carol, content='Hi Carol')
+        self.assertTrue(await inbox.receive_nothing())
+        await inbox.disconnect()
+
+class ConversationReadTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice', '+254700000431')
+        self.bob = make_user('bob', '+254700000432')
+        PrivateMessage.objects.bulk_create([
+            PrivateMessage(sender=self.alice, receiver=self.bob, content=f'Message {i}') for i in range(25)
+        ])
+        PrivateMessage.objects.create(sender=self.bob, receiver=self.alice, content='Reply')
+
+    def test_opening_a_chat_marks_only_the_returned_page_read_in_one_update(self):
+        self.client.force_login(self.bob)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('conversation', args=[self.alice.pk]), secure=True)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "support_privatemessage"')]
+        self.assertEqual(len(updates), 1)
+        self.assertTrue(all(row['read_at'] for row in response.json()['results']))
+        self.assertEqual(PrivateMessage.objects.filter(receiver=self.bob, read_at__isnull=False).count(), 20)
+        self.assertFalse(PrivateMessage.objects.get(content='Reply').read_at)
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.me = make_user('me', '+254700000441')
+        self.contacts = [make_user(f'contact{i}', f'+25470000045{i}') for i in range(4)]
+        for i, contact in enumerate(self.contacts):
+            PrivateMessage.objects.create(sender=contact, receiver=self.me, content=f'Hello from {i}')
+            PrivateMessage.objects.create(sender=self.me, receiver=contact, content=f'Reply to {i}', read_at=timezone.now())
+            for j in range(i):
+                PrivateMessage.objects.create(sender=contact, receiver=self.me, content=f'Follow-up {j} from {i}')
+        PrivateMessage.objects.create(sender=self.contacts[0], receiver=self.contacts[1], content='Not mine')
+
+    def test_inbox_is_one_page_query_regardless_of_contacts(self):
+        self.client.force_login(self.me)
+        # Session, user, page count and the page
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('private_messages'), secure=True)
+        rows = response.json()['results']
+        self.assertEqual(response.json()['count'], 4)
+        self.assertEqual([row['username'] for row in rows], ['contact3', 'contact2', 'contact1', 'contact0'])
+        self.assertEqual([row['unread_count'] for row in rows], [4, 3, 2, 1])
+        self.assertEqual(rows[0]['last_message'], 'Follow-up 2 from 3')
+        self.assertEqual(rows[-1]['last_message'], 'Reply to 0')
+        self.assertEqual(rows[-1]['last_sender_id'], self.me.pk)
+
+class ModerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = make_user('moderator', '+254700000461', is_staff=True)
+        self.member = make_user('member', '+254700000462')
+        self.alice = make_user('alice', '+254700000463')
+        self.message = SupportMessage.objects.create(user=self.admin, content='Welcome')
+
+    def comment(self, content):
+        return self.client.post(
+            reverse('support_comment', args=[self.message.pk]), {'content': content}, content_type='application/json', secure=True
+        )
+
+    def test_moderation_status_is_cached_until_a_mute_or_block(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.comment('First').status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.comment('Second').status_code, 201)
+        self.assertFalse([q for q in queries if 'support_supportmute' in q['sql'] or 'support_supportblock' in q['sql']])
+
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('support_mute', args=[self.member.pk]), secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.client.force_login(self.member)
+        self.assertEqual(self.comment('Third').json(), {'non_field_errors': ['You are muted and cannot post comments.']})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.supportmute_set.all().delete()
+            SupportBlock.objects.create(user=self.member, blocked_by=self.admin)
+        self.assertEqual(self.comment('Fourth').json(), {'non_field_errors': ['You are blocked and cannot post comments.']})
+
+    def test_mentions_are_resolved_in_one_query_and_stored(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.comment('@alice and @nobody').json(), {'non_field_errors': ['User @nobody does not exist.']})
+        response = self.comment('@alice @moderator thanks @alice')
+        self.assertEqual(response.status_code, 201)
+        expected = [{'id': self.alice.pk, 'username': 'alice'}, {'id': self.admin.pk, 'username': 'moderator'}]
+        self.assertEqual(response.json()['mentioned_users'], expected)
+        self.assertEqual(SupportComment.objects.get(pk=response.json()['id']).mentions, expected)
+        # Session, user, page count and the page
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('support_comment', args=[self.message.pk]), secure=True)
+        self.assertEqual(response.json()['results'][0]['mentioned_users'], expected)
+
+    def test_mentions_are_stored_for_comments_written_outside_the_api(self):
+        comment = SupportComment.objects.create(message=self.message, user=self.member, content='@alice hi @ghost')
+        self.assertEqual(comment.mentions, [{'id': self.alice.pk, 'username': 'alice'}])
+        comment = SupportComment.objects.get(pk=comment.pk)
+        comment.content = 'Ping @moderator'
+        comment.save(update_fields=['content'])
+        self.assertEqual(SupportComment.objects.get(pk=comment.pk).mentions, [{'id': self.admin.pk, 'username': 'moderator'}])
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.user = make_user('threader', '+254700000471')
+        self.message = SupportMessage.objects.create(user=self.user, content='Thread')
+        self.first = SupportComment.objects.create(message=self.message, user=self.user, content='First')
+        self.second = SupportComment.objects.create(message=self.message, user=self.user, content='Second')
+        parent = self.first
+        self.chain = []
+        for depth in range(6):
+            parent = SupportComment.objects.create(message=self.message, user=self.user, content=f'Depth {depth + 1}', parent_comment=parent)
+            self.chain.append(parent)
+        SupportComment.objects.create(message=self.message, user=self.user, content='Sibling', parent_comment=self.first)
+
+    def test_tree_comes_from_one_comment_query(self):
+        self.client.force_login(self.user)
+        # Session, user, the message and every comment
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('support_thread', args=[self.message.pk]), {'depth': 3}, secure=True)
+        roots = response.json()['results']
+        self.assertEqual([(c['content'], c['reply_count']) for c in roots], [('First', 2), ('Second', 0)])
+        self.assertEqual([c['content'] for c in roots[0]['replies']], ['Depth 1', 'Sibling'])
+        deepest = roots[0]['replies'][0]['replies'][0]
+        self.assertEqual((deepest['content'], deepest['reply_count'], deepest['replies']), ('Depth 2', 1, []))
+
+    def test_parent_loads_a_branch_cut_off_by_the_depth_limit(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('support_thread', args=[self.message.pk]), {'parent': self.chain[1].pk, 'depth': 10}, secure=True)
+        node, contents = response.json()['results'][0], []
+        while node:
+            contents.append(node['content'])
+            node = node['replies'][0] if node['replies'] else None
+        self.assertEqual(contents, ['Depth 3', 'Depth 4', 'Depth 5', 'Depth 6'])
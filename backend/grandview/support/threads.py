@@ -0,0 +1,33 @@
+from collections import defaultdict
+from .models import SupportComment
+from .serializers import SupportCommentSerializer
+
+DEFAULT_DEPTH = 5
+MAX_DEPTH = 10
+
+def replies_by_parent(message):
+    """Every comment on ``message`` from one query, grouped under its parent's id (None for top level)."""
+    children = defaultdict(list)
+    for comment in SupportComment.objects.filter(message=message).select_related('user').order_by('created_at', 'id'):
+        children[comment.parent_comment_id].append(comment)
+    return children
+
+def comment_tree(comments, children, depth, context=None):
+    """Nest ``comments`` and their replies ``depth`` levels deep, visiting each comment once.
+
+    Replies past the depth limit are left out; ``reply_count`` tells the
+    client a branch has more to load.
+    """
+    serializer = SupportCommentSerializer(context=context or {})
+
+    def build(nodes, remaining):
+        tree = []
+        for comment in nodes:
+            node = serializer.to_representation(comment)
+            replies = children.get(comment.pk, [])
+            node['reply_count'] = len(replies)
+            node['replies'] = build(replies, remaining - 1) if remaining > 1 else []
+            tree.append(node)
+        return tree
+
+    return build(comments, depth)
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    SupportMessageListView, SupportPresignedUploadView, SupportPrivateMessageView, SupportCommentView,
+    SupportMessageListView, SupportPresignedUploadView, SupportPrivateMessageView, SupportCommentView, SupportCommentThreadView,
     SupportLikeView, SupportPinMessageView, SupportMuteUserView,
     SupportBlockUserView, UserProfileView, PrivateMessageListView, AdminListView
 )
@@ -9,6 +9,7 @@ urlpatterns = [
     path('support/messages/', SupportMessageListView.as_view(), name='support_messages'),
     path('support/messages/private/', SupportPrivateMessageView.as_view(), name='support_private_message'),
     path('support/messages/<int:message_id>/comment/', SupportCommentView.as_view(), name='support_comment'),
+    path('support/messages/<int:message_id>/thread/', SupportCommentThreadView.as_view(), name='support_thread'),
     path('support/messages/<int:message_id>/like/', SupportLikeView.as_view(), name='support_like'),
     path('support/messages/<int:message_id>/pin/', SupportPinMessageView.as_view(), name='support_pin'),
     path('support/users/<int:user_id>/mute/', SupportMuteUserView.as_view(), name='support_mute'),
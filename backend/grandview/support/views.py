@@ -6,15 +6,20 @@
 # - No changes to other views as they seem unaffected
 
 from django.utils import timezone
-import boto3
+from grandview import s3
+from grandview.uploads import IMAGE_TYPES, MAX_BYTES, LimitedMultiPartParser
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import FormParser, JSONParser
 from rest_framework.pagination import PageNumberPagination
 from .models import SupportMessage, SupportComment, SupportLike, SupportMute, SupportBlock, PrivateMessage
+from .consumers import private_group
+from grandview.events import publish
+from .feed import feed_messages, inbox, mark_feed_seen
+from .threads import DEFAULT_DEPTH, MAX_DEPTH, comment_tree, replies_by_parent
 from .serializers import SupportMessageSerializer, SupportCommentSerializer, SupportLikeSerializer, SupportMuteSerializer, SupportBlockSerializer, UserProfileSerializer, PrivateMessageSerializer
 from accounts.models import CustomUser
 from django.shortcuts import get_object_or_404
@@ -28,23 +33,25 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+IMAGE_UPLOAD_LIMITS = {'image': (MAX_BYTES, IMAGE_TYPES)}
+
 class SupportMessageListView(APIView):
     permission_classes = [AllowAny]
     pagination_class = StandardResultsSetPagination
+    parser_classes = [JSONParser, FormParser, LimitedMultiPartParser]
+    upload_limits = IMAGE_UPLOAD_LIMITS
 
     def get(self, request):
-        messages = SupportMessage.objects.filter(is_private=False).order_by('created_at')  # Ascending for newest at bottom
+        messages = feed_messages(request.user).order_by('created_at')  # Ascending for newest at bottom
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(messages, request)
         serializer = SupportMessageSerializer(page, many=True, context={'request': request})
-        # Update last_support_view for authenticated users
-        if request.user.is_authenticated:
-            request.user.last_support_view = timezone.now()
-            request.user.save()
+        if request.user and request.user.is_authenticated:
+            mark_feed_seen(request.user)
         return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
-        if not request.user.is_authenticated:
+        if not (request.user and request.user.is_authenticated):
             return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
         serializer = SupportMessageSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
@@ -55,7 +62,8 @@ class SupportMessageListView(APIView):
 
 class SupportPrivateMessageView(APIView):
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [LimitedMultiPartParser, FormParser]
+    upload_limits = IMAGE_UPLOAD_LIMITS
 
     def post(self, request):
         serializer = SupportMessageSerializer(data=request.data, context={'request': request})
@@ -77,18 +85,11 @@ class SupportPresignedUploadView(APIView):
         file_name = f"support/images/{request.user.username}_{doc_type}_{int(timezone.now().timestamp())}.{request.data.get('extension', 'jpg')}"
         content_type = request.data.get('content_type', 'image/jpeg')
 
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
-        presigned = s3_client.generate_presigned_post(
-            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-            Key=file_name,
-            Fields={'Content-Type': content_type, 'acl': 'private'},
-            Conditions=[['content-length-range', 0, 5*1024*1024]],
-            ExpiresIn=3600
+        presigned = s3.presigned_post(
+            file_name,
+            fields={'Content-Type': content_type, 'acl': 'private'},
+            conditions=[['content-length-range', 0, 5*1024*1024]],
+            expires_in=3600,
         )
         return Response({'upload_url': presigned['url'], 'fields': presigned['fields'], 'key': file_name})
 
@@ -97,7 +98,7 @@ class SupportCommentView(APIView):
     pagination_class = StandardResultsSetPagination
 
     def get(self, request, message_id):
-        comments = SupportComment.objects.filter(message_id=message_id, message__is_private=False).order_by('created_at')
+        comments = SupportComment.objects.filter(message_id=message_id, message__is_private=False).select_related('user').order_by('created_at')
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(comments, request)
         serializer = SupportCommentSerializer(page, many=True, context={'request': request})
@@ -113,6 +114,27 @@ class SupportCommentView(APIView):
         logger.error(f"Comment creation failed for user {request.user.username}: {serializer.errors}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class SupportCommentThreadView(APIView):
+    """A page of top-level comments with their replies nested ``depth`` levels deep.
+
+    ``parent`` loads the replies under one comment instead, for branches cut
+    off by the depth limit.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+
+    def get(self, request, message_id):
+        message = get_object_or_404(SupportMessage, id=message_id, is_private=False)
+        try:
+            depth = min(max(int(request.query_params.get('depth', DEFAULT_DEPTH)), 1), MAX_DEPTH)
+            parent = int(request.query_params['parent']) if request.query_params.get('parent') else None
+        except ValueError:
+            return Response({"error": "depth and parent must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        children = replies_by_parent(message)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(children.get(parent, []), request)
+        return paginator.get_paginated_response(comment_tree(page, children, depth, {'request': request}))
+
 class SupportLikeView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -178,38 +200,44 @@ class AdminListView(APIView):
 class PrivateMessageListView(APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
-    parser_classes = [MultiPartParser, FormParser]  # Add this to support image uploads via FormData
+    parser_classes = [LimitedMultiPartParser, FormParser]  # Add this to support image uploads via FormData
+    upload_limits = IMAGE_UPLOAD_LIMITS
 
     def get(self, request, receiver_id=None):
         if receiver_id:
             messages = PrivateMessage.objects.filter(
                 (Q(sender=request.user, receiver_id=receiver_id) | Q(sender_id=receiver_id, receiver=request.user))
-            ).order_by('created_at')
+            ).select_related('sender').order_by('created_at')
             paginator = self.pagination_class()
             page = paginator.paginate_queryset(messages, request)
+            # Mark what this page shows as read in one UPDATE
+            unread = [msg for msg in page if msg.receiver_id == request.user.id and msg.read_at is None]
+            if unread:
+                now = timezone.now()
+                PrivateMessage.objects.filter(pk__in=[msg.pk for msg in unread]).update(read_at=now)
+                for msg in unread:
+                    msg.read_at = now
+                publish(private_group(receiver_id), 'private_message.read', {
+                    'ids': [msg.pk for msg in unread],
+                    'receiver_id': request.user.id,
+                    'read_at': now.isoformat(),
+                })
             serializer = PrivateMessageSerializer(page, many=True)
-            # Mark messages as read
-            unread_messages = messages.filter(receiver=request.user, read_at__isnull=True)
-            for msg in unread_messages:
-                msg.read_at = timezone.now()
-                msg.save()
             return paginator.get_paginated_response(serializer.data)
         else:
-            sent = PrivateMessage.objects.filter(sender=request.user).values('receiver__id', 'receiver__username').distinct()
-            received = PrivateMessage.objects.filter(receiver=request.user).values('sender__id', 'sender__username').distinct()
-            conversations = set()
-            for s in sent:
-                conversations.add((s['receiver__id'], s['receiver__username']))
-            for r in received:
-                conversations.add((r['sender__id'], r['sender__username']))
-            # Calculate unread counts per conversation
-            convos_with_unread = []
-            for cid, username in conversations:
-                unread_count = PrivateMessage.objects.filter(
-                    receiver=request.user, sender_id=cid, read_at__isnull=True
-                ).count()
-                convos_with_unread.append({'id': cid, 'username': username, 'unread_count': unread_count})
-            return Response(convos_with_unread)
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(inbox(request.user), request)
+            return paginator.get_paginated_response([
+                {
+                    'id': msg.counterpart,
+                    'username': msg.counterpart_username,
+                    'unread_count': msg.unread_count,
+                    'last_message': msg.preview,
+                    'last_message_at': msg.created_at,
+                    'last_sender_id': msg.sender_id,
+                }
+                for msg in page
+            ])
 
     def post(self, request):
         serializer = PrivateMessageSerializer(data=request.data, context={'request': request})
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wallet, Deposit, Transaction, Withdrawal
+from .models import Wallet, Deposit, MpesaCallback, Transaction, Withdrawal
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
@@ -14,9 +14,10 @@ class DepositAdmin(admin.ModelAdmin):
     actions = ['mark_as_completed', 'mark_as_failed']
 
     def mark_as_completed(self, request, queryset):
-        updated = queryset.update(status='COMPLETED')
-        for deposit in queryset:
-            deposit.save()  # Triggers balance update via Deposit.save()
+        updated = 0
+        for deposit in queryset.exclude(status='COMPLETED').select_related('wallet__user'):
+            # Credits the wallet only if the deposit was not completed meanwhile
+            updated += deposit.complete(from_statuses=('PENDING', 'FAILED'))
         self.message_user(request, f'{updated} deposit(s) marked as completed.')
     mark_as_completed.short_description = "Mark selected deposits as completed"
 
@@ -25,6 +26,13 @@ class DepositAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} deposit(s) marked as failed.')
     mark_as_failed.short_description = "Mark selected deposits as failed"
 
+@admin.register(MpesaCallback)
+class MpesaCallbackAdmin(admin.ModelAdmin):
+    list_display = ('checkout_request_id', 'receipt_number', 'result_code', 'deposit', 'received_at')
+    list_filter = ('result_code',)
+    search_fields = ('checkout_request_id', 'receipt_number')
+    raw_id_fields = ('deposit',)
+
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('user', 'amount', 'transaction_type', 'created_at', 'description')
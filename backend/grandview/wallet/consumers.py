@@ -0,0 +1,13 @@
+from grandview.consumers import EventConsumer
+
+def wallet_group(user_id):
+    return f'wallet_{user_id}'
+
+class WalletConsumer(EventConsumer):
+    """Deposit status changes for the signed-in user's wallet (see wallet.stk)."""
+
+    def event_groups(self):
+        user = self.scope.get('user')
+        if not (user and user.is_authenticated):
+            return []
+        return [wallet_group(user.pk)]
@@ -0,0 +1,54 @@
+from datetime import datetime, time
+from django.db.models import Count, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from .models import Transaction, TransactionSummary
+
+class TransactionCursorPagination(CursorPagination):
+    """Keyset pagination over the (user, -created_at, -id) index."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+def _parse_day(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise ValidationError({name: "Use the YYYY-MM-DD format."})
+    return day
+
+def transaction_history(request):
+    """The user's transactions, narrowed by the optional query parameters.
+
+    ``type`` takes one or more comma-separated transaction types;
+    ``start_date`` and ``end_date`` are inclusive YYYY-MM-DD days.
+    """
+    transactions = Transaction.objects.filter(user=request.user)
+    params = request.query_params
+    if params.get('type'):
+        transactions = transactions.filter(transaction_type__in=[t.strip().upper() for t in params['type'].split(',') if t.strip()])
+    if params.get('start_date'):
+        start = _parse_day(params['start_date'], 'start_date')
+        transactions = transactions.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if params.get('end_date'):
+        end = _parse_day(params['end_date'], 'end_date')
+        transactions = transactions.filter(created_at__lte=timezone.make_aware(datetime.combine(end, time.max)))
+    return transactions
+
+FILTER_PARAMS = ('type', 'start_date', 'end_date')
+
+def transaction_totals(request, transactions):
+    """``total_amount`` and ``transaction_count`` over the same rows the history lists.
+
+    Unfiltered history reads the running TransactionSummary row; filtered
+    history aggregates ``transactions``, the queryset from transaction_history().
+    """
+    if any(request.query_params.get(name) for name in FILTER_PARAMS):
+        totals = transactions.aggregate(total_amount=Sum('amount'), transaction_count=Count('id'))
+        return {'total_amount': float(totals['total_amount'] or 0), 'transaction_count': totals['transaction_count']}
+    summary = TransactionSummary.objects.filter(user=request.user).first()
+    if summary is None:
+        return {'total_amount': 0.0, 'transaction_count': 0}
+    return {'total_amount': float(summary.total_amount), 'transaction_count': summary.transaction_count}
@@ -0,0 +1,141 @@
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from notifications.mail import queue_email
+from .models import Wallet, Transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+BALANCE_FIELDS = ('deposit_balance', 'views_earnings_balance', 'referral_balance')
+COMMISSION_RATE = Decimal('0.8')
+
+class InsufficientFunds(Exception):
+    pass
+
+def _update(user, deltas, guards=None):
+    """Apply ``deltas`` to the user's wallet in a single UPDATE.
+
+    ``guards`` maps a balance field to the minimum value it must hold for the
+    row to match, so a debit and its balance check happen in one statement.
+    """
+    for field in deltas:
+        if field not in BALANCE_FIELDS:
+            raise ValueError(f"Unknown wallet balance '{field}'")
+    filters = {f'{field}__gte': minimum for field, minimum in (guards or {}).items() if minimum > 0}
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    if not Wallet.objects.filter(user=user, **filters).update(**updates):
+        if filters and Wallet.objects.filter(user=user).exists():
+            raise InsufficientFunds(f"Insufficient balance for {user.username}")
+        raise Wallet.DoesNotExist(f"No wallet for {user.username}")
+
+def _record(user, amount, transaction_type, description, balance_type=None):
+    return Transaction.objects.create(
+        user=user,
+        amount=amount,
+        transaction_type=transaction_type,
+        description=description,
+        balance_type=balance_type,
+    )
+
+@transaction.atomic
+def credit(user, amount, transaction_type, description, balance='views_earnings_balance', balance_type=None):
+    """Add ``amount`` to one wallet balance and record the transaction."""
+    _update(user, {balance: amount})
+    return _record(user, amount, transaction_type, description, balance_type)
+
+@transaction.atomic
+def refund(user, amounts, transaction_type, description, balance_type=None):
+    """Credit several balances at once, recorded as a single transaction.
+
+    ``amounts`` maps balance fields to the amount returned to each.
+    """
+    _update(user, amounts)
+    return _record(user, sum(amounts.values(), Decimal('0')), transaction_type, description, balance_type)
+
+@transaction.atomic
+def debit(user, amount, transaction_type, description, balance='deposit_balance', balance_type=None):
+    """Take ``amount`` from one balance, failing with InsufficientFunds if it would go negative."""
+    _update(user, {balance: -amount}, guards={balance: amount})
+    if balance == 'deposit_balance':
+        pay_upline_commission(user, amount)
+    return _record(user, -amount, transaction_type, description, balance_type)
+
+def split_balance_type(from_earnings, from_deposit):
+    if from_earnings > 0 and from_deposit == 0:
+        return 'views_earnings_balance'
+    if from_deposit > 0 and from_earnings == 0:
+        return 'deposit_balance'
+    return 'mixed_balance'
+
+@transaction.atomic
+def charge(user, amount, transaction_type, description, use_earnings=None, balance_type=None):
+    """Charge a purchase against the user's main balance.
+
+    Marketers spend views earnings first and cover the rest from deposits;
+    everyone else pays from deposits only. The wallet row is locked while the
+    split is worked out. ``balance_type`` may be a callable taking the split,
+    e.g. ``split_balance_type``. Returns ``(transaction, from_earnings, from_deposit)``.
+    """
+    if use_earnings is None:
+        use_earnings = user.is_marketer
+    wallet = Wallet.objects.select_for_update().get(user=user)
+    from_earnings = min(amount, max(wallet.views_earnings_balance, Decimal('0'))) if use_earnings else Decimal('0')
+    from_deposit = amount - from_earnings
+    if wallet.deposit_balance < from_deposit:
+        raise InsufficientFunds(f"Insufficient balance for {user.username}")
+    _update(
+        user,
+        {'views_earnings_balance': -from_earnings, 'deposit_balance': -from_deposit},
+        guards={'views_earnings_balance': from_earnings, 'deposit_balance': from_deposit},
+    )
+    if from_deposit > 0:
+        pay_upline_commission(user, from_deposit)
+    if callable(balance_type):
+        balance_type = balance_type(from_earnings, from_deposit)
+    tx = _record(user, -amount, transaction_type, description, balance_type)
+    return tx, from_earnings, from_deposit
+
+def pay_upline_commission(user, deposit_deduction):
+    """Credit a marketer upline with commission on a downline's deposit deduction.
+
+    Failures are logged and rolled back without affecting the caller.
+    """
+    upline = user.referred_by
+    if deposit_deduction <= 0 or not upline or not upline.is_marketer:
+        return None
+    commission = COMMISSION_RATE * deposit_deduction
+    try:
+        with transaction.atomic():
+            Wallet.objects.get_or_create(user=upline)
+            tx = credit(
+                upline,
+                commission,
+                'COMMISSION',
+                f"Commission from downline {user.username}'s deposit deduction of {deposit_deduction}",
+                balance='referral_balance',
+            )
+    except Exception as e:
+        logger.error(f"Commission logic error: {str(e)}", exc_info=True)
+        return None
+    logger.debug(f"Credited {commission} to upline {upline.username}'s referral_balance")
+    try:
+        queue_email(
+            subject='New Referral Commission Earned',
+            template='emails/commission_earned.html',
+            context={
+                'user': upline,
+                'downline_username': user.username,
+                'deduction_amount': deposit_deduction,
+                'commission': commission,
+                'site_url': settings.SITE_URL,
+            },
+            recipient_list=[upline.email],
+        )
+        logger.info(f"Commission email queued for {upline.email}")
+    except Exception as e:
+        logger.error(f"Failed to queue commission email to {upline.email}: {str(e)}", exc_info=True)
+    return tx
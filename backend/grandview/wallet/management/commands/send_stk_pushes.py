@@ -0,0 +1,39 @@
+# wallet/management/commands/send_stk_pushes.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from wallet.stk import send_stk_pushes
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Sends the M-Pesa STK push for queued deposits; use --loop to run as a long-lived worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for queued deposits instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=settings.STK_PUSH_POLL_INTERVAL, help='Seconds to sleep when nothing is queued')
+        parser.add_argument('--batch-size', type=int, default=settings.STK_PUSH_BATCH_SIZE, help='Deposits claimed per pass')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            close_old_connections()
+            try:
+                sent, failed = send_stk_pushes(batch_size=options['batch_size'])
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                logger.error(f"STK push dispatch error: {str(e)}", exc_info=True)
+                sent, failed = 0, 0
+            total_sent += sent
+            total_failed += failed
+            if not options['loop']:
+                # Drain everything that is currently queued before exiting
+                if sent or failed:
+                    continue
+                break
+            if not sent and not failed:
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} STK pushes ({total_failed} failed)'))
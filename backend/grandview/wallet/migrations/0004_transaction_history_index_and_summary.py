@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_transaction_summaries(apps, schema_editor):
+    Transaction = apps.get_model('wallet', 'Transaction')
+    TransactionSummary = apps.get_model('wallet', 'TransactionSummary')
+    totals = Transaction.objects.values('user_id').annotate(
+        total=models.Sum('amount'), count=models.Count('id')
+    ).order_by()
+    TransactionSummary.objects.bulk_create(
+        [TransactionSummary(user_id=row['user_id'], total_amount=row['total'], transaction_count=row['count']) for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customuser_email_verification_code_and_more'),
+        ('wallet', '0003_alter_transaction_options_deposit_mpesa_code_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='transaction_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='txn_user_created_idx'),
+        ),
+        migrations.RunPython(backfill_transaction_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0004_transaction_history_index_and_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposit',
+            name='failure_reason',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='deposit',
+            name='stk_status',
+            field=models.CharField(blank=True, choices=[('QUEUED', 'Queued'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], max_length=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['stk_status', 'id'], name='deposit_stk_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def blank_checkout_ids_to_null(apps, schema_editor):
+    # Several deposits may share an empty string, but any number can be NULL under the unique constraint
+    Deposit = apps.get_model('wallet', 'Deposit')
+    Deposit.objects.filter(transaction_id='').update(transaction_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0005_deposit_stk_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_checkout_ids_to_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='deposit',
+            name='transaction_id',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='MpesaCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checkout_request_id', models.CharField(max_length=50, unique=True)),
+                ('receipt_number', models.CharField(blank=True, max_length=20, null=True, unique=True)),
+                ('result_code', models.IntegerField(null=True)),
+                ('result_desc', models.CharField(blank=True, max_length=255)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('deposit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='callbacks', to='wallet.deposit')),
+            ],
+        ),
+    ]
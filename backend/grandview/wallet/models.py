@@ -1,14 +1,14 @@
 from django.db import models
 from accounts.models import CustomUser
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from decimal import Decimal
 from django.utils import timezone
 from django.db import transaction
 import logging
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from notifications.mail import queue_email
 
 logger = logging.getLogger(__name__)
 
@@ -22,52 +22,23 @@ class Wallet(models.Model):
     def main_balance(self):
         return self.deposit_balance + self.views_earnings_balance
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded deposit balance so save() can detect deductions without re-reading the row
+        instance._loaded_deposit_balance = instance.__dict__.get('deposit_balance')
+        return instance
+
     def save(self, *args, **kwargs):
         bypass_commission = kwargs.pop('bypass_commission', False)
-        if self.pk and not bypass_commission:  # Only for updates
-            try:
-                old_wallet = Wallet.objects.get(pk=self.pk)
-                deposit_diff = old_wallet.deposit_balance - self.deposit_balance
-                if deposit_diff > 0 and self.user.referred_by and self.user.referred_by.is_marketer:
-                    with transaction.atomic():
-                        commission = Decimal('0.8') * deposit_diff
-                        upline = self.user.referred_by
-                        upline_wallet, _ = Wallet.objects.get_or_create(user=upline)
-                        upline_wallet.referral_balance += commission
-                        upline_wallet.save(bypass_commission=True)
-                        Transaction.objects.create(
-                            user=upline,
-                            amount=commission,
-                            transaction_type='COMMISSION',
-                            description=f"Commission from downline {self.user.username}'s deposit deduction of {deposit_diff}"
-                        )
-                        logger.debug(f"Credited {commission} to upline {upline.username}'s referral_balance")
-                        # Send commission email to upline
-                        try:
-                            context = {
-                                'user': upline,
-                                'downline_username': self.user.username,
-                                'deduction_amount': deposit_diff,
-                                'commission': commission,
-                                'site_url': settings.SITE_URL,
-                            }
-                            logger.debug(f"Attempting to render emails/commission_earned.html with context: {context}")
-                            message = render_to_string('emails/commission_earned.html', context)
-                            logger.debug(f"Template rendered successfully for {upline.email}")
-                            send_mail(
-                                subject='New Referral Commission Earned',
-                                message='',
-                                from_email=settings.DEFAULT_FROM_EMAIL,
-                                recipient_list=[upline.email],
-                                html_message=message,
-                                fail_silently=False,
-                            )
-                            logger.info(f"Commission email sent to {upline.email}")
-                        except Exception as e:
-                            logger.error(f"Failed to send commission email to {upline.email}: {str(e)}", exc_info=True)
-            except Exception as e:
-                logger.error(f"Commission logic error: {str(e)}", exc_info=True)
+        loaded_deposit_balance = getattr(self, '_loaded_deposit_balance', None)
         super().save(*args, **kwargs)
+        if loaded_deposit_balance is not None and not bypass_commission:  # Only for updates
+            deposit_diff = loaded_deposit_balance - self.deposit_balance
+            if deposit_diff > 0:
+                from .ledger import pay_upline_commission
+                pay_upline_commission(self.user, deposit_diff)
+        self._loaded_deposit_balance = self.deposit_balance
 
     def __str__(self):
         return f"Wallet for {self.user.username}"
@@ -97,86 +68,187 @@ class Transaction(models.Model):
     description = models.TextField(blank=True, null=True)
     balance_type = models.CharField(max_length=20, choices=BALANCE_TYPE_CHOICES, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='txn_user_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_amount = instance.__dict__.get('amount')
+        return instance
+
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - {self.amount}"
 
+class TransactionSummary(models.Model):
+    """Running totals of a user's transactions, kept in step by signals so history views don't need a full scan."""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='transaction_summary')
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def apply(cls, user_id, amount, count, create=True):
+        updated = cls.objects.filter(user_id=user_id).update(
+            total_amount=F('total_amount') + amount,
+            transaction_count=F('transaction_count') + count,
+            updated_at=timezone.now(),
+        )
+        if not updated and create:
+            cls.objects.get_or_create(user_id=user_id)
+            cls.apply(user_id, amount, count, create=False)
+
+    def __str__(self):
+        return f"Transaction summary for {self.user.username}"
+
+@receiver(post_save, sender=Transaction)
+def track_transaction_summary(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        TransactionSummary.apply(instance.user_id, instance.amount, 1)
+    else:
+        loaded_amount = getattr(instance, '_loaded_amount', None)
+        if loaded_amount is not None and loaded_amount != instance.amount:
+            TransactionSummary.apply(instance.user_id, Decimal(instance.amount) - loaded_amount, 0)
+    instance._loaded_amount = instance.amount
+
+@receiver(post_delete, sender=Transaction)
+def untrack_transaction_summary(sender, instance, **kwargs):
+    amount = getattr(instance, '_loaded_amount', instance.amount)
+    # No summary is created here, as the user may be mid-deletion
+    TransactionSummary.apply(instance.user_id, -amount, -1, create=False)
+
 @receiver(post_save, sender=CustomUser)
 def create_wallet(sender, instance, created, **kwargs):
     if created:
         Wallet.objects.create(user=instance)
+        TransactionSummary.objects.create(user=instance)
+
+STK_STATUS_CHOICES = [
+    ('QUEUED', 'Queued'),
+    ('SENDING', 'Sending'),
+    ('SENT', 'Sent'),
+    ('FAILED', 'Failed'),
+]
 
 class Deposit(models.Model):
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='deposits')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
-    transaction_id = models.CharField(max_length=50, blank=True, null=True)
+    # The STK CheckoutRequestID; unique so callbacks find their deposit by index
+    transaction_id = models.CharField(max_length=50, blank=True, null=True, unique=True)
     mpesa_receipt_number = models.CharField(max_length=20, blank=True, null=True)
     mpesa_code = models.CharField(max_length=20, blank=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=10, choices=[('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING')
+    # Progress of the STK push request itself, sent by the send_stk_pushes worker; empty for manual deposits
+    stk_status = models.CharField(max_length=10, choices=STK_STATUS_CHOICES, blank=True, null=True)
+    failure_reason = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['stk_status', 'id'], name='deposit_stk_queue_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         if is_new:
-            # Send admin email for new deposit request
+            # Queue admin email for new deposit request
             try:
-                context = {
-                    'user': self.wallet.user,
-                    'amount': self.amount,
-                    'method': 'M-Pesa STK Push' if self.transaction_id else 'Manual M-Pesa',
-                    'phone_number': self.phone_number or 'N/A',
-                    'mpesa_code': self.mpesa_code or 'N/A',
-                    'site_url': settings.SITE_URL,
-                }
-                logger.debug(f"Attempting to render emails/admin_deposit_request.html with context: {context}")
-                message = render_to_string('emails/admin_deposit_request.html', context)
-                send_mail(
+                queue_email(
                     subject=f'New Deposit Request from {self.wallet.user.username}',
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    template='emails/admin_deposit_request.html',
+                    context={
+                        'user': self.wallet.user,
+                        'amount': self.amount,
+                        'method': 'M-Pesa STK Push' if self.stk_status else 'Manual M-Pesa',
+                        'phone_number': self.phone_number or 'N/A',
+                        'mpesa_code': self.mpesa_code or 'N/A',
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[settings.ADMIN_EMAIL],
-                    html_message=message,
-                    fail_silently=False,
                 )
-                logger.info(f"Admin deposit request email sent for deposit by {self.wallet.user.username}")
+                logger.info(f"Admin deposit request email queued for deposit by {self.wallet.user.username}")
             except Exception as e:
-                logger.error(f"Failed to send admin deposit request email: {str(e)}", exc_info=True)
+                logger.error(f"Failed to queue admin deposit request email: {str(e)}", exc_info=True)
+        loaded_status = getattr(self, '_loaded_status', None)
         super().save(*args, **kwargs)
-        if self.status == 'COMPLETED':
-            self.wallet.deposit_balance += self.amount
-            self.wallet.save()
-            Transaction.objects.create(
-                user=self.wallet.user,
-                amount=self.amount,
-                transaction_type='DEPOSIT',
-                description=f"Deposit of {self.amount} via M-Pesa {self.mpesa_code or self.mpesa_receipt_number or 'manual'}"
+        self._loaded_status = self.status
+        # Only the move into COMPLETED credits the wallet, so saving a completed deposit again is harmless
+        if self.status == 'COMPLETED' and loaded_status != 'COMPLETED':
+            self._credit_wallet()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def complete(self, from_statuses=('PENDING',), **fields):
+        """Move the deposit to COMPLETED and credit the wallet, unless another request already moved it.
+
+        The status change is one conditional UPDATE, so of two concurrent
+        attempts (a replayed callback, a double-clicked admin action) only one
+        matches the row and credits the wallet. ``fields`` are saved with it.
+        """
+        with transaction.atomic(savepoint=False):
+            updated = Deposit.objects.filter(pk=self.pk, status__in=from_statuses).update(
+                status='COMPLETED', updated_at=timezone.now(), **fields
             )
-            # Send deposit confirmation email to user
-            try:
-                context = {
+            if not updated:
+                return False
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.status = self._loaded_status = 'COMPLETED'
+            self._credit_wallet()
+        return True
+
+    def _credit_wallet(self):
+        from .ledger import credit
+        credit(
+            self.wallet.user,
+            self.amount,
+            'DEPOSIT',
+            f"Deposit of {self.amount} via M-Pesa {self.mpesa_code or self.mpesa_receipt_number or 'manual'}",
+            balance='deposit_balance',
+        )
+        # Queue deposit confirmation email to user
+        try:
+            queue_email(
+                subject='Deposit Confirmed',
+                template='emails/deposit_confirmed.html',
+                context={
                     'user': self.wallet.user,
                     'amount': self.amount,
                     'site_url': settings.SITE_URL,
-                }
-                logger.debug(f"Attempting to render emails/deposit_confirmed.html with context: {context}")
-                message = render_to_string('emails/deposit_confirmed.html', context)
-                send_mail(
-                    subject='Deposit Confirmed',
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[self.wallet.user.email],
-                    html_message=message,
-                    fail_silently=False,
-                )
-                logger.info(f"Deposit confirmation email sent to {self.wallet.user.email}")
-            except Exception as e:
-                logger.error(f"Failed to send deposit confirmation email to {self.wallet.user.email}: {str(e)}", exc_info=True)
-            logger.info(f"Deposit {self.pk} completed and wallet updated")
+                },
+                recipient_list=[self.wallet.user.email],
+            )
+            logger.info(f"Deposit confirmation email queued for {self.wallet.user.email}")
+        except Exception as e:
+            logger.error(f"Failed to queue deposit confirmation email to {self.wallet.user.email}: {str(e)}", exc_info=True)
+        logger.info(f"Deposit {self.pk} completed and wallet updated")
 
     def __str__(self):
         return f"Deposit of {self.amount} for {self.wallet.user.username} ({self.status})"
 
+class MpesaCallback(models.Model):
+    """Every STK callback Safaricom has delivered, keyed so a replayed one is recognised with one lookup."""
+    checkout_request_id = models.CharField(max_length=50, unique=True)
+    receipt_number = models.CharField(max_length=20, unique=True, blank=True, null=True)
+    result_code = models.IntegerField(null=True)
+    result_desc = models.CharField(max_length=255, blank=True)
+    deposit = models.ForeignKey(Deposit, on_delete=models.SET_NULL, null=True, blank=True, related_name='callbacks')
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"M-Pesa callback {self.checkout_request_id} ({self.result_code})"
+
 class Withdrawal(models.Model):
     wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='withdrawals')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -193,30 +265,25 @@ class Withdrawal(models.Model):
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         if is_new:
-            # Send admin email for new withdrawal request
+            # Queue admin email for new withdrawal request
             try:
-                context = {
-                    'user': self.wallet.user,
-                    'amount': self.amount,
-                    'net_amount': self.net_amount,
-                    'fee': self.fee,
-                    'mpesa_number': self.mpesa_number,
-                    'balance_type': self.balance_type.replace('_', ' ').title(),
-                    'site_url': settings.SITE_URL,
-                }
-                logger.debug(f"Attempting to render emails/admin_withdrawal_request.html with context: {context}")
-                message = render_to_string('emails/admin_withdrawal_request.html', context)
-                send_mail(
+                queue_email(
                     subject=f'New Withdrawal Request from {self.wallet.user.username}',
-                    message='',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    template='emails/admin_withdrawal_request.html',
+                    context={
+                        'user': self.wallet.user,
+                        'amount': self.amount,
+                        'net_amount': self.net_amount,
+                        'fee': self.fee,
+                        'mpesa_number': self.mpesa_number,
+                        'balance_type': self.balance_type.replace('_', ' ').title(),
+                        'site_url': settings.SITE_URL,
+                    },
                     recipient_list=[settings.ADMIN_EMAIL],
-                    html_message=message,
-                    fail_silently=False,
                 )
-                logger.info(f"Admin withdrawal request email sent for withdrawal by {self.wallet.user.username}")
+                logger.info(f"Admin withdrawal request email queued for withdrawal by {self.wallet.user.username}")
             except Exception as e:
-                logger.error(f"Failed to send admin withdrawal request email: {str(e)}", exc_info=True)
+                logger.error(f"Failed to queue admin withdrawal request email: {str(e)}", exc_info=True)
         if self.pk:
             old = Withdrawal.objects.get(pk=self.pk)
             if self.status != old.status:
@@ -225,45 +292,39 @@ class Withdrawal(models.Model):
                         self.pending_transaction.transaction_type = 'WITHDRAW_COMPLETED'
                         self.pending_transaction.description = f"Completed withdrawal of {self.net_amount} (after fee {self.fee}) from {self.balance_type.replace('_', ' ')} to M-Pesa {self.mpesa_number}"
                         self.pending_transaction.save()
-                    # Send withdrawal approval email to user
+                    # Queue withdrawal approval email to user
                     try:
-                        context = {
-                            'user': self.wallet.user,
-                            'amount': self.amount,
-                            'net_amount': self.net_amount,
-                            'fee': self.fee,
-                            'mpesa_number': self.mpesa_number,
-                            'site_url': settings.SITE_URL,
-                        }
-                        logger.debug(f"Attempting to render emails/withdrawal_approved.html with context: {context}")
-                        message = render_to_string('emails/withdrawal_approved.html', context)
-                        send_mail(
+                        queue_email(
                             subject='Withdrawal Approved',
-                            message='',
-                            from_email=settings.DEFAULT_FROM_EMAIL,
+                            template='emails/withdrawal_approved.html',
+                            context={
+                                'user': self.wallet.user,
+                                'amount': self.amount,
+                                'net_amount': self.net_amount,
+                                'fee': self.fee,
+                                'mpesa_number': self.mpesa_number,
+                                'site_url': settings.SITE_URL,
+                            },
                             recipient_list=[self.wallet.user.email],
-                            html_message=message,
-                            fail_silently=False,
                         )
-                        logger.info(f"Withdrawal approval email sent to {self.wallet.user.email}")
+                        logger.info(f"Withdrawal approval email queued for {self.wallet.user.email}")
                     except Exception as e:
-                        logger.error(f"Failed to send withdrawal approval email to {self.wallet.user.email}: {str(e)}", exc_info=True)
+                        logger.error(f"Failed to queue withdrawal approval email to {self.wallet.user.email}: {str(e)}", exc_info=True)
                 elif self.status == 'CANCELLED':
                     if self.pending_transaction:
                         self.pending_transaction.transaction_type = 'WITHDRAW_CANCELLED'
                         self.pending_transaction.description = f"Cancelled withdrawal of {self.amount} from {self.balance_type.replace('_', ' ')}"
                         self.pending_transaction.save()
+                    from .ledger import refund
                     if self.balance_type == 'referral_balance':
-                        self.wallet.referral_balance += self.net_amount
+                        amounts = {'referral_balance': self.net_amount}
                     else:
-                        self.wallet.deposit_balance += self.from_deposit
-                        self.wallet.views_earnings_balance += self.from_earnings
-                    self.wallet.save(bypass_commission=True)
-                    Transaction.objects.create(
-                        user=self.wallet.user,
-                        amount=self.amount,
-                        transaction_type='WITHDRAW_REFUND',
-                        description=f"Refund for cancelled withdrawal of {self.amount} from {self.balance_type.replace('_', ' ')}"
+                        amounts = {'deposit_balance': self.from_deposit, 'views_earnings_balance': self.from_earnings}
+                    refund(
+                        self.wallet.user,
+                        amounts,
+                        'WITHDRAW_REFUND',
+                        f"Refund for cancelled withdrawal of {self.amount} from {self.balance_type.replace('_', ' ')}",
                     )
         super().save(*args, **kwargs)
 
@@ -1,12 +1,25 @@
 import base64
 import logging
+import threading
+import time
 import requests
 from datetime import datetime
 from decouple import config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger('wallet')
 
+# Refresh the OAuth token this long before Safaricom says it expires
+TOKEN_REFRESH_MARGIN = 60
+
 class PaymentClient:
+    """M-Pesa Daraja client meant to be shared across requests; use get_payment_client().
+
+    Holds one pooled keep-alive session and the current OAuth token, which
+    is reused until shortly before it expires.
+    """
+
     def __init__(self, callback_url=None):
         self.consumer_key = config('PAYMENT_CONSUMER_KEY')
         self.consumer_secret = config('PAYMENT_CONSUMER_SECRET')
@@ -14,35 +27,63 @@ class PaymentClient:
         self.till_number = config('PAYMENT_TILL_NUMBER', default='3526578')
         self.passkey = config('PAYMENT_PASSKEY')
         self.callback_url = callback_url or config('PAYMENT_CALLBACK_URL')
-        self.auth_url = 'https://api.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials'
-        self.stk_push_url = 'https://api.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
-        self.query_url = 'https://api.safaricom.co.ke/mpesa/stkpushquery/v1/query'
+        base_url = config('PAYMENT_API_URL', default='https://api.safaricom.co.ke').rstrip('/')
+        self.auth_url = f'{base_url}/oauth/v1/generate?grant_type=client_credentials'
+        self.stk_push_url = f'{base_url}/mpesa/stkpush/v1/processrequest'
+        self.query_url = f'{base_url}/mpesa/stkpushquery/v1/query'
+        self.session = self._build_session()
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
         logger.info(f"PaymentClient initialized with stk_push_url: {self.stk_push_url}")
         logger.info(f"Using callback URL: {self.callback_url}")
 
+    def _build_session(self):
+        # Connection failures are retried for any method since nothing was sent;
+        # read and 5xx retries are limited to GET so an STK push is never sent twice
+        retries = Retry(total=3, connect=3, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=['GET'])
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=10, max_retries=retries))
+        session.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=10, max_retries=retries))
+        return session
+
     def get_access_token(self):
-        """Obtain an access token from the payment API."""
-        try:
-            auth = base64.b64encode(f"{self.consumer_key}:{self.consumer_secret}".encode()).decode()
-            headers = {'Authorization': f'Basic {auth}'}
-            logger.info(f"Auth request: URL={self.auth_url}")
-            response = requests.get(self.auth_url, headers=headers, timeout=10)
-            logger.info(f"Auth response: Status={response.status_code}, Body={response.text}")
-            response.raise_for_status()
-            access_token = response.json()['access_token']
-            logger.info(f"Access token obtained: {access_token[:10]}...")
-            return access_token
-        except requests.RequestException as e:
-            logger.error(f"Failed to get access token: {str(e)}")
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected error in get_access_token: {str(e)}")
-            raise
+        """Return a cached access token, fetching a new one only when it is close to expiring."""
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        with self._token_lock:
+            # Another thread may have refreshed it while this one waited
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            try:
+                auth = base64.b64encode(f"{self.consumer_key}:{self.consumer_secret}".encode()).decode()
+                headers = {'Authorization': f'Basic {auth}'}
+                logger.info(f"Auth request: URL={self.auth_url}")
+                response = self.session.get(self.auth_url, headers=headers, timeout=10)
+                logger.info(f"Auth response: Status={response.status_code}")
+                response.raise_for_status()
+                body = response.json()
+                self._token = body['access_token']
+                self._token_expires_at = time.monotonic() + max(int(body.get('expires_in', 3599)) - TOKEN_REFRESH_MARGIN, 0)
+                logger.info(f"Access token obtained, valid for {body.get('expires_in')}s")
+                return self._token
+            except requests.RequestException as e:
+                logger.error(f"Failed to get access token: {str(e)}")
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error in get_access_token: {str(e)}")
+                raise
+
+    def invalidate_token(self, token):
+        """Drop ``token`` if it is still the cached one, e.g. after Safaricom rejects it."""
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+                self._token_expires_at = 0
 
     def initiate_stk_push(self, phone_number, amount, transaction_id):
         """Initiate an STK Push for wallet deposit."""
         try:
-            access_token = self.get_access_token()
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
             password = base64.b64encode(f"{self.shortcode}{self.passkey}{timestamp}".encode()).decode()
 
@@ -60,18 +101,8 @@ class PaymentClient:
                 'TransactionDesc': 'Wallet Deposit'
             }
 
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json'
-            }
-
-            expected_url = 'https://api.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
-            if self.stk_push_url != expected_url:
-                logger.error(f"Invalid STK Push URL: {self.stk_push_url}")
-                self.stk_push_url = expected_url
-
             logger.info(f"Initiating STK Push: URL={self.stk_push_url}, Payload={payload}")
-            response = requests.post(self.stk_push_url, json=payload, headers=headers, timeout=30)
+            response = self._post_authorized(self.stk_push_url, payload)
             logger.info(f"STK Push response: Status={response.status_code}, Body={response.text}")
             response.raise_for_status()
             response_json = response.json()
@@ -84,4 +115,26 @@ class PaymentClient:
         except Exception as e:
             error_msg = f"Unexpected error in STK Push: {str(e)}"
             logger.error(error_msg)
-            return {'ResponseCode': '1', 'error': error_msg}
\ No newline at end of file
+            return {'ResponseCode': '1', 'error': error_msg}
+
+    def _post_authorized(self, url, payload):
+        # A token revoked before its expiry gets one retry with a fresh token
+        for attempt in range(2):
+            token = self.get_access_token()
+            response = self.session.post(url, json=payload, headers={'Authorization': f'Bearer {token}'}, timeout=30)
+            if response.status_code != 401 or attempt:
+                return response
+            logger.warning("Access token rejected; fetching a new one")
+            self.invalidate_token(token)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_payment_client():
+    """The process-wide PaymentClient, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PaymentClient()
+    return _client
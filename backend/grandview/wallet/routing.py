@@ -0,0 +1,6 @@
+from django.urls import path
+from .consumers import WalletConsumer
+
+websocket_urlpatterns = [
+    path('ws/wallet/', WalletConsumer.as_asgi()),
+]
@@ -1,8 +1,11 @@
 
 from rest_framework import serializers
 from .models import Wallet, Transaction, Withdrawal, Deposit
+from . import ledger
+from .stk import queue_stk_push
 from packages.models import Purchase
 from premium.models import AgentPurchase
+from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
 import logging
@@ -53,33 +56,18 @@ class DepositSerializer(serializers.Serializer):
         wallet, _ = Wallet.objects.get_or_create(user=user)
         amount = validated_data['amount']
         method = validated_data['deposit_method']
-        deposit = Deposit.objects.create(wallet=wallet, amount=amount, status='PENDING')
 
         if method == 'stk':
-            phone = validated_data['phone_number']
-            # Format phone to 254... if necessary (assume user provides correct format)
-            from wallet.payment import PaymentClient  # Import here to avoid circular
-            client = PaymentClient()
-            transaction_ref = f"DEP{deposit.pk}"
-            response = client.initiate_stk_push(phone, amount, transaction_ref)
-            if response.get('ResponseCode') == '0':
-                deposit.transaction_id = response['CheckoutRequestID']
-                deposit.phone_number = phone
-                deposit.save()
-                Transaction.objects.create(
-                    user=user,
-                    amount=amount,
-                    transaction_type='DEPOSIT',
-                    description=f"STK Push initiated for {amount} (Pending confirmation)",
-                    balance_type='deposit'
-                )
-                return {'message': 'STK Push initiated successfully. Check your phone for PIN prompt.', 'checkout_id': response['CheckoutRequestID']}
-            else:
-                deposit.delete()
-                raise serializers.ValidationError(f"Failed to initiate STK Push: {response.get('error', 'Unknown error')}")
+            # The push itself is sent by the send_stk_pushes worker so a slow Daraja call never holds up this request
+            deposit = queue_stk_push(wallet, amount, validated_data['phone_number'])
+            return {
+                'message': 'STK Push requested. Check your phone for the PIN prompt shortly.',
+                'deposit_id': deposit.pk,
+                'status': deposit.status,
+                'stk_status': deposit.stk_status,
+            }
         elif method == 'manual':
-            deposit.mpesa_code = validated_data['mpesa_code']
-            deposit.save()
+            deposit = Deposit.objects.create(wallet=wallet, amount=amount, status='PENDING', mpesa_code=validated_data['mpesa_code'])
             Transaction.objects.create(
                 user=user,
                 amount=amount,
@@ -145,24 +133,7 @@ class WithdrawSerializer(serializers.Serializer):
         amount = validated_data['amount']
         mpesa_number = validated_data['mpesa_number']
 
-        # Deduct full amount first
-        from_deposit = Decimal('0')
-        from_earnings = Decimal('0')
-
-        if balance_type == 'main_balance':
-            if user.is_marketer:
-                from_earnings = min(amount, wallet.views_earnings_balance)
-                from_deposit = amount - from_earnings
-            else:
-                from_deposit = amount  # Non-marketers deduct only from deposit_balance
-            if wallet.deposit_balance < from_deposit:
-                raise serializers.ValidationError("Insufficient deposit balance.")
-            wallet.views_earnings_balance -= from_earnings
-            wallet.deposit_balance -= from_deposit
-        else:
-            wallet.referral_balance -= amount
-
-        # Now calculate fee on the withdrawn amount
+        # Calculate fee on the withdrawn amount
         if balance_type == 'referral_balance' and user.is_marketer:
             fee = amount * Decimal('0.05')
             net_amount = amount - fee
@@ -170,26 +141,35 @@ class WithdrawSerializer(serializers.Serializer):
             fee = Decimal('0')
             net_amount = amount
 
-        wallet.save()
-
-        pending_tx = Transaction.objects.create(
-            user=user,
-            amount=-amount,  # Record full withdrawn amount as negative
-            transaction_type='WITHDRAW_PENDING',
-            description=f"Pending withdrawal of {amount} (fee {fee}, net payout {net_amount}) from {balance_type.replace('_', ' ')} to M-Pesa {mpesa_number}"
-        )
-
-        withdrawal = Withdrawal.objects.create(
-            wallet=wallet,
-            amount=amount,
-            net_amount=net_amount,
-            fee=fee,
-            balance_type=balance_type,
-            from_deposit=from_deposit,
-            from_earnings=from_earnings,
-            mpesa_number=mpesa_number,
-            pending_transaction=pending_tx
-        )
+        description = f"Pending withdrawal of {amount} (fee {fee}, net payout {net_amount}) from {balance_type.replace('_', ' ')} to M-Pesa {mpesa_number}"
+        from_deposit = Decimal('0')
+        from_earnings = Decimal('0')
+
+        # Deduct full amount, recorded as a negative pending transaction
+        with transaction.atomic():
+            if balance_type == 'main_balance':
+                # Non-marketers deduct only from deposit_balance
+                try:
+                    pending_tx, from_earnings, from_deposit = ledger.charge(user, amount, 'WITHDRAW_PENDING', description)
+                except ledger.InsufficientFunds:
+                    raise serializers.ValidationError("Insufficient deposit balance.")
+            else:
+                try:
+                    pending_tx = ledger.debit(user, amount, 'WITHDRAW_PENDING', description, balance='referral_balance')
+                except ledger.InsufficientFunds:
+                    raise serializers.ValidationError("Insufficient referral balance.")
+
+            withdrawal = Withdrawal.objects.create(
+                wallet=wallet,
+                amount=amount,
+                net_amount=net_amount,
+                fee=fee,
+                balance_type=balance_type,
+                from_deposit=from_deposit,
+                from_earnings=from_earnings,
+                mpesa_number=mpesa_number,
+                pending_transaction=pending_tx
+            )
 
         return {
             'message': f"Withdrawal requested (Pending approval) for {net_amount} after {'5% fee' if fee else 'no fee'}",
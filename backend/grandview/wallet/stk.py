@@ -0,0 +1,175 @@
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from grandview.events import publish
+from .consumers import wallet_group
+from .models import Deposit, MpesaCallback, Transaction
+from .payment import get_payment_client
+import logging
+
+logger = logging.getLogger('wallet')
+
+def deposit_state(deposit):
+    """What the deposit status endpoint and the wallet socket report for a deposit."""
+    return {
+        'deposit_id': deposit.pk,
+        'amount': str(deposit.amount),
+        'status': deposit.status,
+        'stk_status': deposit.stk_status,
+        'checkout_id': deposit.transaction_id,
+        'failure_reason': deposit.failure_reason,
+    }
+
+def publish_deposit(deposit):
+    publish(wallet_group(deposit.wallet.user_id), 'deposit.updated', deposit_state(deposit))
+
+def queue_stk_push(wallet, amount, phone_number):
+    """Record an STK push deposit for the worker to send; no M-Pesa call happens here."""
+    return Deposit.objects.create(wallet=wallet, amount=amount, phone_number=phone_number, stk_status='QUEUED')
+
+def _fail(deposit, reason):
+    deposit.status = 'FAILED'
+    deposit.stk_status = 'FAILED'
+    deposit.failure_reason = reason[:255]
+    deposit.save(update_fields=['status', 'stk_status', 'failure_reason', 'updated_at'])
+    logger.warning(f"STK push for deposit {deposit.pk} failed: {reason}")
+
+def _send(client, deposit, max_age):
+    if timezone.now() - deposit.created_at > max_age:
+        # The user has most likely given up waiting; a late PIN prompt would only confuse them
+        _fail(deposit, 'Timed out waiting to send the STK push. Please try again.')
+        return False
+    response = client.initiate_stk_push(deposit.phone_number, deposit.amount, f"DEP{deposit.pk}")
+    if response.get('ResponseCode') != '0':
+        _fail(deposit, f"Failed to initiate STK Push: {response.get('error', 'Unknown error')}")
+        return False
+    with transaction.atomic():
+        deposit.transaction_id = response['CheckoutRequestID']
+        deposit.stk_status = 'SENT'
+        deposit.save(update_fields=['transaction_id', 'stk_status', 'updated_at'])
+        Transaction.objects.create(
+            user_id=deposit.wallet.user_id,
+            amount=deposit.amount,
+            transaction_type='DEPOSIT',
+            description=f"STK Push initiated for {deposit.amount} (Pending confirmation)",
+            balance_type='deposit'
+        )
+    return True
+
+def send_stk_pushes(batch_size=None):
+    """Send the STK push for one batch of queued deposits.
+
+    The batch is claimed by moving it to SENDING in a short transaction, so
+    several workers can run side by side and no Daraja call happens while a
+    row lock is held. A worker that dies mid-batch leaves its deposits in
+    SENDING rather than risk prompting the user twice.
+
+    Returns a ``(sent, failed)`` tuple for the batch.
+    """
+    batch_size = batch_size or settings.STK_PUSH_BATCH_SIZE
+    sent = failed = 0
+
+    with transaction.atomic():
+        batch = list(
+            Deposit.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('wallet')
+            .filter(stk_status='QUEUED')
+            .order_by('id')[:batch_size]
+        )
+        if not batch:
+            return sent, failed
+        Deposit.objects.filter(pk__in=[deposit.pk for deposit in batch]).update(stk_status='SENDING')
+
+    client = get_payment_client()
+    max_age = timedelta(seconds=settings.STK_PUSH_MAX_AGE)
+    for deposit in batch:
+        deposit.stk_status = 'SENDING'
+        try:
+            ok = _send(client, deposit, max_age)
+        except Exception as e:
+            logger.error(f"STK push for deposit {deposit.pk} errored: {str(e)}", exc_info=True)
+            _fail(deposit, 'Failed to initiate STK Push. Please try again.')
+            ok = False
+        if ok:
+            sent += 1
+        else:
+            failed += 1
+        publish_deposit(deposit)
+
+    logger.info(f"STK push batch done: {sent} sent, {failed} failed")
+    return sent, failed
+
+def _metadata(callback):
+    items = callback.get('CallbackMetadata', {}).get('Item', [])
+    return {item['Name']: item.get('Value') for item in items}
+
+def _amount_matches(deposit, amount):
+    try:
+        return Decimal(str(amount)) == deposit.amount
+    except (InvalidOperation, TypeError):
+        return False
+
+def record_callback(callback):
+    """Apply one ``stkCallback`` body to its deposit, once.
+
+    The callback that settles a deposit is logged under its CheckoutRequestID
+    (and receipt number), so a replay Safaricom delivers again costs a single
+    indexed lookup and changes nothing. Callbacks that settle nothing, such
+    as those matching no deposit or lacking a receipt, are dropped without a
+    write. Returns the deposit the callback settled, if any.
+    """
+    checkout_id = callback.get('CheckoutRequestID')
+    if not checkout_id:
+        logger.warning("M-Pesa callback without a CheckoutRequestID ignored")
+        return None
+    if MpesaCallback.objects.filter(checkout_request_id=checkout_id).exists():
+        logger.info(f"Ignoring replayed M-Pesa callback for {checkout_id}")
+        return None
+
+    deposit = Deposit.objects.select_related('wallet__user').filter(transaction_id=checkout_id).first()
+    if deposit is None:
+        # Not logged: the endpoint is public, and only callbacks for our own STK pushes are worth keeping
+        logger.warning(f"No deposit for CheckoutRequestID {checkout_id}")
+        return None
+
+    result_code = callback.get('ResultCode')
+    result_desc = str(callback.get('ResultDesc', 'Unknown error'))
+    metadata = _metadata(callback) if result_code == 0 else {}
+    receipt = metadata.get('MpesaReceiptNumber')
+
+    with transaction.atomic():
+        if result_code == 0:
+            if not receipt or not _amount_matches(deposit, metadata.get('Amount')):
+                logger.warning(f"Callback for deposit {deposit.pk} has no receipt or a mismatched amount: {metadata}")
+                return None
+            fields = {'mpesa_receipt_number': str(receipt)}
+            if metadata.get('PhoneNumber'):
+                fields['phone_number'] = str(metadata['PhoneNumber'])
+            settled = deposit.complete(**fields)
+        else:
+            settled = Deposit.objects.filter(pk=deposit.pk, status='PENDING').update(
+                status='FAILED', failure_reason=result_desc[:255], updated_at=timezone.now()
+            )
+            if settled:
+                deposit.status = 'FAILED'
+                deposit.failure_reason = result_desc[:255]
+        if not settled:
+            logger.warning(f"Deposit {deposit.pk} was already {deposit.status}; callback {checkout_id} not applied")
+            return None
+
+        # Logged only once it settles the deposit, so a rejected callback cannot shadow a later valid one;
+        # the conditional status change above already lets only one concurrent delivery get here
+        MpesaCallback.objects.bulk_create([MpesaCallback(
+            checkout_request_id=checkout_id,
+            receipt_number=str(receipt) if receipt else None,
+            result_code=result_code,
+            result_desc=result_desc[:255],
+            deposit=deposit,
+            payload=callback,
+        )], ignore_conflicts=True)
+
+    logger.info(f"Deposit {deposit.pk} marked {deposit.status} by M-Pesa callback")
+    publish_deposit(deposit)
+    return deposit
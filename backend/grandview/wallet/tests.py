@@ -1,3 +1,406 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Barrier
+from unittest import mock
+import json
+import os
+import time
+from accounts.models import CustomUser
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from .models import Wallet, Deposit, MpesaCallback, Transaction, TransactionSummary
+from .payment import PaymentClient
+from . import ledger
+from .stk import send_stk_pushes
 
-# Create your tests here.
+def make_user(username, phone, **kwargs):
+    return CustomUser.objects.create_user(
+        username=username, password='pass12345', email=f'{username}@example.com', phone_number=phone, **kwargs
+    )
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.upline = make_user('upline', '+254700000201', is_marketer=True)
+        self.user = make_user('member', '+254700000202', referred_by=self.upline)
+        Wallet.objects.filter(user=self.user).update(deposit_balance=Decimal('1000'), views_earnings_balance=Decimal('300'))
+
+    def test_credit_updates_balance_and_records_transaction(self):
+        tx = ledger.credit(self.user, Decimal('50'), 'EARNING', 'Earned')
+        self.assertEqual(Wallet.objects.get(user=self.user).views_earnings_balance, Decimal('350'))
+        self.assertEqual((tx.amount, tx.transaction_type), (Decimal('50'), 'EARNING'))
+
+    def test_debit_is_guarded_in_one_update(self):
+        # Guarded UPDATE, the Transaction INSERT and its summary UPDATE, wrapped in a savepoint
+        with self.assertNumQueries(5):
+            ledger.debit(self.user, Decimal('300'), 'WITHDRAWAL', 'Out', balance='views_earnings_balance')
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.debit(self.user, Decimal('1'), 'WITHDRAWAL', 'Out', balance='views_earnings_balance')
+        self.assertEqual(Wallet.objects.get(user=self.user).views_earnings_balance, Decimal('0'))
+        self.assertEqual(Transaction.objects.filter(user=self.user, transaction_type='WITHDRAWAL').count(), 1)
+
+    def test_charge_spends_earnings_first_for_marketers(self):
+        marketer = make_user('marketer', '+254700000203', is_marketer=True)
+        Wallet.objects.filter(user=marketer).update(deposit_balance=Decimal('100'), views_earnings_balance=Decimal('60'))
+        tx, from_earnings, from_deposit = ledger.charge(marketer, Decimal('100'), 'PURCHASE', 'Bought', balance_type=ledger.split_balance_type)
+        self.assertEqual((from_earnings, from_deposit), (Decimal('60'), Decimal('40')))
+        self.assertEqual(tx.balance_type, 'mixed_balance')
+        wallet = Wallet.objects.get(user=marketer)
+        self.assertEqual((wallet.views_earnings_balance, wallet.deposit_balance), (Decimal('0'), Decimal('60')))
+
+    def test_deposit_deduction_pays_upline_commission(self):
+        ledger.charge(self.user, Decimal('500'), 'PURCHASE', 'Bought')
+        self.assertEqual(Wallet.objects.get(user=self.user).deposit_balance, Decimal('500'))
+        self.assertEqual(Wallet.objects.get(user=self.upline).referral_balance, Decimal('400'))
+        self.assertTrue(Transaction.objects.filter(user=self.upline, transaction_type='COMMISSION').exists())
+
+    def test_insufficient_charge_leaves_wallet_untouched(self):
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.charge(self.user, Decimal('1001'), 'PURCHASE', 'Bought')
+        wallet = Wallet.objects.get(user=self.user)
+        self.assertEqual(wallet.deposit_balance, Decimal('1000'))
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+class WalletSaveTests(TestCase):
+    def setUp(self):
+        self.upline = make_user('upline', '+254700000205', is_marketer=True)
+        self.user = make_user('member', '+254700000206', referred_by=self.upline)
+        Wallet.objects.filter(user=self.user).update(deposit_balance=Decimal('1000'))
+
+    def test_plain_save_is_a_single_update(self):
+        wallet = Wallet.objects.get(user=self.user)
+        wallet.views_earnings_balance += Decimal('90')
+        with self.assertNumQueries(1):
+            wallet.save()
+
+    def test_deposit_decrease_still_pays_commission(self):
+        wallet = Wallet.objects.get(user=self.user)
+        wallet.deposit_balance -= Decimal('100')
+        wallet.save()
+        self.assertEqual(Wallet.objects.get(user=self.upline).referral_balance, Decimal('80'))
+
+        # The saved value becomes the new baseline, so saving again pays nothing more
+        wallet.save()
+        self.assertEqual(Transaction.objects.filter(transaction_type='COMMISSION').count(), 1)
+
+class TransactionHistoryTests(TestCase):
+    def setUp(self):
+        self.user = make_user('earner', '+254700000207')
+        for i in range(7):
+            ledger.credit(self.user, Decimal('10'), 'EARNING', f'Earning {i}')
+        ledger.debit(self.user, Decimal('5'), 'WITHDRAWAL', 'Out', balance='views_earnings_balance')
+        self.client.force_login(self.user)
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url, secure=True)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen.extend(body['results'])
+            url = body['next']
+        return seen, body
+
+    def test_cursor_pages_cover_history_newest_first(self):
+        seen, body = self._walk(reverse('transactions') + '?page_size=3')
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(seen[0]['transaction_type'], 'WITHDRAWAL')
+        self.assertEqual(body['total_amount'], 65.0)
+        self.assertEqual(body['transaction_count'], 8)
+
+    def test_type_and_date_filters(self):
+        seen, body = self._walk(reverse('transactions') + '?type=withdrawal')
+        self.assertEqual([t['transaction_type'] for t in seen], ['WITHDRAWAL'])
+        # Totals cover the filtered rows, not the whole history
+        self.assertEqual(body['transaction_count'], 1)
+        self.assertEqual(body['total_amount'], float(seen[0]['amount']))
+        tomorrow = (timezone.now() + timedelta(days=1)).date().isoformat()
+        seen, body = self._walk(reverse('transactions') + f'?start_date={tomorrow}')
+        self.assertEqual(seen, [])
+        self.assertEqual((body['total_amount'], body['transaction_count']), (0.0, 0))
+        response = self.client.get(reverse('transactions') + '?end_date=yesterday', secure=True)
+        self.assertEqual(response.status_code, 400)
+
+    def test_summary_tracks_edits_and_deletes(self):
+        tx = Transaction.objects.filter(user=self.user, transaction_type='EARNING').first()
+        tx.amount = Decimal('25')
+        tx.save()
+        summary = TransactionSummary.objects.get(user=self.user)
+        self.assertEqual((summary.total_amount, summary.transaction_count), (Decimal('80'), 8))
+        tx.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.total_amount, summary.transaction_count), (Decimal('55'), 7))
+
+    def test_page_query_does_not_aggregate_history(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('transaction_history'), secure=True)
+        self.assertFalse(any('SUM(' in q['sql'].upper() for q in ctx.captured_queries))
+
+class LedgerConcurrencyTests(TransactionTestCase):
+    threads = 8
+    operations = 25
+
+    # SQLite's shared-cache test database rejects concurrent writers outright,
+    # so this only runs against a server database such as Postgres.
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_parallel_debits_and_credits_do_not_lose_updates(self):
+        user = make_user('busy', '+254700000204')
+        Wallet.objects.filter(user=user).update(deposit_balance=Decimal('100'))
+        barrier = Barrier(self.threads)
+        failures = []
+        errors = []
+
+        def hammer(index):
+            barrier.wait()
+            try:
+                for _ in range(self.operations):
+                    if index % 2:
+                        ledger.credit(user, Decimal('3'), 'DEPOSIT', 'In', balance='deposit_balance')
+                    else:
+                        try:
+                            ledger.charge(user, Decimal('2'), 'PURCHASE', 'Out')
+                        except ledger.InsufficientFunds:
+                            failures.append(index)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [Thread(target=hammer, args=(i,)) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        credits = (self.threads // 2) * self.operations * Decimal('3')
+        debits = ((self.threads + 1) // 2 * self.operations - len(failures)) * Decimal('2')
+        wallet = Wallet.objects.get(user=user)
+        self.assertEqual(wallet.deposit_balance, Decimal('100') + credits - debits)
+        self.assertGreaterEqual(wallet.deposit_balance, 0)
+        ledger_total = sum(Transaction.objects.filter(user=user).values_list('amount', flat=True))
+        self.assertEqual(ledger_total, credits - debits)
+
+class FakeMpesa:
+    """A local stand-in for the Daraja API that counts OAuth and STK push calls."""
+
+    def __init__(self, token_delay=0):
+        self.token_delay = token_delay
+        self.oauth_calls = 0
+        self.push_calls = 0
+        self.revoked = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.oauth_calls += 1
+                time.sleep(fake.token_delay)
+                self.reply(200, {'access_token': f'token-{fake.oauth_calls}', 'expires_in': '3599'})
+
+            def do_POST(self):
+                fake.push_calls += 1
+                self.rfile.read(int(self.headers['Content-Length']))
+                if self.headers['Authorization'].removeprefix('Bearer ') in fake.revoked:
+                    self.reply(401, {'errorMessage': 'Invalid Access Token'})
+                else:
+                    self.reply(200, {'ResponseCode': '0', 'CheckoutRequestID': f'ws_CO_{fake.push_calls}'})
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def client(self):
+        env = {
+            'PAYMENT_API_URL': self.url, 'PAYMENT_CONSUMER_KEY': 'key', 'PAYMENT_CONSUMER_SECRET': 'secret',
+            'PAYMENT_SHORTCODE': '174379', 'PAYMENT_PASSKEY': 'passkey', 'PAYMENT_CALLBACK_URL': 'https://example.com/api/callback/',
+        }
+        with mock.patch.dict(os.environ, env):
+            return PaymentClient()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class PaymentClientTests(TestCase):
+    def setUp(self):
+        self.mpesa = FakeMpesa()
+        self.addCleanup(self.mpesa.close)
+
+    def test_token_is_reused_until_it_nears_expiry(self):
+        client = self.mpesa.client()
+        for i in range(3):
+            self.assertEqual(client.initiate_stk_push('254711000001', 100, f'DEP{i}')['ResponseCode'], '0')
+        self.assertEqual((self.mpesa.oauth_calls, self.mpesa.push_calls), (1, 3))
+        client._token_expires_at = time.monotonic() - 1
+        client.initiate_stk_push('254711000001', 100, 'DEP3')
+        self.assertEqual(self.mpesa.oauth_calls, 2)
+
+    def test_cold_cache_fetches_one_token_for_concurrent_pushes(self):
+        self.mpesa.token_delay = 0.2
+        client = self.mpesa.client()
+        barrier = Barrier(8)
+        tokens = []
+
+        def push():
+            barrier.wait()
+            tokens.append(client.get_access_token())
+
+        workers = [Thread(target=push) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.mpesa.oauth_calls, 1)
+        self.assertEqual(set(tokens), {'token-1'})
+
+    def test_rejected_token_is_refreshed_once(self):
+        client = self.mpesa.client()
+        self.mpesa.revoked.add(client.get_access_token())
+        self.assertEqual(client.initiate_stk_push('254711000001', 100, 'DEP1')['ResponseCode'], '0')
+        self.assertEqual((self.mpesa.oauth_calls, self.mpesa.push_calls), (2, 2))
+
+class StkDepositTests(TestCase):
+    def setUp(self):
+        self.user = make_user('stk', '+254700000210')
+        self.client.force_login(self.user)
+        self.mpesa = FakeMpesa()
+        self.addCleanup(self.mpesa.close)
+        patcher = mock.patch('wallet.stk.get_payment_client', return_value=self.mpesa.client())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request_push(self):
+        response = self.client.post(reverse('deposit'), {'amount': '100', 'deposit_method': 'stk', 'phone_number': '254711000001'}, secure=True)
+        self.assertEqual(response.status_code, 202)
+        return response.json()['deposit_id']
+
+    def _status(self, deposit_id):
+        return self.client.get(reverse('deposit_status', args=[deposit_id]), secure=True)
+
+    def test_request_returns_before_mpesa_is_called(self):
+        deposit_id = self._request_push()
+        self.assertEqual((self.mpesa.oauth_calls, self.mpesa.push_calls), (0, 0))
+        self.assertEqual(self._status(deposit_id).json()['stk_status'], 'QUEUED')
+
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'wallet_{self.user.pk}', channel)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_stk_pushes(), (1, 0))
+        event = async_to_sync(layer.receive)(channel)['payload']
+        self.assertEqual((event['type'], event['data']['stk_status']), ('deposit.updated', 'SENT'))
+
+        body = self._status(deposit_id).json()
+        self.assertEqual((body['status'], body['stk_status'], body['checkout_id']), ('PENDING', 'SENT', 'ws_CO_1'))
+        self.assertTrue(Transaction.objects.filter(user=self.user, transaction_type='DEPOSIT').exists())
+        # Claimed deposits are not sent again
+        self.assertEqual(send_stk_pushes(), (0, 0))
+        self.assertEqual(self.mpesa.push_calls, 1)
+
+    def test_rejected_and_stale_pushes_fail_the_deposit(self):
+        rejected = self._request_push()
+        stale = self._request_push()
+        Deposit.objects.filter(pk=stale).update(created_at=timezone.now() - timedelta(minutes=10))
+        with mock.patch('wallet.payment.PaymentClient.initiate_stk_push', return_value={'ResponseCode': '1', 'error': 'Invalid phone'}):
+            self.assertEqual(send_stk_pushes(), (0, 2))
+        for deposit_id in (rejected, stale):
+            body = self._status(deposit_id).json()
+            self.assertEqual((body['status'], body['stk_status']), ('FAILED', 'FAILED'))
+        self.assertIn('Invalid phone', self._status(rejected).json()['failure_reason'])
+        self.assertIn('Timed out', self._status(stale).json()['failure_reason'])
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    def test_status_is_private_to_the_depositor(self):
+        deposit_id = self._request_push()
+        self.client.force_login(make_user('other', '+254700000211'))
+        self.assertEqual(self._status(deposit_id).status_code, 404)
+
+def stk_callback(checkout_id, amount, receipt='RCP123', result_code=0):
+    callback = {'MerchantRequestID': 'm-1', 'CheckoutRequestID': checkout_id, 'ResultCode': result_code, 'ResultDesc': 'Request cancelled by user'}
+    if result_code == 0:
+        callback['CallbackMetadata'] = {'Item': [
+            {'Name': 'Amount', 'Value': amount},
+            {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+            {'Name': 'PhoneNumber', 'Value': 254711000001},
+        ]}
+    return {'Body': {'stkCallback': callback}}
+
+class CallbackTests(TestCase):
+    def setUp(self):
+        cache.clear()  # Callback throttle history
+        self.user = make_user('payer', '+254700000212')
+        self.deposit = Deposit.objects.create(wallet=Wallet.objects.get(user=self.user), amount=Decimal('100'), transaction_id='ws_CO_9')
+
+    def _post(self, body):
+        response = self.client.post(reverse('mpesa_callback'), body, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 200)
+
+    def test_replayed_callbacks_credit_once_and_cost_one_query(self):
+        self._post(stk_callback('ws_CO_9', 100.0))
+        with self.assertNumQueries(1):
+            self._post(stk_callback('ws_CO_9', 100.0))
+        for _ in range(3):
+            self._post(stk_callback('ws_CO_9', 100.0))
+        self.deposit.refresh_from_db()
+        self.assertEqual((self.deposit.status, self.deposit.mpesa_receipt_number), ('COMPLETED', 'RCP123'))
+        self.assertEqual(Wallet.objects.get(user=self.user).deposit_balance, Decimal('100'))
+        self.assertEqual(MpesaCallback.objects.get().deposit, self.deposit)
+
+    def test_unknown_checkout_ids_are_not_logged(self):
+        for i in range(3):
+            self._post(stk_callback(f'forged-{i}', 100.0, receipt=f'FAKE{i}'))
+        self.assertFalse(MpesaCallback.objects.exists())
+        self.assertEqual(Wallet.objects.get(user=self.user).deposit_balance, Decimal('0'))
+
+    @override_settings(MPESA_CALLBACK_THROTTLE_RATE='3/minute')
+    def test_callbacks_are_rate_limited_per_ip(self):
+        for i in range(3):
+            self._post(stk_callback(f'flood-{i}', 1))
+        response = self.client.post(reverse('mpesa_callback'), stk_callback('flood-4', 1), content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 429)
+
+    def test_completed_deposit_is_not_credited_again(self):
+        self.assertTrue(self.deposit.complete(mpesa_receipt_number='RCP1'))
+        self.assertFalse(Deposit.objects.get(pk=self.deposit.pk).complete(mpesa_receipt_number='RCP2'))
+        # Saving a completed deposit, as the admin change form does, leaves the wallet alone
+        deposit = Deposit.objects.get(pk=self.deposit.pk)
+        deposit.save()
+        self.assertEqual(Wallet.objects.get(user=self.user).deposit_balance, Decimal('100'))
+        self.assertEqual(Transaction.objects.filter(user=self.user, transaction_type='DEPOSIT').count(), 1)
+
+    def test_rejected_callback_does_not_block_a_later_valid_one(self):
+        self._post(stk_callback('ws_CO_9', 100.0, receipt=None))
+        self._post(stk_callback('ws_CO_9', 99.0))
+        self.assertFalse(MpesaCallback.objects.exists())
+        self._post(stk_callback('ws_CO_9', 100.0))
+        self.deposit.refresh_from_db()
+        self.assertEqual((self.deposit.status, self.deposit.mpesa_receipt_number), ('COMPLETED', 'RCP123'))
+        self.assertEqual(Wallet.objects.get(user=self.user).deposit_balance, Decimal('100'))
+
+    def test_mismatched_amount_and_failures_are_not_credited(self):
+        self._post(stk_callback('ws_CO_9', 99.0))
+        self.deposit.refresh_from_db()
+        self.assertEqual(self.deposit.status, 'PENDING')
+
+        other = Deposit.objects.create(wallet=self.deposit.wallet, amount=Decimal('50'), transaction_id='ws_CO_10')
+        self._post(stk_callback('ws_CO_10', 50, result_code=1032))
+        other.refresh_from_db()
+        self.assertEqual((other.status, other.failure_reason), ('FAILED', 'Request cancelled by user'))
+        self.assertEqual(Wallet.objects.get(user=self.user).deposit_balance, Decimal('0'))
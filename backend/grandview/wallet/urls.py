@@ -1,10 +1,11 @@
 # Updated urls.py
 from django.urls import path
-from .views import WalletView, WithdrawMainView, WithdrawReferralView, TransactionHistoryView, DepositView, CallbackView
+from .views import WalletView, WithdrawMainView, WithdrawReferralView, TransactionHistoryView, DepositView, DepositStatusView, CallbackView
 
 urlpatterns = [
     path('wallet/', WalletView.as_view(), name='wallet'),
     path('wallet/deposit/', DepositView.as_view(), name='deposit'),
+    path('wallet/deposit/<int:pk>/status/', DepositStatusView.as_view(), name='deposit_status'),
     path('wallet/withdraw/main/', WithdrawMainView.as_view(), name='withdraw_main'),
     path('wallet/withdraw/referral/', WithdrawReferralView.as_view(), name='withdraw_referral'),
     path('wallet/transactions/', TransactionHistoryView.as_view(), name='transactions'),
@@ -3,9 +3,13 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny  # Callback is public
 from rest_framework import status
-from .models import Wallet, Deposit, Transaction
+from rest_framework.throttling import SimpleRateThrottle
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from .models import Wallet, Deposit
 from .serializers import WalletSerializer, DepositSerializer, TransactionSerializer, WithdrawSerializer
-from .payment import PaymentClient
+from .history import TransactionCursorPagination, transaction_history, transaction_totals
+from .stk import deposit_state, record_callback
 import json
 import logging
 
@@ -26,9 +30,18 @@ class DepositView(APIView):
         serializer = DepositSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             result = serializer.save()
-            return Response(result, status=status.HTTP_201_CREATED)
+            # An STK push is only queued at this point; its progress is read from DepositStatusView
+            queued = serializer.validated_data['deposit_method'] == 'stk'
+            return Response(result, status=status.HTTP_202_ACCEPTED if queued else status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class DepositStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        deposit = get_object_or_404(Deposit, pk=pk, wallet__user=request.user)
+        return Response(deposit_state(deposit))
+
 class WithdrawMainView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -53,12 +66,32 @@ class TransactionHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        transactions = Transaction.objects.filter(user=request.user).order_by('-created_at')
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        paginator = TransactionCursorPagination()
+        transactions = transaction_history(request)
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        serializer = TransactionSerializer(page, many=True)
+        return Response({
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': serializer.data,
+            **transaction_totals(request, transactions),
+        })
+
+class MpesaCallbackThrottle(SimpleRateThrottle):
+    """Per-IP limit for the callback, read from MPESA_CALLBACK_THROTTLE_RATE."""
+    scope = 'mpesa_callback'
+
+    def get_rate(self):
+        return settings.MPESA_CALLBACK_THROTTLE_RATE
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
 
 class CallbackView(APIView):
     permission_classes = [AllowAny]  # M-Pesa callback is public
+    # Safaricom sends every callback (and its retries) from a handful of IPs; the 100/day anonymous
+    # throttle would drop payments, but the endpoint still needs a ceiling since anyone can call it
+    throttle_classes = [MpesaCallbackThrottle]
 
     def post(self, request):
         try:
@@ -68,53 +101,9 @@ class CallbackView(APIView):
             else:
                 data = request.data
 
-            body = data.get('Body', {})
-            callback = body.get('stkCallback', {})
-            merchant_request_id = callback.get('MerchantRequestID')
-            checkout_request_id = callback.get('CheckoutRequestID')
-            result_code = callback.get('ResultCode')
-
-            logger.info(f"M-Pesa Callback received: CheckoutRequestID={checkout_request_id}, ResultCode={result_code}")
-
-            if result_code == 0:
-                # Success
-                callback_metadata = callback.get('CallbackMetadata', {})
-                items = callback_metadata.get('Item', [])
-                amount = None
-                receipt_number = None
-                phone_number = None
-                transaction_date = None
-
-                for item in items:
-                    name = item['Name']
-                    value = item['Value']
-                    if name == 'Amount':
-                        amount = value
-                    elif name == 'MpesaReceiptNumber':
-                        receipt_number = value
-                    elif name == 'PhoneNumber':
-                        phone_number = value
-                    elif name == 'TransactionDate':
-                        transaction_date = value
-
-                if amount and receipt_number and checkout_request_id:
-                    deposit = Deposit.objects.filter(transaction_id=checkout_request_id, status='PENDING').first()
-                    if deposit and float(amount) == float(deposit.amount):
-                        deposit.status = 'COMPLETED'
-                        deposit.mpesa_receipt_number = str(receipt_number)
-                        deposit.phone_number = str(phone_number)
-                        deposit.save()  # Triggers wallet update and email
-                        logger.info(f"Deposit {deposit.pk} completed via STK Push")
-                    else:
-                        logger.warning(f"No matching pending deposit for CheckoutRequestID {checkout_request_id}")
-            else:
-                # Failure
-                error_desc = callback.get('ResultDesc', 'Unknown error')
-                deposit = Deposit.objects.filter(transaction_id=checkout_request_id).first()
-                if deposit:
-                    deposit.status = 'FAILED'
-                    deposit.save()
-                    logger.info(f"Deposit {deposit.pk} marked as FAILED: {error_desc}")
+            callback = data.get('Body', {}).get('stkCallback', {})
+            logger.info(f"M-Pesa Callback received: CheckoutRequestID={callback.get('CheckoutRequestID')}, ResultCode={callback.get('ResultCode')}")
+            record_callback(callback)
 
             return Response({
                 'ResultCode': 1,
@@ -22,33 +22,33 @@ export default function StorePage() {
   const [products, setProducts] = useState<Product[]>([])
   const [categories, setCategories] = useState<Category[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [nextPage, setNextPage] = useState<string | null>(null)
   const [selectedCategory, setSelectedCategory] = useState<number | null>(null)
   const [searchQuery, setSearchQuery] = useState("")
+  const [debouncedSearch, setDebouncedSearch] = useState("")
   const [viewMode, setViewMode] = useState<"grid" | "list">("grid")
   const [cartCount, setCartCount] = useState(0)
 
   useEffect(() => {
-    fetchProducts()
+    fetchCategories()
     fetchCartCount()
   }, [])
 
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchQuery.trim()), 300)
+    return () => clearTimeout(timer)
+  }, [searchQuery])
+
+  useEffect(() => {
+    fetchProducts()
+  }, [selectedCategory, debouncedSearch])
+
   const fetchProducts = async () => {
     try {
-      const productsData = await ApiService.getAllProducts()
-      setProducts(productsData)
-
-      // Compute categories from products
-      const categoryMap = new Map<number, Category>()
-      productsData.forEach((product) => {
-        const cat = product.category
-        if (!categoryMap.has(cat.id)) {
-          categoryMap.set(cat.id, { id: cat.id, name: cat.name, count: 1 })
-        } else {
-          const existing = categoryMap.get(cat.id)!
-          categoryMap.set(cat.id, { ...existing, count: (existing.count || 0) + 1 })
-        }
-      })
-      setCategories(Array.from(categoryMap.values()))
+      const page = await ApiService.getProducts({ q: debouncedSearch, category: selectedCategory ?? undefined })
+      setProducts(page.results)
+      setNextPage(page.next)
     } catch (error) {
       toast.error(error instanceof Error ? error.message : "Failed to load products")
     } finally {
@@ -56,6 +56,28 @@ export default function StorePage() {
     }
   }
 
+  const loadMoreProducts = async () => {
+    if (!nextPage) return
+    setLoadingMore(true)
+    try {
+      const page = await ApiService.getProducts({}, nextPage)
+      setProducts((current) => [...current, ...page.results])
+      setNextPage(page.next)
+    } catch (error) {
+      toast.error(error instanceof Error ? error.message : "Failed to load products")
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
+  const fetchCategories = async () => {
+    try {
+      setCategories(await ApiService.getCategories())
+    } catch (error) {
+      console.error("Failed to fetch categories:", error)
+    }
+  }
+
   const fetchCartCount = async () => {
     try {
       const cartData = await ApiService.getCart()
@@ -73,14 +95,6 @@ export default function StorePage() {
     fetchCartCount()
   }
 
-  const filteredProducts = products.filter((product) => {
-    const matchesCategory = !selectedCategory || product.category.id === selectedCategory
-    const matchesSearch =
-      product.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      product.description.toLowerCase().includes(searchQuery.toLowerCase())
-    return matchesCategory && matchesSearch
-  })
-
   if (loading) {
     return (
       <div className="min-h-screen bg-gradient-to-br from-slate-900 via-purple-900 to-slate-900">
@@ -169,7 +183,7 @@ export default function StorePage() {
               </div>
 
               <div className="lg:col-span-3">
-                {filteredProducts.length === 0 ? (
+                {products.length === 0 ? (
                   <Card className="bg-white/10 border-white/20 backdrop-blur-md text-center py-8 sm:py-12">
                     <CardContent>
                       <ShoppingBag className="h-10 w-10 sm:h-12 sm:w-12 text-gray-400 mx-auto mb-3 sm:mb-4" />
@@ -180,17 +194,32 @@ export default function StorePage() {
                     </CardContent>
                   </Card>
                 ) : (
-                  <div
-                    className={`grid gap-4 sm:gap-6 ${
-                      viewMode === "grid"
-                        ? "grid-cols-2 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 xl:grid-cols-4"
-                        : "grid-cols-1"
-                    }`}
-                  >
-                    {filteredProducts.map((product) => (
-                      <ProductCard key={product.id} product={product} onAddToCart={handleCartUpdate} />
-                    ))}
-                  </div>
+                  <>
+                    <div
+                      className={`grid gap-4 sm:gap-6 ${
+                        viewMode === "grid"
+                          ? "grid-cols-2 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 xl:grid-cols-4"
+                          : "grid-cols-1"
+                      }`}
+                    >
+                      {products.map((product) => (
+                        <ProductCard key={product.id} product={product} onAddToCart={handleCartUpdate} />
+                      ))}
+                    </div>
+                    {nextPage && (
+                      <div className="flex justify-center mt-4 sm:mt-6">
+                        <Button
+                          variant="outline"
+                          onClick={loadMoreProducts}
+                          disabled={loadingMore}
+                          className="bg-white/10 border-white/20 text-white hover:bg-white/20"
+                        >
+                          {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                          Load more
+                        </Button>
+                      </div>
+                    )}
+                  </>
                 )}
               </div>
             </div>
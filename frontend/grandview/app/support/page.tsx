@@ -6,6 +6,7 @@ import { CreateSupportMessage } from "@/components/support/create-support-messag
 import { SupportFilters } from "@/components/support/support-filter"
 import { ApiService } from "@/lib/api"
 import { useAuth } from "@/hooks/use-auth"
+import { useSupportSocket } from "@/hooks/use-support-socket"
 import { toast } from "sonner"
 import { Loader2, MessageCircle, Search, Plus, Star, Shield, Users } from "lucide-react"
 import { Card, CardContent } from "@/components/ui/card"
@@ -48,6 +49,9 @@ interface Conversation {
   id: number
   username: string
   unread_count: number
+  last_message: string
+  last_message_at: string
+  last_sender_id: number
 }
 
 interface PrivateMessage {
@@ -110,6 +114,56 @@ export default function SupportPage() {
     console.log("Private conversations with unread counts:", privateConversations)
   }, [privateConversations])
 
+  // Live updates replace refetching: the server pushes every new message, comment and like
+  useSupportSocket("feed", (event) => {
+    switch (event.type) {
+      case "message.created":
+        if (activeTab === "all" || (activeTab === "my-messages" && event.data.user?.id === user?.id)) {
+          setMessages((prev) => (prev.some((msg) => msg.id === event.data.id) ? prev : [...prev, event.data as SupportMessage]))
+        }
+        break
+      case "message.updated":
+        setMessages((prev) => prev.map((msg) => (msg.id === event.data.id ? { ...msg, ...event.data } : msg)))
+        break
+      case "like.created":
+        setMessages((prev) =>
+          prev.map((msg) =>
+            msg.id === event.data.message_id
+              ? { ...msg, like_count: event.data.like_count, is_liked: msg.is_liked || event.data.user_id === user?.id }
+              : msg
+          )
+        )
+        break
+      case "comment.created":
+        setMessages((prev) =>
+          prev.map((msg) => (msg.id === event.data.message ? { ...msg, comment_count: msg.comment_count + 1 } : msg))
+        )
+        break
+    }
+  })
+
+  useSupportSocket(
+    "private",
+    (event) => {
+      if (event.type === "private_message.read") {
+        const ids = new Set<number>(event.data.ids)
+        setPrivateMessages((prev) => prev.map((msg) => (ids.has(msg.id) ? { ...msg, read_at: event.data.read_at } : msg)))
+        return
+      }
+      if (event.type !== "private_message.created") return
+      const message = event.data as PrivateMessage & { receiver: number }
+      const otherId = message.sender.id === user?.id ? message.receiver : message.sender.id
+      if (otherId === selectedConversation) {
+        setPrivateMessages((prev) =>
+          prev.some((msg) => msg.id === message.id) ? prev : [...prev, message as unknown as PrivateMessage]
+        )
+      } else if (message.sender.id !== user?.id) {
+        fetchPrivateConversations()
+      }
+    },
+    !!user
+  )
+
   const fetchSupportData = async (pageNum: number) => {
     try {
       if (pageNum === 1) {
@@ -490,13 +544,21 @@ export default function SupportPage() {
                       <Button
                         key={convo.id}
                         variant="outline"
-                        className="w-full justify-start border-blue-200 text-gray-900 hover:bg-blue-50 relative text-xs sm:text-sm"
+                        className="w-full h-auto py-2 justify-start border-blue-200 text-gray-900 hover:bg-blue-50 relative text-xs sm:text-sm"
                         onClick={() => {
                           setSelectedConversation(convo.id)
                           fetchPrivateMessages(convo.id)
                         }}
                       >
-                        {convo.username}
+                        <span className="flex flex-col items-start min-w-0 pr-8">
+                          <span>{convo.username}</span>
+                          {convo.last_message && (
+                            <span className="text-gray-500 text-xs truncate max-w-full">
+                              {convo.last_sender_id === user?.id ? "You: " : ""}
+                              {convo.last_message}
+                            </span>
+                          )}
+                        </span>
                         {convo.unread_count > 0 && (
                           <Badge className="absolute top-2 right-2 bg-red-500 text-white text-xs">
                             {convo.unread_count}
@@ -98,7 +98,7 @@ const fetchWithdrawalData = async () => {
       //  },
       //})
 
-      const response = await fetch("https://grandview-shop.onrender.com/api/transactions/", {
+      const response = await fetch("https://grandview-shop.onrender.com/api/transactions/?type=WITHDRAWAL", {
         headers: {
           Authorization: `Token ${token}`,
         },
@@ -23,17 +23,15 @@ export function AdvertCard({ advert, onSubmissionSuccess }: AdvertCardProps) {
   const handleDownload = async () => {
     try {
       setIsDownloading(true)
-      // Call ApiService.downloadAdvert, which returns a Blob
-      const response = await ApiService.downloadAdvert(advert.id)
-      // Create a download link for the Blob
-      const url = URL.createObjectURL(response)
+      // The API hands back a signed storage link; the link's Content-Disposition makes the browser save it
+      const { url, file_name } = await ApiService.downloadAdvert(advert.id)
       const link = document.createElement("a")
       link.href = url
-      link.download = advert.title || "advert-file"
+      link.download = file_name || advert.title || "advert-file"
       document.body.appendChild(link)
       link.click()
       document.body.removeChild(link)
-      URL.revokeObjectURL(url)
+      if (url.startsWith("blob:")) URL.revokeObjectURL(url)
       toast.success("🎉 Download Started!", {
         description: "Your ad file is being downloaded",
       })
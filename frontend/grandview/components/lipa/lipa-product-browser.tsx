@@ -76,27 +76,32 @@ export function LipaProductBrowser({ registration, onProductSelect }: LipaProduc
   const [products, setProducts] = useState<Product[]>([])
   const [categories, setCategories] = useState<Category[]>([])
   const [loading, setLoading] = useState(true)
+  const [nextPage, setNextPage] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [searchQuery, setSearchQuery] = useState("")
   const [selectedCategory, setSelectedCategory] = useState<string>("all")
   const [sortBy, setSortBy] = useState<string>("name")
 
   useEffect(() => {
-    fetchData()
+    ApiService.getCategories()
+      .then(setCategories)
+      .catch(() => setCategories([]))
   }, [])
 
-  const fetchData = async () => {
-    try {
-      setLoading(true)
-      const [productsData, categoriesData] = await Promise.all([
-        ApiService.getAllProducts(),
-        ApiService.getCategories().catch(() => []),
-      ])
-
-      // Filter products that support installments
-      const installmentProducts = productsData.filter((product) => product.installment_available !== false)
+  useEffect(() => {
+    const timer = setTimeout(fetchProducts, searchQuery ? 300 : 0)
+    return () => clearTimeout(timer)
+  }, [searchQuery, selectedCategory])
 
-      setProducts(installmentProducts)
-      setCategories(categoriesData)
+  const fetchProducts = async () => {
+    try {
+      const page = await ApiService.getProducts({
+        installments: true,
+        q: searchQuery.trim(),
+        category: selectedCategory === "all" ? undefined : selectedCategory,
+      })
+      setProducts(page.results)
+      setNextPage(page.next)
     } catch (error) {
       console.error("Failed to fetch products:", error)
       toast.error("Failed to load products")
@@ -105,6 +110,20 @@ export function LipaProductBrowser({ registration, onProductSelect }: LipaProduc
     }
   }
 
+  const loadMoreProducts = async () => {
+    if (!nextPage) return
+    setLoadingMore(true)
+    try {
+      const page = await ApiService.getProducts({}, nextPage)
+      setProducts((current) => [...current, ...page.results])
+      setNextPage(page.next)
+    } catch (error) {
+      toast.error("Failed to load products")
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleAddToCart = async (productId: number) => {
     try {
       await ApiService.addToCart({ product_id: productId })
@@ -127,15 +146,7 @@ export function LipaProductBrowser({ registration, onProductSelect }: LipaProduc
     }
   }
 
-  const filteredProducts = products.filter((product) => {
-    const matchesSearch =
-      product.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      product.description.toLowerCase().includes(searchQuery.toLowerCase())
-    const matchesCategory = selectedCategory === "all" || product.category.slug === selectedCategory
-    return matchesSearch && matchesCategory
-  })
-
-  const sortedProducts = [...filteredProducts].sort((a, b) => {
+  const sortedProducts = [...products].sort((a, b) => {
     switch (sortBy) {
       case "price_low":
         return Number.parseFloat(a.price) - Number.parseFloat(b.price)
@@ -341,6 +352,15 @@ export function LipaProductBrowser({ registration, onProductSelect }: LipaProduc
             </div>
           )}
 
+          {nextPage && (
+            <div className="flex justify-center">
+              <Button variant="outline" onClick={loadMoreProducts} disabled={loadingMore} className="glass-input">
+                {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                Load more
+              </Button>
+            </div>
+          )}
+
           {/* Info Section */}
           <div className="bg-gradient-to-r from-primary/10 to-secondary/10 p-6 rounded-lg">
             <h3 className="font-semibold mb-3">How Lipa Mdogo Mdogo Works</h3>
@@ -1,17 +1,22 @@
 "use client"
 
 import type React from "react"
-import { useState } from "react"
+import { useCallback, useEffect, useRef, useState } from "react"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
 import { Label } from "@/components/ui/label"
 import { Tabs, TabsList, TabsTrigger, TabsContent } from "@/components/ui/tabs"
 import { Plus, Loader2, CreditCard, Smartphone } from "lucide-react"
-import { ApiService } from "@/lib/api"
+import { ApiService, walletSocketUrl, type DepositState } from "@/lib/api"
+import { useEventSocket } from "@/hooks/use-support-socket"
 import { toast } from "sonner"
 //import { formatCurrency } from "@/lib/utils"
 
+// The wallet socket normally reports progress; polling covers a dropped socket
+const STATUS_POLL_MS = 4000
+const STATUS_POLL_LIMIT = 45
+
 interface DepositFormProps {
   onSuccess: () => void
 }
@@ -22,6 +27,53 @@ export function DepositForm({ onSuccess }: DepositFormProps) {
   const [mpesaCode, setMpesaCode] = useState("")
   const [isDepositing, setIsDepositing] = useState(false)
   const [depositMethod, setDepositMethod] = useState<"stk" | "manual">("stk")
+  const [pendingDeposit, setPendingDeposit] = useState<number | null>(null)
+  const promptShown = useRef(false)
+
+  const applyDepositState = useCallback(
+    (state: DepositState) => {
+      if (state.deposit_id !== pendingDeposit) return
+      if (state.status === "FAILED" || state.stk_status === "FAILED") {
+        toast.error(state.failure_reason || "STK Push failed. Please try again.")
+        setPendingDeposit(null)
+      } else if (state.status === "COMPLETED") {
+        toast.success("Deposit received. Your wallet has been updated.")
+        setPendingDeposit(null)
+        onSuccess()
+      } else if (state.stk_status === "SENT" && !promptShown.current) {
+        promptShown.current = true
+        toast.info("Check your phone and enter your M-Pesa PIN to complete the deposit.")
+      }
+    },
+    [pendingDeposit, onSuccess],
+  )
+
+  useEventSocket(
+    walletSocketUrl,
+    "wallet",
+    (event) => {
+      if (event.type === "deposit.updated") applyDepositState(event.data as DepositState)
+    },
+    pendingDeposit !== null,
+  )
+
+  useEffect(() => {
+    if (pendingDeposit === null) return
+    let polls = 0
+    const timer = setInterval(async () => {
+      if (++polls > STATUS_POLL_LIMIT) {
+        clearInterval(timer)
+        setPendingDeposit(null)
+        return
+      }
+      try {
+        applyDepositState(await ApiService.getDepositStatus(pendingDeposit))
+      } catch (error) {
+        console.error("Failed to fetch deposit status:", error)
+      }
+    }, STATUS_POLL_MS)
+    return () => clearInterval(timer)
+  }, [pendingDeposit, applyDepositState])
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault()
@@ -58,15 +110,18 @@ export function DepositForm({ onSuccess }: DepositFormProps) {
       const response = await ApiService.deposit(payload)
 
       if (depositMethod === "stk") {
-        toast.success(response.message || "STK Push initiated. Check your phone for the PIN prompt.")
+        // The push is sent in the background; progress arrives over the wallet socket or by polling
+        toast.success(response.message || "STK Push requested. Check your phone for the PIN prompt shortly.")
+        promptShown.current = false
+        setPendingDeposit(response.deposit_id)
       } else {
         toast.success(response.message || "Manual deposit submitted. Awaiting admin approval.")
+        onSuccess()
       }
 
       setAmount("")
       setPhoneNumber("")
       setMpesaCode("")
-      onSuccess()
     } catch (error) {
       toast.error(error instanceof Error ? error.message : "Failed to process deposit")
     } finally {
@@ -134,12 +189,12 @@ export function DepositForm({ onSuccess }: DepositFormProps) {
               <Button
                 type="submit"
                 className="w-full bg-blue-500 text-white hover:bg-blue-600 text-lg py-6 font-semibold"
-                disabled={isDepositing}
+                disabled={isDepositing || pendingDeposit !== null}
               >
-                {isDepositing ? (
+                {isDepositing || pendingDeposit !== null ? (
                   <>
                     <Loader2 className="h-5 w-5 mr-2 animate-spin" />
-                    Processing...
+                    {pendingDeposit !== null ? "Waiting for M-Pesa..." : "Processing..."}
                   </>
                 ) : (
                   <>
@@ -0,0 +1,57 @@
+"use client"
+
+import { useEffect, useRef } from "react"
+import { supportSocketUrl } from "@/lib/api"
+
+export interface SupportEvent {
+  type: string
+  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+  data: any
+}
+
+// Subscribes to the support chat WebSocket, reconnecting with backoff until the component unmounts
+export function useSupportSocket(channel: "feed" | "private", onEvent: (event: SupportEvent) => void, enabled = true) {
+  useEventSocket(() => supportSocketUrl(channel), channel, onEvent, enabled)
+}
+
+// The same for any server event socket; `key` changes whenever the URL should be reopened
+export function useEventSocket(url: () => string, key: string, onEvent: (event: SupportEvent) => void, enabled = true) {
+  const handler = useRef(onEvent)
+  handler.current = onEvent
+
+  useEffect(() => {
+    if (!enabled || typeof window === "undefined") return
+
+    let socket: WebSocket | null = null
+    let retry: ReturnType<typeof setTimeout> | undefined
+    let attempts = 0
+    let stopped = false
+
+    const open = () => {
+      socket = new WebSocket(url())
+      socket.onopen = () => {
+        attempts = 0
+      }
+      socket.onmessage = (message) => {
+        try {
+          handler.current(JSON.parse(message.data) as SupportEvent)
+        } catch (error) {
+          console.error("Bad support event:", error)
+        }
+      }
+      socket.onclose = (close) => {
+        // 4401 means the server rejected our credentials; retrying won't help
+        if (stopped || close.code === 4401) return
+        retry = setTimeout(open, Math.min(30000, 1000 * 2 ** attempts++))
+      }
+    }
+
+    open()
+    return () => {
+      stopped = true
+      clearTimeout(retry)
+      socket?.close()
+    }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [key, enabled])
+}
@@ -14,6 +14,22 @@ async function safeParseJSON(response: Response): Promise<unknown> {
   }
 }
 
+// Browsers can't set headers on a WebSocket, so the sockets take the token in the query string
+function socketUrl(path: string): string {
+  const base = API_BASE_URL.replace(/^http/, "ws").replace(/\/api\/?$/, "")
+  const token = typeof window !== "undefined" ? localStorage.getItem("auth_token") : null
+  return `${base}/ws/${path}/${token ? `?token=${encodeURIComponent(token)}` : ""}`
+}
+
+export function supportSocketUrl(channel: "feed" | "private"): string {
+  return socketUrl(`support/${channel}`)
+}
+
+// Deposit status updates for the signed-in user
+export function walletSocketUrl(): string {
+  return socketUrl("wallet")
+}
+
 // Helper function to get auth headers
 function getAuthHeaders(excludeContentType = false) {
   const token = typeof window !== "undefined" ? localStorage.getItem("auth_token") : null
@@ -86,6 +102,16 @@ export interface WalletBalance {
   transactions?: Transaction[]
 }
 
+// An STK push deposit is sent by a background worker, so its progress is polled or pushed over the wallet socket
+export interface DepositState {
+  deposit_id: number
+  amount: string
+  status: "PENDING" | "COMPLETED" | "FAILED"
+  stk_status: "QUEUED" | "SENDING" | "SENT" | "FAILED" | null
+  checkout_id: string | null
+  failure_reason: string | null
+}
+
 export interface DashboardStats {
   total_earnings: string
   active_package: string | null
@@ -153,6 +179,22 @@ export interface Category {
   count?: number
 }
 
+export interface ProductFilters {
+  q?: string
+  category?: number | string
+  min_price?: number
+  max_price?: number
+  featured?: boolean
+  installments?: boolean
+  page_size?: number
+}
+
+export interface ProductPage {
+  results: Product[]
+  next: string | null
+  previous: string | null
+}
+
 export interface ReferralStats {
   total_referrals: number
   active_referrals: number
@@ -256,7 +298,7 @@ export interface Submission {
   advert: number
   advert_title: string
   views_count: number
-  screenshot: string // Local URL (e.g., /media/submissions/filename)
+  screenshot: string // Object key in the private bucket (e.g., submissions/12/<uuid>.jpg)
   earnings: string
   submission_date: string
 }
@@ -709,26 +751,6 @@ export class ApiService {
   }
 
   // Real store endpoints for products and categories
-  static async getAllProducts(): Promise<Product[]> {
-    const response = await fetch(`${API_BASE_URL}/dashboard/all-products/`, {
-      headers: getAuthHeaders(),
-    })
-
-    if (!response.ok) {
-      throw new Error("Failed to fetch products")
-    }
-
-    const products = (await safeParseJSON(response)) as Product[]
-    return products.map((product) => ({
-      ...product,
-      main_image: product.main_image
-        ? product.main_image.startsWith("http")
-          ? product.main_image
-          : `${MEDIA_BASE_URL}${product.main_image.startsWith("/") ? "" : "/"}${product.main_image}`
-        : "/diverse-products-still-life.png",
-    }))
-  }
-
   static async getCategories(): Promise<Category[]> {
     const response = await fetch(`${API_BASE_URL}/dashboard/categories/`, {
       headers: getAuthHeaders(),
@@ -975,7 +997,7 @@ export class ApiService {
     deposit_method: "stk" | "manual"
     phone_number?: string
     mpesa_code?: string
-  }): Promise<{ message: string; checkout_id?: string; deposit_id?: number }> {
+  }): Promise<{ message: string; deposit_id: number; status?: DepositState["status"]; stk_status?: DepositState["stk_status"] }> {
     const response = await fetch(`${API_BASE_URL}/wallet/deposit/`, {
       method: "POST",
       headers: getAuthHeaders(),
@@ -991,7 +1013,24 @@ export class ApiService {
       throw new Error("Failed to process deposit")
     }
 
-    return safeParseJSON(response) as Promise<{ message: string; checkout_id?: string; deposit_id?: number }>
+    return safeParseJSON(response) as Promise<{
+      message: string
+      deposit_id: number
+      status?: DepositState["status"]
+      stk_status?: DepositState["stk_status"]
+    }>
+  }
+
+  static async getDepositStatus(depositId: number): Promise<DepositState> {
+    const response = await fetch(`${API_BASE_URL}/wallet/deposit/${depositId}/status/`, {
+      headers: getAuthHeaders(),
+    })
+
+    if (!response.ok) {
+      throw new Error("Failed to fetch deposit status")
+    }
+
+    return safeParseJSON(response) as Promise<DepositState>
   }
 
   static async withdrawMain(payload: { amount: number; mpesa_number: string }): Promise<{
@@ -1053,7 +1092,9 @@ export class ApiService {
       throw new Error("Failed to fetch transaction history")
     }
 
-    return safeParseJSON(response) as Promise<Transaction[]>
+    // The endpoint is cursor-paginated; this returns the most recent page
+    const data = (await safeParseJSON(response)) as { results?: Transaction[] }
+    return data.results ?? []
   }
 
   static async getReferralStats(): Promise<ReferralStats> {
@@ -1167,29 +1208,55 @@ export class ApiService {
     return safeParseJSON(response) as Promise<{ adverts: Advert[]; user_package: UserPackage | null }>
   }
 
-  static async downloadAdvert(advertId: number): Promise<Blob> {
-    const response = await fetch(`${API_BASE_URL}/adverts/${advertId}/download/`, {
+  // Returns a short-lived signed link the browser downloads from storage directly
+  static async downloadAdvert(advertId: number): Promise<{ url: string; file_name: string; expires_in: number }> {
+    const response = await fetch(`${API_BASE_URL}/adverts/${advertId}/download/?redirect=false`, {
+      headers: getAuthHeaders(),
+    })
+
+    if (!response.ok) {
+      const error = await safeParseJSON(response)
+      throw new Error((error as { error?: string; message?: string }).error || (error as { message?: string }).message || "Failed to download advert")
+    }
+
+    // A server in proxy mode sends the file itself instead of a link
+    if (!response.headers.get("content-type")?.includes("application/json")) {
+      return { url: URL.createObjectURL(await response.blob()), file_name: "", expires_in: 0 }
+    }
+    return safeParseJSON(response) as Promise<{ url: string; file_name: string; expires_in: number }>
+  }
+
+  static async getScreenshotUpload(contentType: string): Promise<PresignedUrlResponse> {
+    const response = await fetch(`${API_BASE_URL}/adverts/submit/upload/`, {
+      method: "POST",
       headers: getAuthHeaders(),
+      body: JSON.stringify({ content_type: contentType }),
     })
 
     if (!response.ok) {
       const error = await safeParseJSON(response)
-      throw new Error((error as { message?: string }).message || "Failed to download advert")
+      throw new Error((error as { error?: string }).error || "Failed to prepare screenshot upload")
     }
 
-    return response.blob()
+    return safeParseJSON(response) as Promise<PresignedUrlResponse>
   }
 
   static async submitAdvert(advertId: number, viewsCount: number, screenshot: File): Promise<Submission> {
-    const formData = new FormData()
-    formData.append("advert_id", advertId.toString())
-    formData.append("views_count", viewsCount.toString())
-    formData.append("screenshot", screenshot)
+    // The screenshot goes straight to the bucket; the submission itself only carries its key
+    const upload = await this.getScreenshotUpload(screenshot.type || "image/jpeg")
+    const uploadData = new FormData()
+    Object.entries(upload.fields).forEach(([key, value]) => uploadData.append(key, value))
+    uploadData.append("file", screenshot)
+
+    const uploadResponse = await fetch(upload.upload_url, { method: "POST", body: uploadData })
+    if (!uploadResponse.ok) {
+      throw new Error("Failed to upload screenshot (max 5MB, JPEG, PNG or WebP)")
+    }
 
     const response = await fetch(`${API_BASE_URL}/adverts/submit/`, {
       method: "POST",
-      headers: getAuthHeaders(true), // Exclude Content-Type for FormData
-      body: formData,
+      headers: getAuthHeaders(),
+      body: JSON.stringify({ advert_id: advertId, views_count: viewsCount, screenshot_key: upload.key }),
     })
 
     if (!response.ok) {
@@ -1257,25 +1324,16 @@ export class ApiService {
     return safeParseJSON(response) as Promise<WithdrawalResponse>
   }
 
-  static async getProducts(params?: {
-    page?: number
-    limit?: number
-    search?: string
-    category?: string
-  }): Promise<{
-    results: Product[]
-    count: number
-    next: string | null
-    previous: string | null
-  }> {
-    const searchParams = new URLSearchParams()
-
-    if (params?.page) searchParams.append("page", params.page.toString())
-    if (params?.limit) searchParams.append("limit", params.limit.toString())
-    if (params?.search) searchParams.append("search", params.search)
-    if (params?.category) searchParams.append("category", params.category)
-
-    const url = `${API_BASE_URL}/dashboard/all-products/${searchParams.toString() ? "?" + searchParams.toString() : ""}`
+  // Pass the previous page's `next` URL as pageUrl to fetch the following page with the same filters
+  static async getProducts(filters: ProductFilters = {}, pageUrl?: string | null): Promise<ProductPage> {
+    let url = pageUrl
+    if (!url) {
+      const searchParams = new URLSearchParams()
+      Object.entries(filters).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== "") searchParams.append(key, String(value))
+      })
+      url = `${API_BASE_URL}/dashboard/all-products/${searchParams.toString() ? "?" + searchParams.toString() : ""}`
+    }
 
     const response = await fetch(url, {
       headers: getAuthHeaders(),
@@ -1285,22 +1343,17 @@ export class ApiService {
       throw new Error("Failed to fetch products")
     }
 
-    const data = await safeParseJSON(response)
-
-    if (Array.isArray(data)) {
-      return {
-        results: data,
-        count: data.length,
-        next: null,
-        previous: null,
-      }
-    }
-
-    return data as {
-      results: Product[]
-      count: number
-      next: string | null
-      previous: string | null
+    const data = (await safeParseJSON(response)) as ProductPage
+    return {
+      ...data,
+      results: data.results.map((product) => ({
+        ...product,
+        main_image: product.main_image
+          ? product.main_image.startsWith("http")
+            ? product.main_image
+            : `${MEDIA_BASE_URL}${product.main_image.startsWith("/") ? "" : "/"}${product.main_image}`
+          : "/diverse-products-still-life.png",
+      })),
     }
   }
 
@@ -1421,10 +1474,11 @@ export class ApiService {
     next: string | null
     previous: string | null
   }> {
-    const queryParams = new URLSearchParams()
+    // The thread endpoint pages top-level comments and nests their replies, so a reply never lands on a different page from its parent
+    const queryParams = new URLSearchParams({ depth: "10" })
     if (page) queryParams.append("page", page.toString())
 
-    const response = await fetch(`${API_BASE_URL}/support/messages/${messageId}/comment/?${queryParams}`, {
+    const response = await fetch(`${API_BASE_URL}/support/messages/${messageId}/thread/?${queryParams}`, {
       headers: getAuthHeaders(),
     })
 
@@ -1433,15 +1487,19 @@ export class ApiService {
       throw new Error((error as { message?: string }).message || "Failed to fetch comments")
     }
 
+    type ThreadComment = SupportComment & { replies?: ThreadComment[] }
     const data = (await safeParseJSON(response)) as {
-      results?: SupportComment[]
+      results?: ThreadComment[]
       count?: number
       next?: string | null
       previous?: string | null
     }
+    // Flatten parents before their replies; the card rebuilds nesting from parent_comment
+    const flatten = (comments: ThreadComment[]): SupportComment[] =>
+      comments.flatMap(({ replies, ...comment }) => [comment as SupportComment, ...flatten(replies || [])])
     return {
-      results: Array.isArray(data) ? data : data.results || [],
-      count: Array.isArray(data) ? data.length : data.count || 0,
+      results: flatten(data.results || []),
+      count: data.count || 0,
       next: data.next || null,
       previous: data.previous || null,
     }
@@ -1527,8 +1585,10 @@ export class ApiService {
     return safeParseJSON(response) as Promise<T>
   }
 
-  static async getPrivateConversations() {
-    return this.get("/support/private-messages/")
+  // Conversations come most recent first, a page at a time
+  static async getPrivateConversations(page = 1) {
+    const data = (await this.get(`/support/private-messages/?page=${page}`)) as { results?: unknown[] }
+    return data.results || []
   }
 
   static async getPrivateMessages(receiverId: number, page = 1) {